@@ -0,0 +1,57 @@
+'''
+Compares the rules backends of MoveManager on seeded random legal games.
+Run from the root of the repository with: python -m benchmarks.backend_benchmark
+'''
+import argparse
+import time
+from game_implementation.rules_implementation import MoveManager
+from benchmarks.bench_utils import generate_random_games, other_piece
+
+
+def replay_games(move_manager: MoveManager, games: list[list[int]]) -> tuple[float, list[str]]:
+    '''
+    Replays the games, generating the legal moves before every move and counting the
+    territory at the end of every game
+    Parameters:
+    move_manager (MoveManager): The move manager to benchmark
+    games (list[list[int]]): The games to replay
+    Returns:
+    (seconds taken, territory string at the end of each game)
+    '''
+    territories = []
+    start = time.perf_counter()
+    for moves in games:
+        board = move_manager.get_empty_board()
+        piece = 'x'
+        for move in moves:
+            valid_moves = move_manager.get_next_moves(board, piece)
+            assert move in valid_moves
+            board = move_manager.make_move(board, move, piece)
+            piece = other_piece(piece)
+        territories.append(move_manager.create_territory(board))
+    return time.perf_counter() - start, territories
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 13, 19])
+    parser.add_argument('--games', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'size':>4} {'backend':>9} {'moves':>7} {'seconds':>9} {'moves/s':>9}")
+    for board_size in args.sizes:
+        games = generate_random_games(board_size, args.games, args.seed, 2 * board_size * board_size)
+        n_moves = sum(len(moves) for moves in games)
+        reference = None
+        for backend in MoveManager.BACKENDS:
+            seconds, territories = replay_games(MoveManager(board_size, backend), games)
+            if reference is None:
+                reference = territories
+            elif territories != reference:
+                raise AssertionError(f"The {backend} backend disagrees on a {board_size}x{board_size} board")
+            print(f"{board_size:>4} {backend:>9} {n_moves:>7} {seconds:>9.3f} {n_moves / seconds:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
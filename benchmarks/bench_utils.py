@@ -0,0 +1,52 @@
+import random
+import subprocess
+from typing import Optional
+from game_implementation.rules_implementation import MoveManager
+
+# The stages of a game the benchmark positions are taken at, as the fraction of the cells played
+STAGES = {'middle': 1 / 3, 'endgame': 2 / 3}
+
+
+def other_piece(piece: str) -> str:
+    '''Returns the piece of the opponent'''
+    return 'o' if piece == 'x' else 'x'
+
+
+def generate_random_games(board_size: int, n_games: int, seed: int, max_moves: int) -> list[list[int]]:
+    '''
+    Generates seeded random legal games. 'x' moves first and the players alternate. A game
+    stops when the player to move has no legal move left or after max_moves moves.
+    Parameters:
+    board_size (int): The length of a side of the board
+    n_games (int): The number of games to generate
+    seed (int): The seed of the random number generator
+    max_moves (int): The maximum number of moves in a game
+    Returns:
+    The list of games, each being the list of the 1D indices played
+    '''
+    rng = random.Random(seed)
+    move_manager = MoveManager(board_size)
+    games = []
+    for _ in range(n_games):
+        board = move_manager.get_empty_board()
+        piece = 'x'
+        moves = []
+        for _ in range(max_moves):
+            valid_moves = move_manager.get_next_moves(board, piece)
+            if not valid_moves:
+                break
+            move = rng.choice(valid_moves)
+            board = move_manager.make_move(board, move, piece)
+            moves.append(move)
+            piece = other_piece(piece)
+        games.append(moves)
+    return games
+
+
+def git_commit() -> Optional[str]:
+    '''Returns the commit the benchmark is run on, None if it is not known'''
+    try:
+        completed = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True)
+    except OSError:
+        return None
+    return completed.stdout.strip() if completed.returncode == 0 else None
@@ -0,0 +1,157 @@
+'''
+Measures the bots on fixed middle game and endgame positions, taken from seeded random
+legal games. Every bot is asked for a move on every position under the same budget, and the
+wall time, the nodes or simulations searched per second, the chosen move, the peak memory and
+the statistics of the search (see Bot.get_search_stats) are recorded. The peak memory comes
+from a second, traced call (tracemalloc slows the search down a lot, so the first call is the
+one timed). A bot only gets the limits of the budget it takes (the minimax bots search to
+their fixed depth), and the budget each bot actually ran under, its own defaults included,
+is printed and recorded. The results are printed as a table and written to a JSON file.
+Run from the root of the repository with: python -m benchmarks.bot_benchmark
+'''
+import argparse
+import inspect
+import json
+import platform
+import time
+import tracemalloc
+from typing import Optional
+from game_implementation.rules_implementation import MoveManager
+from game_bots.bot import Bot
+from game_bots.registry import get_bot
+from benchmarks.bench_utils import STAGES, generate_random_games, other_piece, git_commit
+
+# The search limits the benchmark sets, under the names the bots take them by
+LIMITS = ('max_simulations', 'time_per_move')
+
+
+def benchmark_positions(board_size: int, n_games: int, seed: int) -> list[tuple[str, str, str]]:
+    '''
+    Returns the benchmark positions: for every seeded random game, the position reached after
+    each fraction of STAGES of the cells were played (or at the end of the game if earlier)
+    Returns:
+    The list of (name, board, piece to move)
+    '''
+    move_manager = MoveManager(board_size)
+    games = generate_random_games(board_size, n_games, seed, 2 * board_size * board_size)
+    positions = []
+    for game, moves in enumerate(games):
+        for stage, fraction in STAGES.items():
+            board = move_manager.get_empty_board()
+            piece = 'x'
+            for move in moves[:int(fraction * board_size * board_size)]:
+                board = move_manager.make_move(board, move, piece)
+                piece = other_piece(piece)
+            positions.append((f"{stage} {game}", board, piece))
+    return positions
+
+
+def bot_budget(name: str, budget: dict) -> dict:
+    '''
+    Returns the limits the bot runs under: the ones of the budget it takes, and its own
+    defaults for the LIMITS it takes that the budget leaves out. A limit of None is no limit
+    and is left out.
+    '''
+    parameters = inspect.signature(get_bot(name)).parameters
+    limits = {key: budget.get(key, parameters[key].default) for key in LIMITS if key in parameters}
+    return {key: value for key, value in limits.items() if value is not None}
+
+
+def make_bot(name: str, move_manager: MoveManager, board: str, piece: str, budget: dict) -> Bot:
+    '''
+    Creates the bot and sets it up on the position
+    Parameters:
+    name (str): The name of the bot in the registry
+    move_manager (MoveManager): The move manager
+    board (str): The go board
+    piece (str): The piece the bot plays
+    budget (dict): The search limits, only given to the bots that take them (see bot_budget)
+    '''
+    bot = get_bot(name)(move_manager, piece, **bot_budget(name, budget))
+    if hasattr(bot, 'set_position'):
+        bot.set_position(board, False) # Bots keeping a tree start at the empty board otherwise
+    return bot
+
+
+def searched(bot: Bot) -> tuple[Optional[int], str]:
+    '''
+    Returns how much the bot searched for its last move
+    Returns:
+    (count, unit) where unit is 'nodes' or 'simulations', count is None if the bot does not
+    report it
+    '''
+    reports = getattr(bot, 'search_reports', None)
+    if reports and 'simulations' in reports[-1]:
+        return reports[-1]['simulations'], 'simulations'
+    return getattr(bot, 'nodes_searched', None), 'nodes'
+
+
+def run_bot(name: str, board_size: int, board: str, piece: str, budget: dict) -> dict:
+    '''
+    Asks a new bot for a move on the position twice, once timed and once traced
+    Returns:
+    The result of the call: move, seconds, count, unit, per_second, peak_bytes, the
+    search_stats of the timed call (see Bot.get_search_stats) and the budget the bot ran under
+    '''
+    move_manager = MoveManager(board_size)
+    bot = make_bot(name, move_manager, board, piece, budget)
+    start = time.perf_counter()
+    move = bot.make_move(board, False)
+    seconds = time.perf_counter() - start
+    count, unit = searched(bot)
+    search_stats = bot.get_search_stats()
+
+    bot = make_bot(name, move_manager, board, piece, budget)
+    tracemalloc.start()
+    try:
+        bot.make_move(board, False)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'move': move, 'seconds': seconds, 'count': count, 'unit': unit,
+            'per_second': count / seconds if count is not None and seconds > 0 else None,
+            'peak_bytes': peak_bytes, 'search_stats': search_stats, 'budget': bot_budget(name, budget)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 13])
+    parser.add_argument('--bots', nargs='+', default=['minimax', 'debug', 'mcts'])
+    parser.add_argument('--games', type=int, default=2, help="Games the positions are taken from")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--simulations', type=int, default=200, help="Most simulations per move of the MCTS bots")
+    parser.add_argument('--seconds', type=float, default=None, help="Most seconds per move of the bots with a clock")
+    parser.add_argument('--output', default='bot_benchmark.json')
+    args = parser.parse_args()
+    budget = {'max_simulations': args.simulations}
+    if args.seconds is not None:
+        budget['time_per_move'] = args.seconds
+
+    report = {'commit': git_commit(), 'python': platform.python_version(), 'arguments': vars(args), 'results': []}
+    print(f"{'size':>4} {'position':>10} {'bot':>10} {'move':>5} {'seconds':>8} {'searched':>9} "
+          f"{'per second':>10} {'unit':>11} {'peak KiB':>9}")
+    for board_size in args.sizes:
+        positions = benchmark_positions(board_size, args.games, args.seed)
+        for name in args.bots:
+            print(f"{board_size:>4} {name}: budget {bot_budget(name, budget) or 'none, the bot takes no limits'}")
+            totals = {'seconds': 0.0, 'count': 0, 'peak_bytes': 0}
+            for position, board, piece in positions:
+                result = run_bot(name, board_size, board, piece, budget)
+                report['results'].append({'size': board_size, 'position': position, 'bot': name, **result})
+                totals['seconds'] += result['seconds']
+                totals['count'] += result['count'] or 0
+                totals['peak_bytes'] = max(totals['peak_bytes'], result['peak_bytes'])
+                per_second = f"{result['per_second']:.0f}" if result['per_second'] is not None else '-'
+                print(f"{board_size:>4} {position:>10} {name:>10} {result['move']:>5} {result['seconds']:>8.3f} "
+                      f"{result['count'] if result['count'] is not None else '-':>9} {per_second:>10} "
+                      f"{result['unit']:>11} {result['peak_bytes'] / 1024:>9.0f}")
+            per_second = totals['count'] / totals['seconds'] if totals['seconds'] > 0 else 0
+            print(f"{board_size:>4} {'all':>10} {name:>10} {'':>5} {totals['seconds']:>8.3f} {totals['count']:>9} "
+                  f"{per_second:>10.0f} {'':>11} {totals['peak_bytes'] / 1024:>9.0f}")
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
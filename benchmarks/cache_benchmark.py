@@ -0,0 +1,112 @@
+'''
+Measures the query caches of MoveManager (see MoveManager.cache_sizes) on three workloads,
+with and without the caches:
+- once: every position of seeded random games is queried once, so every lookup is a miss
+- repeated: the same positions are queried repeats times in a random order, like a caller
+that keeps coming back to the positions it analyses
+- the bots: a bot is asked for a move on fixed middle game and endgame positions
+The caches only pay off for callers that ask about the same positions again through the
+MoveManager. The bots search on their own search boards and their trees keep the children
+they expanded, so they hardly repeat a query and only pay for the hashing.
+Run from the root of the repository with: python -m benchmarks.cache_benchmark
+'''
+import argparse
+import random
+import time
+from typing import Optional
+from game_implementation.rules_implementation import MoveManager
+from benchmarks.bench_utils import generate_random_games, other_piece
+from benchmarks.bot_benchmark import benchmark_positions, make_bot
+
+
+def game_positions(move_manager: MoveManager, games: list[list[int]]) -> list[tuple[str, str]]:
+    '''Returns every (board, piece to move) of the games'''
+    positions = []
+    for moves in games:
+        board = move_manager.get_empty_board()
+        piece = 'x'
+        for move in moves:
+            positions.append((board, piece))
+            board = move_manager.make_move(board, move, piece)
+            piece = other_piece(piece)
+    return positions
+
+
+def query_positions(move_manager: MoveManager, positions: list[tuple[str, str]]) -> float:
+    '''
+    Asks for the legal moves, the territory score and the liberties of the first stone of
+    every position
+    Returns:
+    The seconds taken
+    '''
+    start = time.perf_counter()
+    for board, piece in positions:
+        move_manager.classify_moves(board, piece)
+        move_manager.get_territory_score(board)
+        stone = next((index for index, cell in enumerate(board) if cell != '-'), None)
+        if stone is not None:
+            move_manager.get_liberty_count(board, stone)
+    return time.perf_counter() - start
+
+
+def search_positions(move_manager: MoveManager, name: str, positions: list[tuple[str, str, str]],
+                     budget: dict) -> float:
+    '''
+    Asks a new bot for a move on every position
+    Returns:
+    The seconds taken
+    '''
+    seconds = 0.0
+    for _, board, piece in positions:
+        bot = make_bot(name, move_manager, board, piece, budget)
+        start = time.perf_counter()
+        bot.make_move(board, False)
+        seconds += time.perf_counter() - start
+    return seconds
+
+
+def hit_rate(move_manager: MoveManager) -> Optional[float]:
+    '''Returns the share of the cache lookups that were hits, None if there were none'''
+    stats = move_manager.cache_stats().values()
+    lookups = sum(cache['hits'] + cache['misses'] for cache in stats)
+    return sum(cache['hits'] for cache in stats) / lookups if lookups else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 13])
+    parser.add_argument('--games', type=int, default=4, help="Games the positions are taken from")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3, help="Times every position is queried in repeated")
+    parser.add_argument('--cache-size', type=int, default=4096, help="Capacity of each query cache")
+    parser.add_argument('--bots', nargs='+', default=['mcts', 'mcts_array'])
+    parser.add_argument('--simulations', type=int, default=300, help="Most simulations per move of the MCTS bots")
+    args = parser.parse_args()
+    cache_sizes = {query: args.cache_size for query in MoveManager.CACHED_QUERIES}
+    budget = {'max_simulations': args.simulations}
+
+    print(f"{'size':>4} {'workload':>10} {'uncached s':>10} {'cached s':>9} {'ratio':>6} {'hit rate':>8}")
+    for board_size in args.sizes:
+        games = generate_random_games(board_size, args.games, args.seed, 2 * board_size * board_size)
+        positions = game_positions(MoveManager(board_size), games)
+        repeated = positions * args.repeats
+        random.Random(args.seed).shuffle(repeated)
+        workloads = {
+            'once': lambda move_manager: query_positions(move_manager, positions),
+            'repeated': lambda move_manager: query_positions(move_manager, repeated),
+        }
+        bot_positions = benchmark_positions(board_size, 1, args.seed)
+        for name in args.bots:
+            workloads[name] = lambda move_manager, name=name: search_positions(move_manager, name, bot_positions,
+                                                                               budget)
+        for workload, run in workloads.items():
+            uncached = run(MoveManager(board_size))
+            move_manager = MoveManager(board_size, cache_sizes=cache_sizes)
+            cached = run(move_manager)
+            rate = hit_rate(move_manager)
+            print(f"{board_size:>4} {workload:>10} {uncached:>10.3f} {cached:>9.3f} {cached / uncached:>6.2f} "
+                  f"{f'{rate:.0%}' if rate is not None else '-':>8}")
+
+
+if __name__ == '__main__':
+    main()
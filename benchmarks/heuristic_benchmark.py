@@ -0,0 +1,54 @@
+'''
+Measures the expansion throughput of MCTSNode.expand when the children are evaluated one by one
+with HeuristicMCTSBot.heuristic against evaluating them all at once with
+HeuristicMCTSBot.batch_heuristic.
+Run from the root of the repository with: python -m benchmarks.heuristic_benchmark
+'''
+import argparse
+import time
+from game_implementation.rules_implementation import MoveManager
+from game_bots.mcts_with_heuristics import HeuristicMCTSBot, MCTSNode
+from benchmarks.bench_utils import generate_random_games, other_piece
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 19])
+    parser.add_argument('--positions', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'size':>4} {'heuristic':>9} {'expansions/s':>12} {'children/s':>10}")
+    for board_size in args.sizes:
+        move_manager = MoveManager(board_size)
+        bot = HeuristicMCTSBot(move_manager, 'x')
+        # Middle game positions: the position after a third of the cells have been played
+        games = generate_random_games(board_size, args.positions, args.seed, board_size * board_size // 3)
+        positions = []
+        for moves in games:
+            board = move_manager.get_empty_board()
+            piece = 'x'
+            for move in moves:
+                board = move_manager.make_move(board, move, piece)
+                piece = other_piece(piece)
+            positions.append((board, piece))
+
+        values = {}
+        for name, batch_heuristic in (('single', None), ('batch', bot.batch_heuristic)):
+            children = 0
+            values[name] = []
+            start = time.perf_counter()
+            for board, piece in positions:
+                node = MCTSNode(board, False, piece, move_manager)
+                node.simulate_game(bot.heuristic)
+                node.expand(bot.heuristic, batch_heuristic)
+                children += len(node.children_nodes)
+                values[name].append([child.Q for child in node.children_nodes.values()])
+            seconds = time.perf_counter() - start
+            print(f"{board_size:>4} {name:>9} {len(positions) / seconds:>12.1f} {children / seconds:>10.0f}")
+        if values['single'] != values['batch']:
+            raise AssertionError("The batch heuristic disagrees with the heuristic")
+
+
+if __name__ == '__main__':
+    main()
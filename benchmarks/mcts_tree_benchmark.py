@@ -0,0 +1,72 @@
+'''
+Compares the memory per node and the child selection speed of the MCTS tree backends.
+Run from the root of the repository with: python -m benchmarks.mcts_tree_benchmark
+'''
+import argparse
+import time
+import tracemalloc
+from game_implementation.rules_implementation import MoveManager
+from game_bots.mcts_with_heuristics import HeuristicMCTSBot, MCTSNode
+
+
+def count_nodes(node: MCTSNode) -> int:
+    '''Returns the number of nodes in the subtree of node'''
+    stack = [node]
+    count = 0
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children_nodes.values())
+    return count
+
+
+def select_with_nodes(node: MCTSNode) -> int:
+    '''The child selection loop of MCTSNode.simulate'''
+    Max = None
+    max_move = None
+    for move in node.children_nodes:
+        child_preference = node.children_nodes[move].get_choosing_preference(node.N)
+        if Max is None or Max < child_preference:
+            Max = child_preference
+            max_move = move
+    return max_move
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 13])
+    parser.add_argument('--simulations', type=int, default=100)
+    parser.add_argument('--selections', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'size':>4} {'backend':>7} {'nodes':>7} {'bytes/node':>10} {'sims/s':>8} {'select us':>9}")
+    for board_size in args.sizes:
+        move_manager = MoveManager(board_size)
+        for backend in HeuristicMCTSBot.TREE_BACKENDS:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            bot = HeuristicMCTSBot(move_manager, 'x', tree_backend=backend)
+            start = time.perf_counter()
+            for _ in range(args.simulations):
+                bot.run_simulation()
+            seconds = time.perf_counter() - start
+            used = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+
+            tree = bot.mcts_tree
+            if backend == 'array':
+                n_nodes = tree.size
+                select = lambda: tree.select_child(tree.root)
+            else:
+                n_nodes = count_nodes(tree)
+                select = lambda: select_with_nodes(tree)
+            start = time.perf_counter()
+            for _ in range(args.selections):
+                select()
+            select_us = (time.perf_counter() - start) / args.selections * 1e6
+            print(f"{board_size:>4} {backend:>7} {n_nodes:>7} {used / n_nodes:>10.0f} "
+                  f"{args.simulations / seconds:>8.0f} {select_us:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+'''
+Measures the simulations per second of HeuristicMCTSBot searching with a growing number of
+worker processes, in root parallel and tree parallel mode. The speedups are only meaningful on
+a machine with at least as many cores as workers.
+Run from the root of the repository with: python -m benchmarks.parallel_mcts_benchmark
+'''
+import argparse
+from game_implementation.rules_implementation import MoveManager
+from game_bots.mcts_with_heuristics import HeuristicMCTSBot
+from benchmarks.bench_utils import generate_random_games, other_piece
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=9)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    move_manager = MoveManager(args.size)
+    # A middle game position: the position after a third of the cells have been played
+    moves = generate_random_games(args.size, 1, args.seed, args.size * args.size // 3)[0]
+    board = move_manager.get_empty_board()
+    piece = 'x'
+    for move in moves:
+        board = move_manager.make_move(board, move, piece)
+        piece = other_piece(piece)
+
+    print(f"{'mode':>6} {'workers':>7} {'sims':>7} {'sims/s':>8} {'speedup':>7} {'collisions':>10} {'move':>5}")
+    for mode in ('root', 'tree'):
+        baseline = None
+        for n_workers in args.workers:
+            bot = HeuristicMCTSBot(move_manager, piece, tree_backend='array', time_per_move=args.seconds,
+                                   max_simulations=None, early_stop=False, n_workers=n_workers, parallel_mode=mode)
+            bot.make_move(board, False) # Warm up, so that starting the processes is not measured
+            bot.previous_states.clear()
+            move = bot.make_move(board, False)
+            bot.receive_result('-')
+            report = bot.search_reports[-1]
+            if baseline is None:
+                baseline = report['simulations_per_second']
+            print(f"{mode:>6} {n_workers:>7} {report['simulations']:>7} {report['simulations_per_second']:>8.0f} "
+                  f"{report['simulations_per_second'] / baseline:>7.2f} {report.get('collisions', 0):>10} {move:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''
+Measures the random playouts per second of PlayoutBoard from the empty board and from middle game
+positions, of BatchSimulator playing many games in lockstep from the empty board, and the MCTS
+simulations per second of HeuristicMCTSBot with each simulation policy.
+Run from the root of the repository with: python -m benchmarks.playout_benchmark
+'''
+import argparse
+import time
+from game_implementation.rules_implementation import MoveManager
+from game_implementation.playout_board import PlayoutBoard
+from game_implementation.batch_simulator import BatchSimulator
+from game_bots.mcts_with_heuristics import HeuristicMCTSBot
+from benchmarks.bench_utils import generate_random_games, other_piece
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 13, 19])
+    parser.add_argument('--seconds', type=float, default=2)
+    parser.add_argument('--games', type=int, nargs='+', default=[100, 1000], help="Games played at once by BatchSimulator")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'size':>4} {'start':>6} {'playouts/s':>10} {'moves/playout':>13} {'moves/s':>8}")
+    for board_size in args.sizes:
+        move_manager = MoveManager(board_size)
+        playout_board = PlayoutBoard(board_size, args.seed)
+        # A middle game position: the position after a third of the cells have been played
+        moves, = generate_random_games(board_size, 1, args.seed, board_size * board_size // 3)
+        middle_board = move_manager.get_empty_board()
+        middle_piece = 'x'
+        for move in moves:
+            middle_board = move_manager.make_move(middle_board, move, middle_piece)
+            middle_piece = other_piece(middle_piece)
+
+        for name, board, piece in (('empty', move_manager.get_empty_board(), 'x'), ('middle', middle_board, middle_piece)):
+            playouts = 0
+            n_moves = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < args.seconds:
+                playout_board.load(board)
+                playout_board.playout(piece)
+                n_moves += playout_board.moves_played
+                playouts += 1
+            seconds = time.perf_counter() - start
+            print(f"{board_size:>4} {name:>6} {playouts / seconds:>10.1f} {n_moves / playouts:>13.1f} {n_moves / seconds:>8.0f}")
+
+    print()
+    print(f"{'size':>4} {'games':>6} {'playouts/s':>10} {'moves/playout':>13} {'moves/s':>8}")
+    for board_size in args.sizes:
+        for n_games in args.games:
+            simulator = BatchSimulator(board_size, n_games, args.seed)
+            start = time.perf_counter()
+            simulator.playout()
+            seconds = time.perf_counter() - start
+            n_moves = simulator.moves_played.sum()
+            print(f"{board_size:>4} {n_games:>6} {n_games / seconds:>10.1f} {n_moves / n_games:>13.1f} {n_moves / seconds:>8.0f}")
+
+    print()
+    print(f"{'size':>4} {'policy':>9} {'simulations/s':>13}")
+    for board_size in args.sizes:
+        move_manager = MoveManager(board_size)
+        for policy in HeuristicMCTSBot.SIMULATION_POLICIES:
+            bot = HeuristicMCTSBot(move_manager, 'x', tree_backend='array', time_per_move=args.seconds,
+                                   max_simulations=None, early_stop=False, simulation_policy=policy)
+            bot.make_move(move_manager.get_empty_board(), False)
+            report = bot.search_reports[-1]
+            print(f"{board_size:>4} {policy:>9} {report['simulations_per_second']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+'''
+Benchmarks the rules engine (MoveManager) on every backend: the throughput of each query
+while replaying a corpus of seeded random legal games, and perft counts (the number of move
+sequences of a given length, passes included) from fixed positions. The results of the
+queries and the perft counts are checked to be the same on every backend, and everything is
+written to a JSON file so that runs on different commits can be compared.
+Run from the root of the repository with: python -m benchmarks.rules_benchmark
+'''
+import argparse
+import json
+import platform
+import random
+import time
+from game_implementation.rules_implementation import MoveManager
+from benchmarks.bench_utils import STAGES, generate_random_games, other_piece, git_commit
+
+OPERATIONS = ('make_move', 'is_valid_move', 'get_next_moves', 'get_liberty_count', 'remove_block', 'create_territory')
+
+
+def replay_corpus(move_manager: MoveManager, games: list[list[int]], seed: int, samples: int) \
+        -> tuple[dict[str, float], dict[str, int], dict[str, list]]:
+    '''
+    Replays the games and times every operation on each position reached. The queries
+    are made on the board the engine just moved to, as a bot or the game runner would.
+    Parameters:
+    move_manager (MoveManager): The move manager to benchmark
+    games (list[list[int]]): The games to replay
+    seed (int): The seed picking the cells and stones queried
+    samples (int): The cells checked with is_valid_move and the stones queried with
+    get_liberty_count in every position
+    Returns:
+    (seconds, calls, results) where each maps an operation to the total time spent in it,
+    the number of calls made and the list of what the calls returned
+    '''
+    rng = random.Random(seed)
+    seconds = dict.fromkeys(OPERATIONS, 0.0)
+    calls = dict.fromkeys(OPERATIONS, 0)
+    results = {operation: [] for operation in OPERATIONS}
+    clock = time.perf_counter
+    for moves in games:
+        board = move_manager.get_empty_board()
+        piece = 'x'
+        n_cells = len(board)
+        for move in moves:
+            start = clock()
+            board = move_manager.make_move(board, move, piece)
+            seconds['make_move'] += clock() - start
+            calls['make_move'] += 1
+            results['make_move'].append(move_manager.get_hash(board))
+            piece = other_piece(piece)
+
+            cells = [rng.randrange(n_cells) for _ in range(samples)]
+            start = clock()
+            valid = [move_manager.is_valid_move(board, index, piece) for index in cells]
+            seconds['is_valid_move'] += clock() - start
+            calls['is_valid_move'] += len(cells)
+            results['is_valid_move'].append(valid)
+
+            start = clock()
+            next_moves = move_manager.get_next_moves(board, piece)
+            seconds['get_next_moves'] += clock() - start
+            calls['get_next_moves'] += 1
+            results['get_next_moves'].append(sorted(next_moves))
+
+            stones = [index for index in range(n_cells) if board[index] != '-']
+            stones = [rng.choice(stones) for _ in range(samples)]
+            start = clock()
+            liberties = [move_manager.get_liberty_count(board, index) for index in stones]
+            seconds['get_liberty_count'] += clock() - start
+            calls['get_liberty_count'] += len(stones)
+            results['get_liberty_count'].append(liberties)
+
+            start = clock()
+            removed = move_manager.remove_block(board, stones[0])
+            seconds['remove_block'] += clock() - start
+            calls['remove_block'] += 1
+            results['remove_block'].append(removed)
+
+            start = clock()
+            territory_str = move_manager.create_territory(board)
+            seconds['create_territory'] += clock() - start
+            calls['create_territory'] += 1
+            results['create_territory'].append(territory_str)
+    return seconds, calls, results
+
+
+def perft(search_board, piece: str, other_pass: bool, depth: int) -> int:
+    '''
+    Counts the sequences of depth moves from the position of the search board. Passing is
+    always a move, and the game ends (no move can follow) after two passes in a row. Only
+    simple legality is checked, not superko.
+    Parameters:
+    search_board (Union[BoardState, BitboardState]): The position (see
+    MoveManager.get_search_board), left as it was
+    piece (str): The piece to move
+    other_pass (bool): Whether the last move was a pass
+    depth (int): The number of moves
+    Returns:
+    The number of sequences
+    '''
+    if depth == 0:
+        return 1
+    valid_moves, _, captures = search_board.classify_moves(piece)
+    if depth == 1:
+        return len(valid_moves) + 1 # Counted in bulk, the pass included
+    count = 0
+    for move in valid_moves:
+        search_board.play(move, piece, captures.get(move, []))
+        count += perft(search_board, other_piece(piece), False, depth - 1)
+        search_board.undo()
+    if other_pass:
+        count += 1 # The pass ends the game
+    else:
+        search_board.play(-1, piece)
+        count += perft(search_board, other_piece(piece), True, depth - 1)
+        search_board.undo()
+    return count
+
+
+def perft_positions(board_size: int, games: list[list[int]]) -> dict[str, tuple[str, str]]:
+    '''
+    Returns the positions perft is run from: the empty board and the positions of the first
+    game of the corpus after each fraction of STAGES of the cells were played (or at the end
+    of the game if earlier)
+    Returns:
+    A dict from the name of each position to (board, piece to move)
+    '''
+    move_manager = MoveManager(board_size)
+    positions = {'empty': (move_manager.get_empty_board(), 'x')}
+    for stage, fraction in STAGES.items():
+        board = move_manager.get_empty_board()
+        piece = 'x'
+        for move in games[0][:int(fraction * board_size * board_size)]:
+            board = move_manager.make_move(board, move, piece)
+            piece = other_piece(piece)
+        positions[stage] = (board, piece)
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9, 13, 19])
+    parser.add_argument('--games', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--samples', type=int, default=4, help="Cells and stones queried per position")
+    parser.add_argument('--depth', type=int, default=2, help="Depth of the perft counts")
+    parser.add_argument('--output', default='rules_benchmark.json')
+    args = parser.parse_args()
+
+    report = {'commit': git_commit(), 'python': platform.python_version(), 'arguments': vars(args), 'sizes': {}}
+    for board_size in args.sizes:
+        games = generate_random_games(board_size, args.games, args.seed, 2 * board_size * board_size)
+        positions = perft_positions(board_size, games)
+        size_report = report['sizes'][str(board_size)] = {'moves': sum(len(moves) for moves in games), 'backends': {}}
+        print(f"{board_size}x{board_size}, {size_report['moves']} moves")
+        print(f"{'backend':>9} {'operation':>18} {'calls':>8} {'seconds':>8} {'calls/s':>9}")
+        reference = None
+        for backend in MoveManager.BACKENDS:
+            move_manager = MoveManager(board_size, backend)
+            seconds, calls, results = replay_corpus(move_manager, games, args.seed, args.samples)
+            perft_report = {}
+            perft_counts = {}
+            for name, (board, piece) in positions.items():
+                start = time.perf_counter()
+                count = perft(move_manager.get_search_board(board), piece, False, args.depth)
+                perft_report[name] = {'count': count, 'seconds': time.perf_counter() - start}
+                perft_counts[name] = count
+            if reference is None:
+                reference = (results, perft_counts)
+            else:
+                for operation in OPERATIONS:
+                    if results[operation] != reference[0][operation]:
+                        raise AssertionError(f"The {backend} backend disagrees on {operation} on a {board_size}x{board_size} board")
+                if perft_counts != reference[1]:
+                    raise AssertionError(f"The {backend} backend disagrees on the perft counts on a {board_size}x{board_size} board")
+            operations = {}
+            for operation in OPERATIONS:
+                rate = calls[operation] / seconds[operation] if seconds[operation] > 0 else float('inf')
+                operations[operation] = {'calls': calls[operation], 'seconds': seconds[operation], 'calls_per_second': rate}
+                print(f"{backend:>9} {operation:>18} {calls[operation]:>8} {seconds[operation]:>8.3f} {rate:>9.0f}")
+            for name, perft_result in perft_report.items():
+                print(f"{backend:>9} {f'perft({args.depth}) {name}':>18} {perft_result['count']:>8} "
+                      f"{perft_result['seconds']:>8.3f}")
+            size_report['backends'][backend] = {'operations': operations, 'perft': perft_report}
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
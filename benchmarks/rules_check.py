@@ -0,0 +1,220 @@
+'''
+Randomized differential check of the rules engine. Random games are played with a plain
+flood fill implementation of the rules, and on every position each backend of MoveManager,
+with and without its query caches, is compared with it: the legal moves, the suicides and
+the captures, superko filtering, liberties, territory, hashes and make_move (also from the
+same board twice in a row, which takes back the previous move). A search board follows
+every game with play, and random stretches of moves are taken back with undo and checked
+against the positions they came from. Any disagreement raises an AssertionError.
+Run from the root of the repository with: python -m benchmarks.rules_check
+'''
+import argparse
+import random
+from game_implementation.rules_implementation import MoveManager
+from game_implementation.zobrist import hash_board
+from benchmarks.bench_utils import other_piece
+
+# Every cached query is cached, in caches small enough to evict
+CACHE_SIZES = {query: 16 for query in MoveManager.CACHED_QUERIES}
+
+
+def flood_fill(board: str, graph: list[list[int]], index: int) -> tuple[set[int], set[int]]:
+    '''
+    Returns the cells of the region of index (its block, or its empty region) and the cells
+    bordering it
+    '''
+    colour = board[index]
+    region = {index}
+    border = set()
+    stack = [index]
+    while stack:
+        node = stack.pop()
+        for neighbour in graph[node]:
+            if board[neighbour] == colour:
+                if neighbour not in region:
+                    region.add(neighbour)
+                    stack.append(neighbour)
+            else:
+                border.add(neighbour)
+    return region, border
+
+
+def reference_move(board: str, graph: list[list[int]], index: int, piece: str) -> tuple[str, list[int]]:
+    '''
+    Plays the move on the board
+    Returns:
+    (new board, sorted captured stones), the new board being None if the move is a suicide
+    '''
+    cells = list(board)
+    cells[index] = piece
+    captured = []
+    for neighbour in graph[index]:
+        if cells[neighbour] == other_piece(piece):
+            block, border = flood_fill(''.join(cells), graph, neighbour)
+            if not any(cells[cell] == '-' for cell in border):
+                for stone in block:
+                    cells[stone] = '-'
+                captured.extend(block)
+    new_board = ''.join(cells)
+    _, border = flood_fill(new_board, graph, index)
+    if not any(new_board[cell] == '-' for cell in border):
+        return None, []
+    return new_board, sorted(captured)
+
+
+def reference_territory(board: str, graph: list[list[int]]) -> str:
+    '''Returns the territory string of the board (see MoveManager.create_territory)'''
+    territory = list(board)
+    for index, cell in enumerate(board):
+        if cell == '-' and territory[index] == '-':
+            region, border = flood_fill(board, graph, index)
+            colours = {board[neighbour] for neighbour in border}
+            owner = colours.pop() if len(colours) == 1 else '?'
+            for empty in region:
+                territory[empty] = owner
+    return ''.join(territory).replace('?', '-')
+
+
+def reference_position(board: str, graph: list[list[int]], piece: str, table: list[dict[str, int]],
+                       history: set[int]) -> dict:
+    '''Returns everything the engine is checked on in the position, computed with flood fills'''
+    moves, suicides, captures, children = [], [], {}, {}
+    for index, cell in enumerate(board):
+        if cell != '-':
+            continue
+        new_board, captured = reference_move(board, graph, index, piece)
+        if new_board is None:
+            suicides.append(index)
+            continue
+        moves.append(index)
+        children[index] = new_board
+        if captured:
+            captures[index] = captured
+    territory = reference_territory(board, graph)
+    return {
+        'moves': moves,
+        'suicides': suicides,
+        'captures': captures,
+        'children': children,
+        'superko_moves': [move for move in moves if hash_board(table, children[move]) not in history],
+        'liberties': {index: len([cell for cell in flood_fill(board, graph, index)[1] if board[cell] == '-'])
+                      for index in range(len(board)) if board[index] != '-'},
+        'territory': territory,
+        'score': territory.count('x') - territory.count('o'),
+        'hash': hash_board(table, board),
+    }
+
+
+def check(condition: bool, what: str, name: str, board: str):
+    '''Raises an AssertionError naming the engine, the query and the board if condition is False'''
+    if not condition:
+        raise AssertionError(f"{name} disagrees with the reference on {what} for the board {board}")
+
+
+def check_engine(move_manager: MoveManager, name: str, board: str, piece: str, history: set[int],
+                 expected: dict, rng: random.Random):
+    '''Compares the queries of the move manager on the position with the reference'''
+    valid_moves, suicide_moves, captures = move_manager.classify_moves(board, piece)
+    check(sorted(valid_moves) == expected['moves'], 'the legal moves', name, board)
+    check(sorted(suicide_moves) == expected['suicides'], 'the suicides', name, board)
+    check({move: sorted(stones) for move, stones in captures.items()} == expected['captures'], 'the captures',
+          name, board)
+    check(sorted(move_manager.get_next_moves(board, piece, history)) == expected['superko_moves'], 'superko',
+          name, board)
+    check(move_manager.get_hash(board) == expected['hash'], 'the hash', name, board)
+    for index in rng.sample(sorted(expected['liberties']), min(4, len(expected['liberties']))):
+        check(move_manager.get_liberty_count(board, index) == expected['liberties'][index], 'the liberties',
+              name, board)
+    check(move_manager.create_territory(board) == expected['territory'], 'the territory', name, board)
+    check(move_manager.get_territory_score(board) == expected['score'], 'the territory score', name, board)
+    # Sibling moves from the same board, with and without the captures given
+    for move in rng.sample(expected['moves'], min(3, len(expected['moves']))):
+        given = captures.get(move, []) if rng.random() < 0.5 else None
+        check(move_manager.make_move(board, move, piece, given) == expected['children'][move], 'make_move',
+              name, board)
+        check(move_manager.is_valid_move(board, move, piece), 'is_valid_move', name, board)
+
+
+def check_search_board(search_board, name: str, positions: list[tuple[str, str, dict]], moves: list[int],
+                       rng: random.Random):
+    '''
+    Takes back a random number of the moves played on the search board, checking every
+    position on the way against the reference, and plays them again
+    Parameters:
+    search_board (Union[BoardState, BitboardState]): The search board following the game
+    name (str): The name of the engine
+    positions (list[tuple[str, str, dict]]): (board, piece to move, reference) of every
+    position of the game so far, the last one being the position of the search board
+    moves (list[int]): The moves played from every position but the last
+    rng (random.Random): The random number generator
+    '''
+    board, _, expected = positions[-1]
+    check(search_board.board == board, 'the board after play', name, board)
+    check(search_board.territory_score() == expected['score'], 'the territory score after play', name, board)
+    steps = rng.randint(1, min(8, len(moves)))
+    for board, piece, expected in reversed(positions[-1 - steps:-1]):
+        search_board.undo()
+        check(search_board.board == board, 'the board after undo', name, board)
+        check(search_board.hash == expected['hash'], 'the hash after undo', name, board)
+        if rng.random() < 0.5: # Otherwise the territory is left to be taken back further first
+            check(search_board.territory_score() == expected['score'], 'the territory score after undo', name, board)
+        check(sorted(search_board.classify_moves(piece)[0]) == expected['moves'], 'the legal moves after undo',
+              name, board)
+    for position in range(len(moves) - steps, len(moves)):
+        _, piece, expected = positions[position]
+        search_board.play(moves[position], piece, expected['captures'].get(moves[position], []))
+
+
+def check_game(board_size: int, seed: int, max_moves: int) -> int:
+    '''
+    Plays a random game with the reference rules, checking the engines on every position
+    Returns:
+    The number of positions checked
+    '''
+    rng = random.Random(seed)
+    engines = {f"{backend}{' cached' if cached else ''}": MoveManager(board_size, backend, CACHE_SIZES if cached else None)
+               for backend in MoveManager.BACKENDS for cached in (False, True)}
+    reference = MoveManager(board_size)
+    graph, table = reference.GRAPH, reference.ZOBRIST_TABLE
+    board = reference.get_empty_board()
+    piece = 'x'
+    search_boards = {name: move_manager.get_search_board(board) for name, move_manager in engines.items()}
+    history: set[int] = {hash_board(table, board)}
+    positions: list[tuple[str, str, dict]] = []
+    moves: list[int] = []
+    for _ in range(max_moves):
+        expected = reference_position(board, graph, piece, table, history)
+        positions.append((board, piece, expected))
+        for name, move_manager in engines.items():
+            check_engine(move_manager, name, board, piece, history, expected, rng)
+            if moves and rng.random() < 0.2:
+                check_search_board(search_boards[name], name, positions, moves, rng)
+        if not expected['superko_moves'] or rng.random() < 0.02:
+            if moves and moves[-1] == -1:
+                break # Both players passed
+            move = -1
+        else:
+            move = rng.choice(expected['superko_moves'])
+            board = expected['children'][move]
+        for search_board in search_boards.values():
+            search_board.play(move, piece, expected['captures'].get(move, []))
+        moves.append(move)
+        history.add(hash_board(table, board))
+        piece = other_piece(piece)
+    return len(positions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 9, 13])
+    parser.add_argument('--games', type=int, default=3, help="Games per board size")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for board_size in args.sizes:
+        positions = sum(check_game(board_size, args.seed + game, 2 * board_size * board_size)
+                        for game in range(args.games))
+        print(f"{board_size}x{board_size}: {positions} positions agree on {len(MoveManager.BACKENDS) * 2} engines")
+
+
+if __name__ == '__main__':
+    main()
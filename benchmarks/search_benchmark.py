@@ -0,0 +1,113 @@
+'''
+Measures the nodes per second of a depth limited negamax that allocates a new board string
+per node through MoveManager.make_move (how the minimax bots used to search) against one that
+plays and undoes moves on a single search board, and of MinimaxBot itself.
+Run from the root of the repository with: python -m benchmarks.search_benchmark
+'''
+import argparse
+import time
+from game_implementation.rules_implementation import MoveManager
+from game_bots.minimax_bot import MinimaxBot
+from benchmarks.bench_utils import generate_random_games, other_piece
+
+
+def territory_count(move_manager: MoveManager, board: str, piece: str) -> int:
+    '''Returns the territory of piece minus the territory of its opponent'''
+    territory_str = move_manager.create_territory(board)
+    return territory_str.count(piece) - territory_str.count(other_piece(piece))
+
+
+def search_with_strings(move_manager: MoveManager, board: str, piece: str, depth: int) -> tuple[int, int]:
+    '''
+    Negamax that creates a new board string for every child
+    Returns:
+    (evaluation, nodes searched)
+    '''
+    if depth == 0:
+        return territory_count(move_manager, board, piece), 1
+    nodes = 1
+    best = None
+    for move in move_manager.get_next_moves(board, piece):
+        new_board = move_manager.make_move(board, move, piece)
+        evaluation, child_nodes = search_with_strings(move_manager, new_board, other_piece(piece), depth - 1)
+        nodes += child_nodes
+        if best is None or -evaluation > best:
+            best = -evaluation
+    return (best if best is not None else 0), nodes
+
+
+def search_with_undo(search_board, piece: str, depth: int) -> tuple[int, int]:
+    '''
+    Negamax that plays and undoes the moves on a single search board, which also keeps the
+    territory score of the leaves up to date
+    Returns:
+    (evaluation, nodes searched)
+    '''
+    if depth == 0:
+        territory_score = search_board.territory_score()
+        return (territory_score if piece == 'x' else -territory_score), 1
+    nodes = 1
+    best = None
+    valid_moves, _, captures = search_board.classify_moves(piece)
+    for move in valid_moves:
+        search_board.play(move, piece, captures.get(move, []))
+        evaluation, child_nodes = search_with_undo(search_board, other_piece(piece), depth - 1)
+        search_board.undo()
+        nodes += child_nodes
+        if best is None or -evaluation > best:
+            best = -evaluation
+    return (best if best is not None else 0), nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=9)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--positions', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    move_manager = MoveManager(args.size)
+    # Middle game positions: the position after a third of the cells have been played
+    games = generate_random_games(args.size, args.positions, args.seed, args.size * args.size // 3)
+    positions = []
+    for moves in games:
+        board = move_manager.get_empty_board()
+        piece = 'x'
+        for move in moves:
+            board = move_manager.make_move(board, move, piece)
+            piece = other_piece(piece)
+        positions.append((board, piece))
+
+    print(f"{'search':>12} {'nodes':>9} {'seconds':>9} {'nodes/s':>9}")
+    results = {}
+    for name in ('make_move', 'play/undo'):
+        nodes = 0
+        evaluations = []
+        start = time.perf_counter()
+        for board, piece in positions:
+            if name == 'make_move':
+                evaluation, n = search_with_strings(move_manager, board, piece, args.depth)
+            else:
+                search_board = move_manager.get_search_board(board)
+                evaluation, n = search_with_undo(search_board, piece, args.depth)
+            nodes += n
+            evaluations.append(evaluation)
+        seconds = time.perf_counter() - start
+        results[name] = evaluations
+        print(f"{name:>12} {nodes:>9} {seconds:>9.3f} {nodes / seconds:>9.0f}")
+    if results['make_move'] != results['play/undo']:
+        raise AssertionError("The two searches disagree")
+
+    nodes = 0
+    start = time.perf_counter()
+    for board, piece in positions:
+        bot = MinimaxBot(move_manager, piece)
+        bot.make_move(board, False)
+        nodes += bot.nodes_searched
+    seconds = time.perf_counter() - start
+    print(f"{'MinimaxBot':>12} {nodes:>9} {seconds:>9.3f} {nodes / seconds:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
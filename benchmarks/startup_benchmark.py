@@ -0,0 +1,72 @@
+'''
+Measures the start up time of the headless path (GameRunner, the engine and an engine bot from
+the registry) in fresh interpreters, and checks that it does not import pygame. The import
+times come from python -X importtime and the slowest imports are listed.
+Run from the root of the repository with: python -m benchmarks.startup_benchmark
+'''
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HEADLESS_CODE = '''
+import sys
+from game_implementation.game_play_manager import GameRunner
+from game_implementation.rules_implementation import MoveManager
+from game_bots.registry import get_bot
+GameRunner(get_bot('mcts'), get_bot('minimax'), MoveManager(9))
+assert 'pygame' not in sys.modules, 'pygame was imported'
+'''
+
+GUI_CODE = '''
+import pygame
+import display_class
+import game_bots.human_bot
+'''
+
+
+def run(code: str) -> tuple[float, list[tuple[int, str]]]:
+    '''
+    Runs code in a fresh interpreter with -X importtime
+    Returns:
+    A tuple (wall time in seconds, list of (cumulative import time in us, module) of the top
+    level imports)
+    '''
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, env=env)
+    seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '): # Nested imports are indented by two more spaces per level
+            imports.append((int(cumulative), name.strip()))
+    return seconds, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8)
+    args = parser.parse_args()
+
+    for name, code in (('headless', HEADLESS_CODE), ('gui', GUI_CODE)):
+        try:
+            timings = [run(code) for _ in range(args.runs)]
+        except RuntimeError as error:
+            print(f"{name}: failed ({error})")
+            continue
+        best_seconds, imports = min(timings)
+        print(f"{name}: best of {args.runs} runs {best_seconds * 1000:.0f} ms, "
+              f"imports {sum(us for us, _ in imports) / 1000:.0f} ms")
+        for us, module in sorted(imports, reverse=True)[:args.top]:
+            print(f"    {us / 1000:>7.1f} ms {module}")
+
+
+if __name__ == '__main__':
+    main()
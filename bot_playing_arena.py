@@ -1,10 +1,34 @@
+'''
+Plays a single game between two bots, e.g.
+python bot_playing_arena.py --x human --o mcts --size 9
+Games with a human, or with --gui, are played in a window where the bots think in the
+background. Other games run headless.
+'''
+import argparse
 from game_implementation.game_play_manager import GameRunner
-from game_bots.human_bot import HumanBot
-from game_bots.debug_bot import DebugBot
-from game_bots.mcts_with_heuristics import HeuristicMCTSBot
-from game_bots.minimax_bot import MinimaxBot
 from game_implementation.rules_implementation import MoveManager
+from game_bots.registry import available_bots, get_bot
 
-move_manager = MoveManager(9)
-game_runner = GameRunner(HumanBot, HeuristicMCTSBot, move_manager)
-game_runner.start_game()
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--x', choices=available_bots(), default='human', help="The bot playing black")
+    parser.add_argument('--o', choices=available_bots(), default='mcts', help="The bot playing white")
+    parser.add_argument('--size', type=int, default=9)
+    parser.add_argument('--gui', action='store_true', help="Show a game between engine bots in a window")
+    args = parser.parse_args()
+
+    move_manager = MoveManager(args.size)
+    if args.gui or 'human' in (args.x, args.o):
+        # Imported here so that headless games do not need pygame
+        from gui_game_runner import GuiGameRunner, MouseBot
+        bot_x = MouseBot if args.x == 'human' else get_bot(args.x)
+        bot_o = MouseBot if args.o == 'human' else get_bot(args.o)
+        result = GuiGameRunner(bot_x, bot_o, move_manager).run()
+    else:
+        result = GameRunner(get_bot(args.x), get_bot(args.o), move_manager).start_game()
+    print(f"Result: {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import pygame
+from typing import Optional
 from game_implementation.rules_implementation import MoveManager
 
 class VisualInterface:
@@ -39,6 +40,16 @@ class VisualInterface:
         self.font = pygame.font.Font(None, 36)
         self.result_font = pygame.font.Font(None, 72)
 
+        # Everything that does not depend on the position is drawn once
+        self.grid_surface = self.create_grid_surface()
+        self.label_surface = self.create_label_surface()
+        self.cell_sprites = self.create_cell_sprites()
+
+        # What is on the screen, so that only the cells that change are redrawn
+        self.drawn_cells: Optional[list[tuple]] = None # None when the screen must be redrawn entirely
+        self.drawn_pass_indicator = False
+        self.territory_cache: tuple[str, str] = ('', '') # (board, territory_str) of the last territory computed
+
     def display_result(self, result: str):
         '''
         This function displays the result of the game
@@ -48,6 +59,8 @@ class VisualInterface:
         # Fill screen with background color
         self.screen.fill(self.BACKGROUND_COLOR)
 
+        self.drawn_cells = None # The board has been covered
+
         # Render winner text
         text_surface = self.result_font.render(result, True, self.RED)
 
@@ -55,6 +68,75 @@ class VisualInterface:
         text_rect = text_surface.get_rect(center=(self.width // 2, self.height // 2))
         self.screen.blit(text_surface, text_rect)
 
+    def create_grid_surface(self) -> pygame.Surface:
+        """
+        Draws the empty board with its grid lines
+        Returns:
+        The surface of the empty board
+        """
+        surface = pygame.Surface((self.width, self.height))
+        surface.fill(self.BACKGROUND_COLOR)
+        for i in range(self.board_size):
+            pygame.draw.line(surface, self.LINE_COLOR, (i * self.cell_size + self.cell_size // 2, self.cell_size // 2),
+                            (i * self.cell_size + self.cell_size // 2, self.height - self.cell_size // 2), 2)
+            pygame.draw.line(surface, self.LINE_COLOR, (self.cell_size // 2, i * self.cell_size + self.cell_size // 2),
+                            (self.width - self.cell_size // 2, i * self.cell_size + self.cell_size // 2), 2)
+        return surface
+
+    def create_label_surface(self) -> pygame.Surface:
+        """
+        Draws the row and column labels on a transparent surface, so they can be put back on
+        top of the stones of a redrawn cell
+        Returns:
+        The surface of the labels
+        """
+        surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+        for i in range(self.board_size):
+            # Draw numbers for rows (1 at the bottom, 9 at the top)
+            text_surface = self.font.render(str(self.board_size - i), True, self.RED)
+            surface.blit(text_surface, (0, i * self.cell_size + self.cell_size // 2 - text_surface.get_height() // 2))
+
+            # Draw numbers for columns
+            text_surface = self.font.render(chr(ord('A') + i), True, self.RED)
+            surface.blit(text_surface, (i * self.cell_size + self.cell_size // 2 - text_surface.get_width() // 2, 0))
+        return surface
+
+    def create_cell_sprites(self) -> dict[str, pygame.Surface]:
+        """
+        Draws the stones and the territory markers once, each on a transparent cell sized surface
+        Returns:
+        The sprites by 'x' and 'o' for the stones, 'territory x' and 'territory o' for the territories
+        """
+        center = (self.cell_size // 2, self.cell_size // 2)
+        sprites = dict()
+        for name in ('x', 'o', 'territory x', 'territory o'):
+            sprites[name] = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
+        pygame.draw.circle(sprites['x'], self.BLACK, center, self.PIECE_RADIUS)
+        pygame.draw.circle(sprites['o'], self.WHITE, center, self.PIECE_RADIUS)
+        pygame.draw.circle(sprites['o'], self.BLACK, center, self.PIECE_RADIUS, 2)  # Outline for white piece
+        pygame.draw.circle(sprites['territory x'], (0, 0, 0, self.TERRITORY_ALPHA), center, self.PIECE_RADIUS)
+        pygame.draw.circle(sprites['territory o'], (255, 255, 255, self.TERRITORY_ALPHA), center, self.PIECE_RADIUS)
+        return sprites
+
+    def get_cell_rect(self, index: int) -> pygame.Rect:
+        """
+        Returns the area of the screen covered by a cell
+        Parameters:
+        index (int): The 1D board index
+        """
+        row, col = divmod(index, self.board_size)
+        return pygame.Rect(col * self.cell_size, (self.board_size - 1 - row) * self.cell_size, self.cell_size, self.cell_size)  # Adjust for Go's coordinate system
+
+    def get_territory(self, board: str) -> str:
+        """
+        Returns the territory string of the board, computing it only when the board changed
+        Parameters:
+        board (str): The go board
+        """
+        if self.territory_cache[0] != board:
+            self.territory_cache = (board, self.move_manager.create_territory(board))
+        return self.territory_cache[1]
+
     def draw_pass_indicator(self):
         """
         Draws a small blue dot in the bottom-right corner to indicate that a player has passed.
@@ -70,19 +152,10 @@ class VisualInterface:
         Parameters:
         board (str): The go board
         """
-        territory_surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)  # Create a transparent surface
+        territory_str = self.get_territory(board)
         for i in range(self.board_size * self.board_size):
-            row, col = divmod(i, self.board_size)
-            x = col * self.cell_size + self.cell_size // 2
-            y = (self.board_size - 1 - row) * self.cell_size + self.cell_size // 2  # Adjust for Go's coordinate system
-            territory_str = self.move_manager.create_territory(board)
-            if territory_str[i] == 'x':  # Black territory
-                pygame.draw.circle(territory_surface, (0, 0, 0, self.TERRITORY_ALPHA), (x, y), self.PIECE_RADIUS)
-            elif territory_str[i] == 'o':  # White territory
-                pygame.draw.circle(territory_surface, (255, 255, 255, self.TERRITORY_ALPHA), (x, y), self.PIECE_RADIUS)
-
-        # Blit the territory surface onto the screen
-        self.screen.blit(territory_surface, (0, 0))
+            if territory_str[i] != '-':
+                self.screen.blit(self.cell_sprites['territory ' + territory_str[i]], self.get_cell_rect(i))
 
     def draw_board(self, board: str):
         """
@@ -90,37 +163,52 @@ class VisualInterface:
         Parameters:
         board (str): The go board
         """
-        self.screen.fill(self.BACKGROUND_COLOR)
-
-        # Draw grid lines
-        for i in range(self.board_size):
-            pygame.draw.line(self.screen, self.LINE_COLOR, (i * self.cell_size + self.cell_size // 2, self.cell_size // 2), 
-                            (i * self.cell_size + self.cell_size // 2, self.height - self.cell_size // 2), 2)
-            pygame.draw.line(self.screen, self.LINE_COLOR, (self.cell_size // 2, i * self.cell_size + self.cell_size // 2), 
-                            (self.width - self.cell_size // 2, i * self.cell_size + self.cell_size // 2), 2)
-
-        # Draw pieces
+        self.screen.blit(self.grid_surface, (0, 0))
         for i in range(self.board_size * self.board_size):
-            cell = board[i]
-            row, col = divmod(i, self.board_size)
-            x = col * self.cell_size + self.cell_size // 2
-            y = (self.board_size - 1 - row) * self.cell_size + self.cell_size // 2  # Adjusted for Go's coordinate system
-
-            if cell == 'x':  # Black piece
-                pygame.draw.circle(self.screen, self.BLACK, (x, y), self.PIECE_RADIUS)
-            elif cell == 'o':  # White piece
-                pygame.draw.circle(self.screen, self.WHITE, (x, y), self.PIECE_RADIUS)
-                pygame.draw.circle(self.screen, self.BLACK, (x, y), self.PIECE_RADIUS, 2)  # Outline for white piece
-
-        # Draw labels
-        for i in range(self.board_size):
-            # Draw numbers for rows (1 at the bottom, 9 at the top)
-            text_surface = self.font.render(str(self.board_size - i), True, self.RED)
-            self.screen.blit(text_surface, (0, i * self.cell_size + self.cell_size // 2 - text_surface.get_height() // 2))
+            if board[i] != '-':
+                self.screen.blit(self.cell_sprites[board[i]], self.get_cell_rect(i))
+        self.screen.blit(self.label_surface, (0, 0))
+        self.drawn_cells = None # Redrawn without tracking the cells
 
-            # Draw numbers for columns
-            text_surface = self.font.render(chr(ord('A') + i), True, self.RED)
-            self.screen.blit(text_surface, (i * self.cell_size + self.cell_size // 2 - text_surface.get_width() // 2, 0))
+    def render(self, board: str, display_territory: bool = False, pass_indicator: bool = False) -> list[pygame.Rect]:
+        """
+        Brings the screen up to date with the board, redrawing only the cells that changed since
+        the last render. The caller shows the changes with pygame.display.update(dirty_rects).
+        Parameters:
+        board (str): The go board
+        display_territory (bool): Whether to show the territories
+        pass_indicator (bool): Whether to show the pass indicator
+        Returns:
+        The dirty rectangles, i.e. the areas of the screen that were redrawn
+        """
+        n_cells = self.board_size * self.board_size
+        territory_str = self.get_territory(board) if display_territory else '-' * n_cells
+        cells = list(zip(board, territory_str))
+        corner = self.board_size - 1 # The pass indicator is drawn in the bottom-right cell
+        full_redraw = self.drawn_cells is None
+        if full_redraw:
+            dirty = list(range(n_cells))
+        else:
+            dirty = [i for i in range(n_cells) if cells[i] != self.drawn_cells[i]]
+            if pass_indicator != self.drawn_pass_indicator and corner not in dirty:
+                dirty.append(corner)
+
+        dirty_rects = []
+        for i in dirty:
+            rect = self.get_cell_rect(i)
+            self.screen.blit(self.grid_surface, rect, rect)
+            stone, territory = cells[i]
+            if stone != '-':
+                self.screen.blit(self.cell_sprites[stone], rect)
+            self.screen.blit(self.label_surface, rect, rect)
+            if territory != '-':
+                self.screen.blit(self.cell_sprites['territory ' + territory], rect)
+            if i == corner and pass_indicator:
+                self.draw_pass_indicator()
+            dirty_rects.append(rect)
+        self.drawn_cells = cells
+        self.drawn_pass_indicator = pass_indicator
+        return [self.screen.get_rect()] if full_redraw else dirty_rects
 
     def get_cell_index(self, pos: tuple[float, float]) -> int:
         """
@@ -0,0 +1,267 @@
+from game_implementation.rules_implementation import MoveManager
+from game_implementation.board_state import BoardState
+from game_bots.minimax_bot import MinimaxBot
+from typing import Optional
+import random
+import time
+
+# Types of values stored in the transposition table
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+WIN = 1e9
+
+
+class SearchTimeout(Exception):
+    '''Raised inside the search when the time budget of the move has run out'''
+
+
+class AlphaBetaBot(MinimaxBot):
+    '''
+    This bot implements an alpha-beta search with iterative deepening under a time budget per
+    move. It keeps a bounded transposition table and orders moves using the best move of the
+    previous iteration, killer moves and the history heuristic.
+    '''
+    def __init__(self, move_manager: MoveManager, my_piece: str, time_per_move: float = 1.0,
+                 max_depth: int = 32, tt_size: int = 1 << 16, symmetric_tt: bool = False):
+        '''
+        Initializes the bot
+        Parameters:
+        move_manager (MoveManager): The move manager object
+        my_piece (str): The piece of the bot
+        time_per_move (float): The most seconds to search for a single move (as in HeuristicMCTSBot)
+        max_depth (int): The deepest iteration to search
+        tt_size (int): The number of entries of the transposition table
+        symmetric_tt (bool): Whether to key the transposition table by the canonical key of the
+        position (see MoveManager.get_canonical_key), so symmetric positions share entries
+        '''
+        super().__init__(move_manager, my_piece)
+        self.time_per_move = time_per_move
+        self.max_depth = max_depth
+        self.symmetric_tt = symmetric_tt
+        # Each slot holds (key, depth, value, value type, best move)
+        self.transposition_table: list[Optional[tuple]] = [None] * tt_size
+        # The hash of a board does not include whose turn it is or whether the last move was
+        # a pass, so these are mixed into the transposition table keys
+        rng = random.Random(1)
+        self.SIDE_KEY = rng.getrandbits(64)
+        self.PASS_KEY = rng.getrandbits(64)
+        self.search_reports: list[dict] = [] # One report per move made
+        self.search_depth = 0 # Depth of the iteration being searched
+
+    def final_eval(self, board: str, my_piece: str, territory_score: Optional[int] = None) -> float:
+        '''
+        Returns the result of the game after both players passed from the perspective of the
+        player placing my_piece (territory_score as in board_eval)
+        '''
+        if territory_score is None:
+            territory_score = self.move_manager.get_territory_score(board)
+        ct = territory_score if my_piece == 'x' else -territory_score
+        return WIN if ct > 0 else -WIN if ct < 0 else 0
+
+    def order_moves(self, valid_moves: list[int], tt_move: Optional[int], ply: int) -> list[int]:
+        '''
+        Orders the moves so that the ones likely to cause a cutoff are searched first: the
+        best move stored in the transposition table, then the killer moves of this ply, then
+        the rest by history score. Passing is tried last.
+        Parameters:
+        valid_moves (list[int]): The valid moves of the position
+        tt_move (Optional[int]): The best move found for the position in an earlier iteration
+        ply (int): The distance from the root
+        Returns:
+        The ordered list of moves, including the pass (-1)
+        '''
+        history_scores = self.history_scores
+        ordered = sorted(valid_moves, key=lambda move: -history_scores[move])
+        first_moves = [move for move in self.killer_moves[ply] if move is not None and move in valid_moves]
+        if tt_move is not None and (tt_move == -1 or tt_move in valid_moves):
+            first_moves = [tt_move] + [move for move in first_moves if move != tt_move]
+        for move in first_moves:
+            if move != -1:
+                ordered.remove(move)
+        if -1 not in first_moves:
+            ordered.append(-1)
+        return first_moves + ordered
+
+    def alpha_beta(self, search_board: BoardState, my_piece: str, other_pass: bool, depth: int,
+                   alpha: float, beta: float, ply: int, hashes: Optional[list[int]] = None) -> tuple[int, float]:
+        '''
+        Performs a "depth" deep negamax search with alpha-beta pruning
+        Parameters:
+        search_board (BoardState): The go board (see MoveManager.get_search_board)
+        my_piece (str): The piece to be placed
+        other_pass (bool): Whether or not the other player has passed
+        depth (int): The depth left to be explored
+        alpha (float): The value the player to move is already assured of
+        beta (float): The value the opponent is already assured of
+        ply (int): The distance from the root
+        hashes (Optional[list[int]]): The symmetric hashes of the board (see
+        MoveManager.get_symmetric_hashes), needed with symmetric_tt
+        Returns:
+        A tuple (move, eval), where move is the best move to make and eval is the evaluation
+        '''
+        # The nodes and the leaves are only counted here, the statistics are filled in by make_move
+        self.nodes_searched += 1
+        stats = self.search_stats
+        if self.can_stop and self.nodes_searched % 64 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        move_manager = self.move_manager
+        if self.symmetric_tt:
+            # The moves stored in the table are in the canonical orientation of the position
+            position_key, symmetry = move_manager.canonical_key(hashes)
+        else:
+            position_key = search_board.hash
+        key = position_key ^ (self.SIDE_KEY if my_piece == 'o' else 0) ^ (self.PASS_KEY if other_pass else 0)
+        slot = key % len(self.transposition_table)
+        entry = self.transposition_table[slot]
+        tt_move = None
+        self.tt_probes += 1
+        if entry is not None and entry[0] == key:
+            self.tt_hits += 1
+            _, entry_depth, entry_value, entry_type, tt_move = entry
+            if self.symmetric_tt and tt_move is not None:
+                tt_move = move_manager.from_canonical_move(tt_move, symmetry)
+            if entry_depth >= depth and ply > 0:
+                if tt_move is None:
+                    tt_move = -2 # A leaf evaluation, as returned by the search at depth 0
+                if entry_type == EXACT:
+                    return (tt_move, entry_value)
+                elif entry_type == LOWER_BOUND:
+                    alpha = max(alpha, entry_value)
+                else:
+                    beta = min(beta, entry_value)
+                if alpha >= beta:
+                    return (tt_move, entry_value)
+
+        board = search_board.board
+        # The score is only needed after a pass and at the leaves, so the interior nodes skip it
+        territory_score = search_board.territory_score() if other_pass or depth == 0 else None
+        if other_pass and self.board_eval(board, my_piece, other_pass, territory_score) == WIN:
+            return (-1, WIN) # We can just pass and we win
+        if depth == 0:
+            # Leaf evaluations are stored too, as the same position is reached by many move orders
+            self.evaluations += 1
+            if stats.time_leaves:
+                start = time.perf_counter()
+                value = self.board_eval(board, my_piece, other_pass, territory_score)
+                stats.add_time('evaluation', time.perf_counter() - start)
+            else:
+                value = self.board_eval(board, my_piece, other_pass, territory_score)
+            if entry is None or entry[0] != key:
+                self.transposition_table[slot] = (key, 0, value, EXACT, None)
+            return (-2, value)
+
+        # Moves that repeat a position are filtered out here (superko)
+        start = time.perf_counter()
+        valid_moves, _, captures = search_board.classify_moves(my_piece, self.search_history)
+        ordered_moves = self.order_moves(valid_moves, tt_move, ply)
+        stats.add_time('expansion', time.perf_counter() - start)
+        stats.count('expansions')
+        stats.record_branching(len(ordered_moves))
+        opponent_piece = 'o' if my_piece != 'o' else 'x'
+        original_alpha = alpha
+        best_move = -1
+        best_value = -float('inf')
+        for move in ordered_moves:
+            if move == -1:
+                if other_pass:
+                    value = self.final_eval(board, my_piece, territory_score) # Both players passed
+                else:
+                    value = -self.alpha_beta(search_board, opponent_piece, True, depth - 1, -beta, -alpha, ply + 1, hashes)[1]
+            else:
+                new_hashes = None
+                if self.symmetric_tt:
+                    new_hashes = move_manager.symmetric_hashes_after_move(hashes, move, my_piece, captures.get(move, []))
+                search_board.play(move, my_piece, captures.get(move, []))
+                new_hash = search_board.hash
+                self.search_history.add(new_hash)
+                value = -self.alpha_beta(search_board, opponent_piece, False, depth - 1, -beta, -alpha, ply + 1,
+                                         new_hashes)[1]
+                self.search_history.remove(new_hash)
+                search_board.undo()
+            if value > best_value:
+                best_value = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                if move != -1:
+                    killers = self.killer_moves[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    self.history_scores[move] += depth * depth
+                stats.count('cutoffs')
+                break
+
+        if best_value <= original_alpha:
+            value_type = UPPER_BOUND
+        elif best_value >= beta:
+            value_type = LOWER_BOUND
+        else:
+            value_type = EXACT
+        # Replace an entry of another position, or a shallower one of the same position
+        if entry is None or entry[0] != key or entry[1] <= depth:
+            stored_move = move_manager.to_canonical_move(best_move, symmetry) if self.symmetric_tt else best_move
+            self.transposition_table[slot] = (key, depth, best_value, value_type, stored_move)
+        return (best_move, best_value)
+
+    def search_progress(self) -> Optional[str]:
+        '''Returns the depth being searched and the number of nodes searched so far'''
+        return f"depth {self.search_depth}, {self.nodes_searched} nodes"
+
+    def make_move(self, board: str, other_pass: bool) -> int:
+        '''Returns the move to make based on the deepest completed iteration of the search'''
+        self.search_stats.begin_move(self.move_manager)
+        start = time.perf_counter()
+        self.deadline = start + self.time_per_move
+        self.previous_states.add(self.move_manager.get_hash(board))
+        self.nodes_searched = 0
+        self.evaluations = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.killer_moves = [[None, None] for _ in range(self.max_depth + 1)]
+        self.history_scores = [0] * (self.move_manager.BOARD_SIZE ** 2)
+        move = -1
+        reached_depth = 0
+        self.can_stop = False # The first iteration always completes
+        for depth in range(1, self.max_depth + 1):
+            self.search_depth = depth
+            # The search works on its own board and history, so an aborted iteration leaves
+            # nothing to clean up
+            search_board = self.move_manager.get_search_board(board)
+            # Scoring the root labels the empty regions once, so the moves below keep them up
+            # to date instead of every leaf labelling them again
+            search_board.territory_score()
+            self.search_history = set(self.previous_states)
+            hashes = self.move_manager.get_symmetric_hashes(board) if self.symmetric_tt else None
+            evaluations = self.evaluations
+            try:
+                move, value = self.alpha_beta(search_board, self.my_piece, other_pass, depth, -float('inf'), float('inf'), 0,
+                                              hashes)
+            except SearchTimeout:
+                break
+            finally:
+                # Every leaf of an iteration is at its full depth
+                self.search_stats.record_depth(depth, self.evaluations - evaluations)
+            reached_depth = depth
+            self.can_stop = True
+            if abs(value) >= WIN or time.perf_counter() > self.deadline:
+                break # Either the result is known or there is no time for another iteration
+
+        seconds = time.perf_counter() - start
+        report = {
+            'depth': reached_depth,
+            'nodes': self.nodes_searched,
+            'seconds': seconds,
+            'nodes_per_second': self.nodes_searched / seconds if seconds > 0 else 0,
+            'tt_hit_rate': self.tt_hits / self.tt_probes if self.tt_probes else 0,
+        }
+        self.search_stats.count('nodes', self.nodes_searched)
+        self.search_stats.count('evaluations', self.evaluations)
+        self.search_stats.count('tt_probes', self.tt_probes)
+        self.search_stats.count('tt_hits', self.tt_hits)
+        self.search_reports.append(report)
+        if move != -1:
+            new_board = self.move_manager.make_move(board, move, self.my_piece)
+            self.previous_states.add(self.move_manager.get_hash(new_board))
+        self.search_stats.end_move(self.move_manager)
+        return move
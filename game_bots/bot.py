@@ -1,7 +1,11 @@
 from game_implementation.rules_implementation import MoveManager
+from game_implementation.instrumentation import SearchStats, profile_call
 from abc import ABC, abstractmethod
+from typing import Optional
 class Bot(ABC):
     '''An abstract class that represents a notion of a bot'''
+    # The statistics of the search of the last move, for the bots that record them
+    search_stats: Optional[SearchStats] = None
     @abstractmethod
     def __init__(self, move_manager: MoveManager, my_piece: str):
         '''Initializes the bot'''
@@ -13,3 +17,44 @@ class Bot(ABC):
     @abstractmethod
     def receive_result(self, result: str):
         '''Receives the result of the game'''
+
+    def search_progress(self) -> Optional[str]:
+        '''
+        Describes the progress of the search of the current move. Called from another thread
+        (e.g. by the GUI) while make_move runs, so it must only read the state of the search.
+        Returns:
+        A short description, or None if the bot does not report its progress
+        '''
+        return None
+
+    def on_opponent_turn(self, board: str):
+        '''
+        Called by the game runner when the opponent starts thinking, so that the bot can use
+        the time (e.g. by pondering). It must not block. The next call to make_move or
+        receive_result ends the opponent's turn.
+        Parameters:
+        board (str): The go board the opponent has to move from
+        '''
+
+    def get_search_stats(self) -> dict:
+        '''
+        Returns the statistics of the search of the last move: counters (e.g. nodes,
+        expansions, evaluations), seconds per phase, depth and branching, and the calls made
+        to the rules engine (see SearchStats.report)
+        Returns:
+        The statistics, empty if the bot does not record any
+        '''
+        return self.search_stats.report() if self.search_stats is not None else {}
+
+    def profile_move(self, board: str, other_pass: bool, profiler: str = 'cprofile', top: int = 20) -> tuple[int, str]:
+        '''
+        Makes a move (see make_move) under a profiler
+        Parameters:
+        board (str): The go board
+        other_pass (bool): Whether the opponent passed
+        profiler (str): 'cprofile' or 'sampling' (see profile_call)
+        top (int): The number of functions to report
+        Returns:
+        A tuple (move, text report of the profile)
+        '''
+        return profile_call(self.make_move, board, other_pass, profiler=profiler, top=top)
@@ -0,0 +1,483 @@
+from game_implementation.rules_implementation import MoveManager
+from game_implementation.batch_territory import boards_to_array
+from game_implementation.instrumentation import SearchStats
+from typing import Callable, Optional
+import numpy as np
+import time
+
+# Bits of MCTSArrayTree.flags
+EXPANDED = 1
+TERMINAL = 2
+
+
+def expanded_to_keep(visits: np.ndarray, n_children: np.ndarray, max_nodes: int) -> np.ndarray:
+    '''
+    Chooses the nodes that stay expanded when a tree is pruned to a node budget: the most
+    visited ones, as long as the tree has at most max_nodes nodes. The others are collapsed
+    into leaves that keep their statistics. A node is never visited more than its parent, and
+    ties are broken by depth, so the parent of a node that stays expanded stays expanded too.
+    Parameters:
+    visits (np.ndarray): The visit counts of the expanded nodes in breadth first order from
+    the root, which comes first
+    n_children (np.ndarray): The number of children of the expanded nodes in the same order
+    max_nodes (int): The node budget. The root always stays expanded.
+    Returns:
+    The boolean mask of the nodes that stay expanded
+    '''
+    order = np.lexsort((np.arange(len(visits)), -np.asarray(visits)))
+    sizes = 1 + np.cumsum(np.asarray(n_children, dtype=np.int64)[order])
+    n_keep = max(1, int(np.searchsorted(sizes, max_nodes, side='right')))
+    keep = np.zeros(len(visits), dtype=bool)
+    keep[order[:n_keep]] = True
+    return keep
+
+
+def prior_order(moves: list[int], captures: dict[int, list[int]], board_size: int) -> list[int]:
+    '''
+    Orders the moves of a node by a cheap prior for progressive widening: moves capturing more
+    stones first, then moves away from the first two lines, and the pass last. Ties keep the
+    order of moves.
+    Parameters:
+    moves (list[int]): The moves, -1 for the pass
+    captures (dict[int, list[int]]): The stones captured by every capturing move (see
+    MoveManager.classify_moves)
+    board_size (int): The length of a side of the board
+    Returns:
+    The moves from the most to the least promising
+    '''
+    def prior(move: int) -> int:
+        if move == -1:
+            return -1
+        y, x = divmod(move, board_size)
+        line = min(x, y, board_size - 1 - x, board_size - 1 - y)
+        return 3 * len(captures.get(move, [])) + min(line, 2)
+    return sorted(moves, key=prior, reverse=True)
+
+
+class MCTSArrayTree:
+    '''
+    An MCTS tree where every node is a row in preallocated numpy arrays (visits, value,
+    parent, first child, number of children, move and flags) instead of an MCTSNode object.
+    The children of a node are stored next to each other, so UCT selection is computed over
+    the sibling slice in one vectorized pass. Boards are not stored on the nodes: only the
+    root board is kept and the boards along the selection path are recomputed by playing
+    and undoing the moves on a search board.
+    This follows the same search as MCTSNode (same values, visit counts and tie breaking).
+    With progressive widening, the children of a node are allocated when it is expanded, but
+    only as a move ordered by prior_order: a child is evaluated the first time it is opened,
+    and the number of open children grows with the visits of the node. n_open holds the
+    number of open children, which are the first ones of the sibling slice. The children
+    that are not open yet take slots in the arrays but are not counted in node_count, like
+    the unopened moves of MCTSNode.
+    '''
+    CHUNK_SIZE = 4096 # Number of nodes the arrays grow by
+    FIELDS = ('N', 'Q', 'parent', 'first_child', 'n_children', 'n_open', 'move', 'flags')
+
+    def __init__(self, move_manager: MoveManager, board: str, other_pass: bool, my_piece: str,
+                 heuristic: Callable[[str, str, bool], float], C: float = 2,
+                 batch_heuristic: Optional[Callable[[np.ndarray, str, np.ndarray], np.ndarray]] = None,
+                 widening: Optional[tuple[float, float]] = None):
+        '''
+        Initializes the tree with a root that has been evaluated with the heuristic
+        Parameters:
+        move_manager (MoveManager): The move manager object
+        board (str): The go board at the root
+        other_pass (bool): Whether the last move played to reach the root was a pass
+        my_piece (str): The piece to be placed at the root
+        heuristic (Callable[[str, str, bool], float]): Evaluates a (board, piece, other_pass)
+        from the perspective of piece, in [-1, 1]
+        C (float): The exploration constant
+        batch_heuristic (Optional[Callable[[np.ndarray, str, np.ndarray], np.ndarray]]): Evaluates
+        a batch of boards at once like heuristic (see HeuristicMCTSBot.batch_heuristic). If given,
+        all the children of a node are evaluated with a single call.
+        widening (Optional[tuple[float, float]]): (k, alpha) to open the children of a node one
+        by one, keeping max(1, int(k * N ** alpha)) of them open for a node visited N times.
+        All the children are evaluated on expansion if None.
+        '''
+        self.move_manager = move_manager
+        self.heuristic = heuristic
+        self.batch_heuristic = batch_heuristic
+        self.widening = widening
+        self.C = C
+        self.capacity = 0
+        self.size = 0
+        self.unopened = 0 # Slots of children that have not been opened yet
+        self.N = np.zeros(0, dtype=np.int64)
+        self.Q = np.zeros(0, dtype=np.float64)
+        self.parent = np.zeros(0, dtype=np.int32)
+        self.first_child = np.zeros(0, dtype=np.int32)
+        self.n_children = np.zeros(0, dtype=np.int16)
+        self.n_open = np.zeros(0, dtype=np.int16)
+        self.move = np.zeros(0, dtype=np.int16)
+        self.flags = np.zeros(0, dtype=np.int8)
+        self.root = self._allocate(1)
+        self.parent[self.root] = -1
+        self.move[self.root] = -2 # The root was not reached through a move of the tree
+        self._set_root_position(board, other_pass, my_piece)
+        result = heuristic(board, my_piece, other_pass)
+        # Same update as MCTSNode.simulate_game on a fresh node
+        self.Q[self.root] = -result
+        self.N[self.root] = 1
+
+    def _set_root_position(self, board: str, other_pass: bool, my_piece: str):
+        '''Stores the position of the root and loads the search board used to walk the tree'''
+        self.root_board = board
+        self.root_other_pass = other_pass
+        self.root_piece = my_piece
+        self.search_board = self.move_manager.get_search_board(board)
+
+    def _allocate(self, count: int) -> int:
+        '''
+        Allocates count consecutive nodes, growing the arrays by whole chunks if needed
+        Parameters:
+        count (int): The number of nodes needed
+        Returns:
+        The index of the first node allocated
+        '''
+        if self.size + count > self.capacity:
+            self._resize(self.size + count)
+        start = self.size
+        self.size += count
+        self.first_child[start:self.size] = -1
+        self.n_children[start:self.size] = 0
+        self.n_open[start:self.size] = 0
+        self.flags[start:self.size] = 0
+        return start
+
+    def _resize(self, count: int):
+        '''
+        Reallocates the node arrays to the whole chunks holding count nodes, keeping the nodes
+        in use. The arrays grow when nodes are allocated and shrink back after a prune.
+        Parameters:
+        count (int): The number of nodes the arrays must hold, at least the size of the tree
+        '''
+        capacity = (count + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE * self.CHUNK_SIZE
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            resized = np.zeros(capacity, dtype=array.dtype)
+            resized[:self.size] = array[:self.size]
+            setattr(self, name, resized)
+        self.capacity = capacity
+
+    @property
+    def nbytes(self) -> int:
+        '''The number of bytes used by the node arrays'''
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
+
+    @property
+    def node_count(self) -> int:
+        '''The number of nodes in the tree, not counting the children that are not open yet'''
+        return self.size - self.unopened
+
+    def is_expanded(self, node: int) -> bool:
+        '''Returns whether the node has been expanded'''
+        return bool(self.flags[node] & EXPANDED)
+
+    def children(self, node: int) -> range:
+        '''Returns the indices of the children of node'''
+        start = int(self.first_child[node])
+        return range(start, start + int(self.n_children[node])) if start != -1 else range(0)
+
+    def find_child(self, node: int, move: int) -> int:
+        '''
+        Returns the child of node reached by playing move, or -1 if there is none
+        '''
+        for child in self.children(node):
+            if self.move[child] == move:
+                return child
+        return -1
+
+    def select_child(self, node: int) -> int:
+        '''
+        Returns the child with the highest UCT preference (see MCTSNode.get_choosing_preference),
+        computed over the whole sibling slice at once
+        '''
+        start = int(self.first_child[node])
+        end = start + int(self.n_open[node])
+        preference = -self.Q[start:end] + self.C * ((np.log(self.N[node]) / self.N[start:end]) ** 0.5)
+        return start + int(np.argmax(preference))
+
+    def expand(self, node: int, my_piece: str, other_pass: bool) -> tuple[float, int]:
+        '''
+        Expands node, whose position must be the current position of the search board, and
+        evaluates all its children with the heuristic (see MCTSNode.expand)
+        Parameters:
+        node (int): The node to expand
+        my_piece (str): The piece to be placed at the node
+        other_pass (bool): Whether the last move played to reach the node was a pass
+        Returns:
+        A tuple (value, number of simulations) to be backed up
+        '''
+        if self.flags[node] & TERMINAL:
+            raise ValueError("Trying to expand a terminal node")
+        if self.flags[node] & EXPANDED:
+            raise ValueError("Already expanded")
+        self.flags[node] |= EXPANDED
+        search_board = self.search_board
+        board = search_board.board
+        valid_moves, _, captures = search_board.classify_moves(my_piece)
+        other_piece = 'x' if my_piece == 'o' else 'o'
+
+        pass_result = None # Value of the pass child if playing it ends the game
+        if other_pass:
+            territory_score = search_board.territory_score()
+            ct = territory_score if my_piece == 'x' else -territory_score
+            if ct > 0:
+                # We have won, the only move that needs to be made is to play pass
+                child = self._allocate(1)
+                self.first_child[node] = child
+                self.n_children[node] = 1
+                self.n_open[node] = 1
+                self.parent[child] = node
+                self.move[child] = -1
+                self.flags[child] = TERMINAL
+                self.Q[child] = -1
+                self.N[child] = 1
+                self.Q[node] = 1
+                self.N[node] += 1
+                return (1, 1)
+            pass_result = 0 if ct == 0 else 1
+
+        if self.widening is not None:
+            return self._allocate_unopened(node, my_piece, [-1] + valid_moves, captures, pass_result)
+        n_extra = 1 + len(valid_moves)
+        start = self._allocate(n_extra)
+        self.first_child[node] = start
+        self.n_children[node] = n_extra
+        self.n_open[node] = n_extra
+        self.parent[start:start + n_extra] = node
+        self.move[start] = -1
+        self.move[start + 1:start + n_extra] = valid_moves
+        self.N[start:start + n_extra] = 1
+
+        # The boards of the children evaluated with the heuristic and whether they follow a pass
+        boards, children_other_pass = [], []
+        if pass_result is None:
+            boards.append(board)
+            children_other_pass.append(True)
+        for move in valid_moves:
+            search_board.play(move, my_piece, captures.get(move, []))
+            boards.append(search_board.board)
+            children_other_pass.append(False)
+            search_board.undo()
+        if self.batch_heuristic is not None:
+            results = self.batch_heuristic(boards_to_array(boards, self.move_manager.BOARD_SIZE), other_piece,
+                                           np.array(children_other_pass, dtype=bool))
+        else:
+            results = [self.heuristic(child_board, other_piece, child_other_pass)
+                       for child_board, child_other_pass in zip(boards, children_other_pass)]
+
+        simul_results = 0
+        first = start
+        if pass_result is not None:
+            self.flags[start] = TERMINAL
+            self.Q[start] = pass_result
+            simul_results += pass_result
+            first += 1
+        for child, result in enumerate(results, first):
+            self.Q[child] = -result
+            simul_results += result
+        self.Q[node] = (self.Q[node] * self.N[node] + simul_results) / (n_extra + self.N[node])
+        return (simul_results / n_extra, n_extra)
+
+    def _allocate_unopened(self, node: int, my_piece: str, moves: list[int], captures: dict[int, list[int]],
+                           pass_result: Optional[float]) -> tuple[float, int]:
+        '''
+        Allocates the children of node without evaluating them, ordered by prior_order, and
+        opens the first one (see expand)
+        '''
+        moves = prior_order(moves, captures, self.move_manager.BOARD_SIZE)
+        start = self._allocate(len(moves))
+        self.first_child[node] = start
+        self.n_children[node] = len(moves)
+        self.parent[start:start + len(moves)] = node
+        self.move[start:start + len(moves)] = moves
+        self.N[start:start + len(moves)] = 0
+        self.Q[start:start + len(moves)] = 0
+        self.unopened += len(moves)
+        if pass_result is not None:
+            pass_child = start + moves.index(-1)
+            self.flags[pass_child] = TERMINAL
+            self.Q[pass_child] = pass_result
+        return self.open_child(node, my_piece)
+
+    def can_open_child(self, node: int) -> bool:
+        '''Returns whether progressive widening lets the expanded node open another child'''
+        if self.widening is None or self.n_open[node] == self.n_children[node]:
+            return False
+        k, alpha = self.widening
+        return self.n_open[node] < max(1, int(k * self.N[node] ** alpha))
+
+    def open_child(self, node: int, my_piece: str) -> tuple[float, int]:
+        '''
+        Evaluates the next unopened child of node, whose position must be the current
+        position of the search board, and adds its result to node
+        Parameters:
+        node (int): The expanded node
+        my_piece (str): The piece to be placed at the node
+        Returns:
+        A tuple (value, number of simulations) to be backed up (see expand)
+        '''
+        child = int(self.first_child[node]) + int(self.n_open[node])
+        self.n_open[node] += 1
+        self.unopened -= 1
+        if self.flags[child] & TERMINAL:
+            result = float(self.Q[child])
+        else:
+            move = int(self.move[child])
+            search_board = self.search_board
+            search_board.play(move, my_piece)
+            other_piece = 'x' if my_piece == 'o' else 'o'
+            result = self.heuristic(search_board.board, other_piece, move == -1)
+            search_board.undo()
+            self.Q[child] = -result
+        self.N[child] = 1
+        self.Q[node] = (self.Q[node] * self.N[node] + result) / (self.N[node] + 1)
+        self.N[node] += 1
+        return (result, 1)
+
+    def simulate(self, stats: Optional[SearchStats] = None):
+        '''
+        Runs one simulation from the root: selects a path down to a leaf, expands it and backs
+        up the result (see MCTSNode.simulate)
+        Parameters:
+        stats (Optional[SearchStats]): The statistics to record the phases of the simulation in
+        '''
+        if stats is not None:
+            start = time.perf_counter()
+        node = self.root
+        my_piece = self.root_piece
+        other_pass = self.root_other_pass
+        path = [node]
+        search_board = self.search_board
+        while True:
+            if self.flags[node] & TERMINAL:
+                if stats is not None:
+                    stats.add_time('selection', time.perf_counter() - start)
+                self.N[node] += 1
+                value, n_extra = float(self.Q[node]), 1
+                break
+            expanded = bool(self.flags[node] & EXPANDED)
+            if not expanded or self.can_open_child(node):
+                if stats is not None:
+                    stats.add_time('selection', time.perf_counter() - start)
+                    # The evaluations are timed on their own (see HeuristicMCTSBot.__init__)
+                    evaluation_seconds = stats.phase_seconds.get('evaluation', 0.0)
+                    start = time.perf_counter()
+                if not expanded:
+                    value, n_extra = self.expand(node, my_piece, other_pass)
+                    if stats is not None:
+                        stats.count('expansions')
+                        stats.record_branching(int(self.n_children[node]))
+                else:
+                    value, n_extra = self.open_child(node, my_piece)
+                if stats is not None:
+                    evaluation_seconds = stats.phase_seconds.get('evaluation', 0.0) - evaluation_seconds
+                    stats.add_time('expansion', time.perf_counter() - start - evaluation_seconds)
+                break
+            node = self.select_child(node)
+            move = int(self.move[node])
+            search_board.play(move, my_piece)
+            other_pass = move == -1
+            my_piece = 'x' if my_piece == 'o' else 'o'
+            path.append(node)
+        if stats is not None:
+            start = time.perf_counter()
+            stats.count('nodes', len(path))
+            stats.record_depth(len(path) - 1)
+        for _ in range(len(path) - 1):
+            search_board.undo()
+        # Back up the result, flipping the perspective at every level
+        for node in reversed(path[:-1]):
+            self.Q[node] = (self.Q[node] * self.N[node] + (-value) * n_extra) / (n_extra + self.N[node])
+            self.N[node] += n_extra
+            value = -value
+        if stats is not None:
+            stats.add_time('backup', time.perf_counter() - start)
+
+    def child_values(self) -> dict[int, tuple[float, int]]:
+        '''
+        Returns the (Q, N) of every open child of the root by the move leading to it. Q is from
+        the perspective of the player who made the move, as in MCTSNode.
+        '''
+        start = int(self.first_child[self.root])
+        return {int(self.move[child]): (float(self.Q[child]), int(self.N[child]))
+                for child in range(start, start + int(self.n_open[self.root]))}
+
+    def advance(self, move: int):
+        '''
+        Makes the child of the root reached by move the new root and compacts its subtree to
+        the front of the arrays, dropping every other node
+        Parameters:
+        move (int): The move played from the root
+        '''
+        new_root = self.find_child(self.root, move)
+        if new_root == -1:
+            raise ValueError(f"The root has no child for the move {move}")
+        board = self.root_board
+        if move != -1:
+            board = self.move_manager.make_move(board, move, self.root_piece)
+        other_piece = 'x' if self.root_piece == 'o' else 'o'
+        self._set_root_position(board, move == -1, other_piece)
+        self._compact(new_root)
+        if self.N[self.root] == 0:
+            # A child that was never opened, evaluated like a new root
+            self.Q[self.root] = -self.heuristic(board, other_piece, move == -1)
+            self.N[self.root] = 1
+
+    def _subtree_order(self, node: int) -> np.ndarray:
+        '''Returns the nodes of the subtree of node breadth first, so every block of siblings is contiguous'''
+        order = [node]
+        i = 0
+        while i < len(order):
+            node = order[i]
+            i += 1
+            if self.n_children[node]:
+                start = int(self.first_child[node])
+                order.extend(range(start, start + int(self.n_children[node])))
+        return np.array(order, dtype=np.int64)
+
+    def _compact(self, new_root: int):
+        '''Makes new_root the root and moves its subtree to the front of the arrays, dropping every other node'''
+        order = self._subtree_order(new_root)
+        new_index = np.full(self.size, -1, dtype=np.int32)
+        new_index[order] = np.arange(len(order), dtype=np.int32)
+        count = len(order)
+        for name in ('N', 'Q', 'n_children', 'n_open', 'move', 'flags'):
+            array = getattr(self, name)
+            array[:count] = array[order]
+        old_first_child = self.first_child[order]
+        self.first_child[:count] = np.where(old_first_child >= 0, new_index[np.maximum(old_first_child, 0)], -1)
+        old_parent = self.parent[order]
+        self.parent[:count] = np.where(old_parent >= 0, new_index[np.maximum(old_parent, 0)], -1)
+        self.size = count
+        self.unopened = int(self.n_children[:count].sum(dtype=np.int64) - self.n_open[:count].sum(dtype=np.int64))
+        self.root = 0
+        self.parent[0] = -1
+
+    def prune(self, max_nodes: int) -> int:
+        '''
+        Collapses the least visited subtrees into leaves that keep their visits and value until
+        the tree has at most max_nodes nodes (see expanded_to_keep and node_count), and compacts
+        the arrays. A collapsed node is expanded again if the search comes back to it. The
+        arrays are shrunk to about twice the nodes left if they are larger, so the memory of the
+        tree stays bounded by the budget rather than by the largest tree it ever held. With
+        progressive widening, the slots of the children that are not open yet come on top of
+        the budget.
+        Parameters:
+        max_nodes (int): The node budget
+        Returns:
+        The number of nodes removed, not counting the children that were not open
+        '''
+        order = self._subtree_order(self.root)
+        expanded = order[(self.flags[order] & EXPANDED) != 0]
+        collapsed = expanded[~expanded_to_keep(self.N[expanded], self.n_open[expanded], max_nodes)]
+        self.first_child[collapsed] = -1
+        self.n_children[collapsed] = 0
+        self.n_open[collapsed] = 0
+        self.flags[collapsed] &= ~EXPANDED
+        node_count = self.node_count
+        self._compact(self.root)
+        if self.capacity > 2 * max(max_nodes, self.size) + self.CHUNK_SIZE:
+            self._resize(2 * max(max_nodes, self.size))
+        return node_count - self.node_count
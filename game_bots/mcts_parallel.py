@@ -0,0 +1,377 @@
+'''
+Parallel MCTS search for HeuristicMCTSBot across a pool of processes, since the rules and the
+heuristic are pure Python and cannot run in parallel under the GIL. Two modes are available:
+- root parallelism: every worker grows its own tree from the root and the visit counts and
+  values of the root children are merged at the end
+- tree parallelism: the workers grow a single tree kept in shared memory, using virtual loss so
+  that concurrent workers spread over different paths
+'''
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+import multiprocessing
+import random
+import time
+import numpy as np
+from game_implementation.rules_implementation import MoveManager
+from game_implementation.batch_territory import boards_to_array
+from game_bots.mcts_array_tree import MCTSArrayTree, EXPANDED, TERMINAL
+from game_bots.mcts_with_heuristics import HeuristicMCTSBot
+
+EXPANDING = 4 # Flag of a node being expanded by a worker
+VIRTUAL_LOSS = 1 # Visits with the worst value added to every node of a path being searched
+
+# Slots of the shared tree header
+SIZE, SIMULATIONS, COLLISIONS = 0, 1, 2
+
+# State of a worker process, set by _init_worker
+_worker: dict = {}
+
+
+class SharedMCTSTree:
+    '''
+    An MCTS tree stored in a fixed size block of shared memory that several processes can
+    attach to. Unlike MCTSArrayTree it stores the sum of the backed up values (W) instead of
+    their mean, so that virtual losses can be added and removed exactly while other workers
+    back up their own results. All reads and writes must hold the lock of the search.
+    '''
+    FIELDS = (('N', np.int64), ('W', np.float64), ('first_child', np.int32), ('n_children', np.int32),
+              ('move', np.int16), ('flags', np.int8))
+    HEADER_SIZE = 4
+
+    def __init__(self, capacity: int, name: Optional[str] = None):
+        '''
+        Creates the shared memory block, or attaches to an existing one
+        Parameters:
+        capacity (int): The most nodes the tree can hold
+        name (Optional[str]): The name of the block to attach to. A new block is created if None.
+        '''
+        self.capacity = capacity
+        n_bytes = 8 * self.HEADER_SIZE + sum(np.dtype(dtype).itemsize * capacity for _, dtype in self.FIELDS)
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=n_bytes)
+        self.name = self.memory.name
+        self.header = np.ndarray((self.HEADER_SIZE,), dtype=np.int64, buffer=self.memory.buf)
+        offset = 8 * self.HEADER_SIZE
+        for field, dtype in self.FIELDS:
+            setattr(self, field, np.ndarray((capacity,), dtype=dtype, buffer=self.memory.buf, offset=offset))
+            offset += np.dtype(dtype).itemsize * capacity
+
+    def reset(self, root_value: float):
+        '''
+        Clears the tree, leaving only an unexpanded root
+        Parameters:
+        root_value (float): The heuristic value of the root from the perspective of the player to move
+        '''
+        self.header[:] = 0
+        self.header[SIZE] = 1
+        self.N[0] = 1
+        self.W[0] = -root_value
+        self.first_child[0] = -1
+        self.n_children[0] = 0
+        self.move[0] = -2
+        self.flags[0] = 0
+
+    def allocate(self, count: int) -> int:
+        '''
+        Allocates count consecutive nodes
+        Returns:
+        The index of the first node, or -1 if the tree is full
+        '''
+        start = int(self.header[SIZE])
+        if start + count > self.capacity:
+            return -1
+        self.header[SIZE] = start + count
+        self.first_child[start:start + count] = -1
+        self.n_children[start:start + count] = 0
+        self.flags[start:start + count] = 0
+        return start
+
+    def select_child(self, node: int, C: float) -> int:
+        '''Returns the child with the highest UCT preference (see MCTSArrayTree.select_child)'''
+        start = int(self.first_child[node])
+        end = start + int(self.n_children[node])
+        visits = self.N[start:end]
+        preference = -self.W[start:end] / visits + C * ((np.log(self.N[node]) / visits) ** 0.5)
+        return start + int(np.argmax(preference))
+
+    def child_statistics(self) -> dict[int, tuple[float, int]]:
+        '''Returns the (Q, N) of every child of the root by move'''
+        start = int(self.first_child[0])
+        if start == -1:
+            return {}
+        return {int(self.move[child]): (float(self.W[child] / self.N[child]), int(self.N[child]))
+                for child in range(start, start + int(self.n_children[0]))}
+
+    def close(self, unlink: bool = False):
+        '''Detaches from the shared memory block, freeing it if unlink'''
+        del self.header
+        for field, _ in self.FIELDS:
+            delattr(self, field)
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def _init_worker(board_size: int, backend: str, tree_name: Optional[str], capacity: int, lock,
+                 simulation_policy: str = 'heuristic'):
+    '''Sets up the move manager (and the shared tree) of a worker process'''
+    move_manager = MoveManager(board_size, backend)
+    _worker['move_manager'] = move_manager
+    _worker['simulation_policy'] = simulation_policy
+    _worker['lock'] = lock
+    _worker['tree'] = SharedMCTSTree(capacity, tree_name) if tree_name is not None else None
+
+
+def _make_heuristic_bot(piece: str):
+    '''Returns a serial HeuristicMCTSBot of the worker used for its evaluation of the leaves'''
+    return HeuristicMCTSBot(_worker['move_manager'], piece, tree_backend='array',
+                            simulation_policy=_worker['simulation_policy'])
+
+
+def _root_parallel_worker(worker_index: int, board: str, other_pass: bool, piece: str, C: float,
+                          seconds: Optional[float], max_simulations: Optional[int]) -> tuple[dict, int]:
+    '''
+    Grows an independent tree from the root until the time or simulation budget is used
+    Parameters:
+    worker_index (int): The index of the worker. Every worker but the first perturbs the
+    exploration constant, since the search is otherwise deterministic and all trees would be the same.
+    board (str): The go board at the root
+    other_pass (bool): Whether the last move was a pass
+    piece (str): The piece to be placed at the root
+    C (float): The exploration constant
+    seconds (Optional[float]): The time budget
+    max_simulations (Optional[int]): The simulation budget of this worker
+    Returns:
+    A tuple (child statistics by move, number of simulations)
+    '''
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    if worker_index > 0:
+        C *= 2 ** random.Random(worker_index).uniform(-1, 1)
+    bot = _make_heuristic_bot(piece)
+    tree = MCTSArrayTree(_worker['move_manager'], board, other_pass, piece, bot.evaluate, C,
+                         batch_heuristic=bot.batch_evaluate)
+    simulations = 0
+    while simulations == 0 or ((max_simulations is None or simulations < max_simulations)
+                               and (deadline is None or time.perf_counter() < deadline)):
+        tree.simulate()
+        simulations += 1
+    return tree.child_values(), simulations
+
+
+def _expand_leaf(bot, search_board, my_piece: str, other_pass: bool) -> tuple[list[int], list[int], list[float]]:
+    '''
+    Computes the children of a leaf of the shared tree without touching the tree (see
+    MCTSArrayTree.expand)
+    Returns:
+    (moves, terminal flags, values) of the children, where a value is Q for the child
+    '''
+    board = search_board.board
+    valid_moves, _, captures = search_board.classify_moves(my_piece)
+    other_piece = 'x' if my_piece == 'o' else 'o'
+    boards, children_other_pass = [], []
+    if other_pass:
+        territory_score = search_board.territory_score()
+        ct = territory_score if my_piece == 'x' else -territory_score
+        if ct > 0:
+            return [-1], [True], [-1.0] # We have won by passing
+        moves, terminal, values = [-1], [True], [0.0 if ct == 0 else 1.0]
+    else:
+        moves, terminal, values = [-1], [False], []
+        boards.append(board)
+        children_other_pass.append(True)
+    for move in valid_moves:
+        search_board.play(move, my_piece, captures.get(move, []))
+        boards.append(search_board.board)
+        children_other_pass.append(False)
+        search_board.undo()
+        moves.append(move)
+        terminal.append(False)
+    if bot.batch_evaluate is not None:
+        batch = boards_to_array(boards, bot.move_manager.BOARD_SIZE)
+        values.extend(-bot.batch_evaluate(batch, other_piece, np.array(children_other_pass, dtype=bool)))
+    else:
+        values.extend(-bot.evaluate(child_board, other_piece, child_other_pass)
+                      for child_board, child_other_pass in zip(boards, children_other_pass))
+    return moves, terminal, values
+
+
+def _tree_parallel_worker(board: str, other_pass: bool, piece: str, C: float, seconds: Optional[float],
+                          max_simulations: Optional[int]) -> int:
+    '''
+    Runs simulations on the shared tree until the shared budget is used. The tree is only
+    locked to select a path and to back up its result, while the children of the leaf are
+    evaluated outside the lock.
+    Returns:
+    The number of simulations run by this worker
+    '''
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    tree: SharedMCTSTree = _worker['tree']
+    lock = _worker['lock']
+    bot = _make_heuristic_bot(piece)
+    search_board = _worker['move_manager'].get_search_board(board)
+    simulations = 0
+    collided = False
+    while True:
+        if collided:
+            time.sleep(0.0005) # Let the other worker finish its expansion
+        with lock:
+            done = int(tree.header[SIMULATIONS])
+            if (max_simulations is not None and done >= max_simulations) or \
+                    (deadline is not None and time.perf_counter() >= deadline and done > 0):
+                return simulations
+            tree.header[SIMULATIONS] += 1
+            node = 0
+            path = [node]
+            while tree.flags[node] & EXPANDED:
+                node = tree.select_child(node, C)
+                path.append(node)
+            for path_node in path:
+                tree.N[path_node] += VIRTUAL_LOSS
+                tree.W[path_node] += VIRTUAL_LOSS # Q is from the perspective of the parent's opponent
+            leaf_flags = int(tree.flags[node])
+            if not leaf_flags & (TERMINAL | EXPANDING):
+                tree.flags[node] |= EXPANDING
+            moves = [int(tree.move[path_node]) for path_node in path[1:]]
+
+        # Walk down to the leaf and evaluate its children outside the lock
+        my_piece, leaf_other_pass = piece, other_pass
+        for move in moves:
+            search_board.play(move, my_piece)
+            leaf_other_pass = move == -1
+            my_piece = 'x' if my_piece == 'o' else 'o'
+        children = None
+        if not leaf_flags & (TERMINAL | EXPANDING):
+            children = _expand_leaf(bot, search_board, my_piece, leaf_other_pass)
+        for _ in moves:
+            search_board.undo()
+
+        with lock:
+            for path_node in path:
+                tree.N[path_node] -= VIRTUAL_LOSS
+                tree.W[path_node] -= VIRTUAL_LOSS
+            collided = False
+            if leaf_flags & TERMINAL:
+                value, n_extra = float(tree.W[node] / tree.N[node]), 1
+                tree.N[node] += 1
+                tree.W[node] += value
+            elif leaf_flags & EXPANDING:
+                # Another worker is expanding this leaf, so give the simulation back and retry
+                tree.header[COLLISIONS] += 1
+                tree.header[SIMULATIONS] -= 1
+                collided = True
+                continue
+            else:
+                child_moves, terminal, values = children
+                start = tree.allocate(len(child_moves))
+                if start == -1:
+                    # The tree is full, so the search of this worker ends here
+                    tree.flags[node] &= ~EXPANDING
+                    tree.header[SIMULATIONS] -= 1
+                    return simulations
+                end = start + len(child_moves)
+                tree.first_child[node] = start
+                tree.n_children[node] = len(child_moves)
+                tree.move[start:end] = child_moves
+                tree.flags[start:end] = [TERMINAL if is_terminal else 0 for is_terminal in terminal]
+                tree.N[start:end] = 1
+                tree.W[start:end] = values
+                tree.flags[node] = EXPANDED
+                # The value of the leaf is the mean result of its children from the perspective
+                # of the player who moved into the leaf (see MCTSNode.expand)
+                value, n_extra = -float(np.mean(values)), len(child_moves)
+                tree.N[node] += n_extra
+                tree.W[node] += value * n_extra
+            for path_node in reversed(path[:-1]):
+                value = -value
+                tree.N[path_node] += n_extra
+                tree.W[path_node] += value * n_extra
+        simulations += 1
+
+
+class ParallelMCTSSearch:
+    '''Runs the search of a move of HeuristicMCTSBot on a pool of worker processes'''
+    MODES = ('root', 'tree')
+
+    def __init__(self, move_manager: MoveManager, n_workers: int, mode: str = 'root', C: float = 2,
+                 tree_capacity: int = 1 << 20, simulation_policy: str = 'heuristic'):
+        '''
+        Initializes the search. The pool is started on the first search.
+        Parameters:
+        move_manager (MoveManager): The move manager object
+        n_workers (int): The number of worker processes
+        mode (str): 'root' for root parallelism, 'tree' for a shared tree with virtual loss
+        C (float): The exploration constant
+        tree_capacity (int): The most nodes of the shared tree (tree mode only)
+        simulation_policy (str): How the workers evaluate the leaves (see HeuristicMCTSBot)
+        '''
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown parallel mode {mode}, expected one of {self.MODES}")
+        self.move_manager = move_manager
+        self.n_workers = n_workers
+        self.mode = mode
+        self.C = C
+        self.tree_capacity = tree_capacity
+        self.simulation_policy = simulation_policy
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.tree: Optional[SharedMCTSTree] = None
+        self.collisions = 0 # Simulations of the last search lost to another worker expanding the same leaf
+
+    def start(self):
+        '''Starts the worker processes'''
+        lock = multiprocessing.Lock()
+        tree_name = None
+        if self.mode == 'tree':
+            self.tree = SharedMCTSTree(self.tree_capacity)
+            tree_name = self.tree.name
+        self.pool = ProcessPoolExecutor(
+            self.n_workers, initializer=_init_worker,
+            initargs=(self.move_manager.BOARD_SIZE, self.move_manager.BACKEND, tree_name, self.tree_capacity, lock,
+                      self.simulation_policy))
+
+    def search(self, board: str, other_pass: bool, piece: str, root_value: float, seconds: Optional[float],
+               max_simulations: Optional[int]) -> tuple[dict[int, tuple[float, int]], int]:
+        '''
+        Searches the position with all the workers
+        Parameters:
+        board (str): The go board
+        other_pass (bool): Whether the last move was a pass
+        piece (str): The piece to be placed
+        root_value (float): The value of the root from the perspective of piece
+        seconds (Optional[float]): The time budget
+        max_simulations (Optional[int]): The simulation budget, shared by all the workers
+        Returns:
+        A tuple (statistics, simulations) where statistics maps every move from the root to
+        its merged (Q, N), Q being from the perspective of the player making the move
+        '''
+        if self.pool is None:
+            self.start()
+        if self.mode == 'tree':
+            self.tree.reset(root_value)
+            futures = [self.pool.submit(_tree_parallel_worker, board, other_pass, piece, self.C, seconds, max_simulations)
+                       for _ in range(self.n_workers)]
+            simulations = sum(future.result() for future in futures)
+            self.collisions = int(self.tree.header[COLLISIONS])
+            return self.tree.child_statistics(), simulations
+
+        per_worker = None if max_simulations is None else max(1, max_simulations // self.n_workers)
+        futures = [self.pool.submit(_root_parallel_worker, index, board, other_pass, piece, self.C, seconds, per_worker)
+                   for index in range(self.n_workers)]
+        merged: dict[int, list[float]] = {} # From the move to [sum of values, visits]
+        simulations = 0
+        for future in futures:
+            child_values, worker_simulations = future.result()
+            simulations += worker_simulations
+            for move, (Q, N) in child_values.items():
+                totals = merged.setdefault(move, [0.0, 0])
+                totals[0] += Q * N
+                totals[1] += N
+        return {move: (total / visits, visits) for move, (total, visits) in merged.items()}, simulations
+
+    def close(self):
+        '''Stops the worker processes and frees the shared tree'''
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.tree is not None:
+            self.tree.close(unlink=True)
+            self.tree = None
@@ -1,5 +1,14 @@
 from game_implementation.rules_implementation import MoveManager
+from game_implementation.batch_territory import boards_to_array, territory_counts
+from game_implementation.playout_board import PlayoutBoard
 from game_bots.bot import Bot
+from game_bots.mcts_array_tree import MCTSArrayTree, expanded_to_keep, prior_order
+from game_bots.time_manager import TimeManager
+from game_implementation.instrumentation import SearchStats, timed
+from typing import Optional
+import sys
+import threading
+import time
 import numpy as np
 
 class MCTSNode:
@@ -14,25 +23,29 @@ class MCTSNode:
         self.my_piece = my_piece
         self.children_nodes: dict[int, MCTSNode] = dict() # From moves to children nodes
         self.is_expanded = False
+        # With progressive widening, the moves whose children have not been opened yet, the next one last
+        self.unopened_moves: list[int] = []
+        self.unopened_pass: Optional[MCTSNode] = None # The pass child, which is cheap to build
         if is_terminal:
             self.is_terminal = True
             self.Q = result
             return
     
-    def simulate_game(self, heuristic):
+    def simulate_game(self, heuristic, result: Optional[float] = None):
         # Instead of simulating the game, I just use the heuristic function
+        # result is the heuristic value if it was already computed for a whole batch of nodes
         if self.is_terminal:
             self.N += 1
             return self.Q
-        result = heuristic(self.board, self.my_piece, self.other_pass) # Note: heuristic lies in [-1, 1]
+        if result is None:
+            result = heuristic(self.board, self.my_piece, self.other_pass) # Note: heuristic lies in [-1, 1]
         self.Q = self.Q - (result - self.Q) / (self.N + 1)
         self.N += 1
         return result
         
     
-    def expand(self, heuristic) -> tuple[float, int]:
-        if self.N != 1:
-            breakpoint()
+    def expand(self, heuristic, batch_heuristic=None, widening=None) -> tuple[float, int]:
+        # Note: N can be more than 1 here if the node was collapsed by prune
         if self.is_terminal:
             raise ValueError("Trying to expand a terminal node")
         
@@ -41,20 +54,13 @@ class MCTSNode:
         else:
             self.is_expanded = True
             # Expand the node
-            valid_moves = self.move_manager.get_next_moves(self.board, self.my_piece)
+            valid_moves, _, captures = self.move_manager.classify_moves(self.board, self.my_piece)
             other_piece = 'x' if self.my_piece == 'o' else 'o'
 
             # Case 1: other_pass is true
             if self.other_pass:
-                territory_str = self.move_manager.create_territory(self.board)
-                ct = 0
-                for ch in territory_str:
-                    if ch == '-':
-                        continue
-                    elif ch == self.my_piece:
-                        ct += 1
-                    else:
-                        ct -= 1
+                territory_score = self.move_manager.get_territory_score(self.board)
+                ct = territory_score if self.my_piece == 'x' else -territory_score
                 if ct > 0:
                     # We have won, the only move that needs to be made is to play pass
                     # To represent this, we add a terminal child to ourselves, and return 1
@@ -78,40 +84,127 @@ class MCTSNode:
             else:
                 node = MCTSNode(self.board, True, other_piece, self.move_manager)
                 self.children_nodes[-1] = node
+
+            if widening is not None:
+                # Only keep the moves for now, and open the children one by one (see open_child)
+                self.unopened_pass = self.children_nodes.pop(-1)
+                self.unopened_moves = prior_order([-1] + valid_moves, captures, self.move_manager.BOARD_SIZE)[::-1]
+                return self.open_child(heuristic)
             
+            # Playing and undoing on a search board avoids reloading the engine for every child
+            search_board = self.move_manager.get_search_board(self.board)
             for move in valid_moves:
-                new_board = self.move_manager.make_move(self.board, move, self.my_piece)
-                node = MCTSNode(new_board, False, other_piece ,self.move_manager)
+                search_board.play(move, self.my_piece, captures.get(move, []))
+                node = MCTSNode(search_board.board, False, other_piece ,self.move_manager)
+                search_board.undo()
                 self.children_nodes[move] = node
             
             # Now, I will choose all the children and update their heuristic stuff
+            batch_results = dict()
+            if batch_heuristic is not None:
+                # Evaluate all the non terminal children in one go
+                moves = [move for move in self.children_nodes if not self.children_nodes[move].is_terminal]
+                batch = boards_to_array([self.children_nodes[move].board for move in moves], self.move_manager.BOARD_SIZE)
+                other_pass = np.array([self.children_nodes[move].other_pass for move in moves], dtype=bool)
+                batch_results = dict(zip(moves, batch_heuristic(batch, other_piece, other_pass)))
             simul_results = 0
             for move in self.children_nodes:
                 # Simulate the child stuff for all of these moves
-                simul_results += self.children_nodes[move].simulate_game(heuristic)
+                simul_results += self.children_nodes[move].simulate_game(heuristic, batch_results.get(move))
             N_extra = len(self.children_nodes)
             # Update my own stuff
             self.Q = (self.Q * self.N + simul_results) / (N_extra + self.N)
             return (simul_results / N_extra, N_extra)
 
+    def can_open_child(self, widening) -> bool:
+        '''Returns whether progressive widening lets the node open another child (see MCTSArrayTree.can_open_child)'''
+        if widening is None or not self.unopened_moves:
+            return False
+        k, alpha = widening
+        return len(self.children_nodes) < max(1, int(k * self.N ** alpha))
+
+    def open_child(self, heuristic, move: Optional[int] = None) -> tuple[float, int]:
+        '''
+        Builds and evaluates the child of the next unopened move, or of move if given, and
+        adds its result to this node
+        Returns:
+        A tuple (value, number of simulations) like expand
+        '''
+        if move is None:
+            move = self.unopened_moves.pop()
+        else:
+            self.unopened_moves.remove(move)
+        if move == -1:
+            child = self.unopened_pass
+        else:
+            other_piece = 'x' if self.my_piece == 'o' else 'o'
+            child = MCTSNode(self.move_manager.make_move(self.board, move, self.my_piece), False, other_piece, self.move_manager)
+        self.children_nodes[move] = child
+        result = child.simulate_game(heuristic)
+        self.Q = (self.Q * self.N + result) / (self.N + 1)
+        self.N += 1
+        return (result, 1)
+
+    def subtree_nodes(self) -> list['MCTSNode']:
+        '''Returns the nodes of the subtree breadth first, starting with this node'''
+        nodes = [self]
+        i = 0
+        while i < len(nodes):
+            nodes.extend(nodes[i].children_nodes.values())
+            i += 1
+        return nodes
+
+    def prune(self, max_nodes: int) -> int:
+        '''
+        Collapses the least visited subtrees into leaves that keep their N and Q until the tree
+        has at most max_nodes nodes (see expanded_to_keep). A collapsed node is expanded again
+        if the search comes back to it.
+        Returns:
+        The number of nodes removed
+        '''
+        nodes = self.subtree_nodes()
+        expanded = [node for node in nodes if node.children_nodes]
+        n_children = np.array([len(node.children_nodes) for node in expanded], dtype=np.int64)
+        keep = expanded_to_keep(np.array([node.N for node in expanded]), n_children, max_nodes)
+        for node, kept in zip(expanded, keep):
+            if not kept:
+                node.children_nodes = dict()
+                node.unopened_moves = []
+                node.is_expanded = False
+        # The nodes left are this one and the children of the nodes that stayed expanded
+        return len(nodes) - 1 - int(n_children[keep].sum())
+
     def get_choosing_preference(self, N_parent):
         self.N != 0
         # Why the - sign? Because it is always the parent that calls and it wants the worst state for us
         return -self.Q + self.C * ((np.log(N_parent) / self.N) ** 0.5)
     
-    def simulate(self, heuristic) -> tuple[float, int]:
-        '''Returns the result of the simulation'''
-        if self.N == 0:
-            breakpoint()
-
+    def simulate(self, heuristic, batch_heuristic=None, widening=None, stats: Optional[SearchStats] = None,
+                 depth: int = 0) -> tuple[float, int]:
+        '''
+        Returns the result of the simulation. stats records the expansion and the leaf of the
+        simulation (the selection is timed as a whole by HeuristicMCTSBot.run_simulation) and
+        depth is the distance of the node from the root.
+        '''
         if self.is_terminal:
             self.N += 1
-            return (self.Q, 1)
-        
-        if not self.is_expanded:
-            ans = self.expand(heuristic)
-            self.is_expanded = True
-            return ans
+            ans = (self.Q, 1)
+        elif not self.is_expanded or self.can_open_child(widening):
+            if stats is not None:
+                # The evaluations are timed on their own (see HeuristicMCTSBot.__init__)
+                evaluation_seconds = stats.phase_seconds.get('evaluation', 0.0)
+                start = time.perf_counter()
+            if not self.is_expanded:
+                ans = self.expand(heuristic, batch_heuristic, widening)
+                self.is_expanded = True
+                if stats is not None:
+                    stats.count('expansions')
+                    stats.record_branching(len(self.children_nodes) + len(self.unopened_moves))
+            else:
+                ans = self.open_child(heuristic)
+            if stats is not None:
+                evaluation_seconds = stats.phase_seconds.get('evaluation', 0.0) - evaluation_seconds
+                stats.add_time('expansion', time.perf_counter() - start - evaluation_seconds)
         else:
             # Choose the node to explore based on the heuristic
             Max = None
@@ -123,74 +216,522 @@ class MCTSNode:
                     max_move = move
             assert Max is not None
             # Now just simulate that node lah
-            (Q_new, N_extra) = self.children_nodes[max_move].simulate(heuristic)
+            (Q_new, N_extra) = self.children_nodes[max_move].simulate(heuristic, batch_heuristic, widening, stats, depth + 1)
             self.Q = (self.Q * self.N + (-Q_new) * N_extra) / (N_extra + self.N)
             self.N = self.N + N_extra
             return (-Q_new, N_extra)
+        if stats is not None:
+            # The nodes of the path are counted once, at its end
+            stats.count('nodes', depth + 1)
+            stats.record_depth(depth)
+        return ans
 
 class HeuristicMCTSBot(Bot):
     '''
     This bot implements MCTS. However, instead of random simulations, it uses a heuristic to evaluate
-    the outcome
+    the outcome (unless simulation_policy is 'playout')
     '''
-    def __init__(self, move_manager: MoveManager, my_piece):
-        self.previous_states = set()
+    TREE_BACKENDS = ('nodes', 'array')
+    SIMULATION_POLICIES = ('heuristic', 'playout')
+
+    def __init__(self, move_manager: MoveManager, my_piece, tree_backend: str = 'nodes',
+                 time_per_move: Optional[float] = None, total_time: Optional[float] = None,
+                 max_simulations: Optional[int] = 500, early_stop: bool = True, n_workers: int = 1,
+                 parallel_mode: str = 'root', ponder: bool = False, max_ponder_simulations: int = 20000,
+                 simulation_policy: str = 'heuristic', max_nodes: Optional[int] = None,
+                 widening: Optional[tuple[float, float]] = None):
+        '''
+        Initializes the bot
+        Parameters:
+        move_manager (MoveManager): The move manager object
+        my_piece (str): The piece of the bot
+        tree_backend (str): 'nodes' stores the tree as MCTSNode objects, 'array' stores it in
+        typed arrays without boards on the nodes (see MCTSArrayTree)
+        time_per_move (Optional[float]): The most seconds to search for a single move
+        total_time (Optional[float]): The seconds the bot has for all its moves of the game
+        max_simulations (Optional[int]): The most simulations to run per move
+        early_stop (bool): Whether to stop searching once the best move cannot change anymore
+        n_workers (int): The number of processes to search with. With more than one, every move
+        is searched from scratch on a pool of processes (see ParallelMCTSSearch) and early_stop
+        and tree_backend are not used.
+        parallel_mode (str): 'root' for independent trees merged at the root, 'tree' for a
+        single tree in shared memory searched with virtual loss
+        ponder (bool): Whether to keep searching in a background thread while the opponent
+        thinks (not with more than one worker)
+        max_ponder_simulations (int): The most simulations to run while the opponent thinks
+        simulation_policy (str): 'heuristic' evaluates the leaves with the territory heuristic,
+        'playout' with the result of a random playout (see PlayoutBoard)
+        max_nodes (Optional[int]): The most nodes kept in the tree. Once there are more, the
+        least visited subtrees are collapsed into leaves until three quarters of it are left
+        (see MCTSArrayTree.prune). The children that progressive widening has not opened yet
+        are not counted. Unbounded if None.
+        widening (Optional[tuple[float, float]]): (k, alpha) for progressive widening: the
+        children of a node are only kept as moves ordered by a cheap prior and evaluated one at
+        a time, with max(1, int(k * N ** alpha)) of them open for a node visited N times. All
+        the children are evaluated when a node is expanded if None. Not used with more than
+        one worker.
+        '''
+        if tree_backend not in self.TREE_BACKENDS:
+            raise ValueError(f"Unknown tree backend {tree_backend}, expected one of {self.TREE_BACKENDS}")
+        if simulation_policy not in self.SIMULATION_POLICIES:
+            raise ValueError(f"Unknown simulation policy {simulation_policy}, expected one of {self.SIMULATION_POLICIES}")
+        self.previous_states: set[int] = set() # Hashes of the positions that occured
         self.move_manager: MoveManager = move_manager
         self.my_piece = my_piece
-        self.mcts_tree = MCTSNode(move_manager.get_empty_board(), False, 'x', move_manager)
-        self.mcts_tree.simulate_game(self.heuristic)
+        self.tree_backend = tree_backend
+        self.time_manager = TimeManager(time_per_move, total_time, max_simulations)
+        self.early_stop = early_stop
+        self.search_reports: list[dict] = [] # One report per move made
+        self.repeating_moves: set[int] = set() # Moves from the root that repeat a position
+        self.simulations_done = 0 # Simulations run so far for the current move
+        self.max_nodes = max_nodes
+        self.widening = widening
+        self.node_count = 1 # Nodes in the tree, an upper bound with the nodes backend
+        self.pruned_nodes = 0 # Nodes removed to stay within max_nodes for the current move
+        self.ponder = ponder and n_workers <= 1
+        self.max_ponder_simulations = max_ponder_simulations
+        self.ponder_thread: Optional[threading.Thread] = None
+        self.stop_ponder = threading.Event()
+        self.ponder_simulations = 0 # Simulations run while the opponent was thinking
+        self.ponder_start_visits: dict[int, int] = {} # Visits of the root children when pondering started
+        self.simulation_policy = simulation_policy
+        if simulation_policy == 'playout':
+            self.playout_board = PlayoutBoard(move_manager.BOARD_SIZE)
+            self.evaluate = self.playout_value
+            self.batch_evaluate = None
+        else:
+            self.evaluate = self.heuristic
+            self.batch_evaluate = self.batch_heuristic
+        # The evaluations are timed and counted in the statistics of the search
+        self.search_stats = SearchStats()
+        self.evaluate = timed(self.evaluate, self.search_stats, 'evaluation', 'evaluations')
+        if self.batch_evaluate is not None:
+            self.batch_evaluate = timed(self.batch_evaluate, self.search_stats, 'evaluation', 'evaluations', batch=True)
+        self.parallel_search = None
+        self.parallel_statistics: dict[int, tuple[float, int]] = {} # Merged (Q, N) of the root children
+        if n_workers > 1:
+            # Imported here as the process pool modules are slow to import and rarely needed
+            from game_bots.mcts_parallel import ParallelMCTSSearch
+            self.parallel_search = ParallelMCTSSearch(move_manager, n_workers, parallel_mode,
+                                                      simulation_policy=simulation_policy)
+        self.new_tree(move_manager.get_empty_board(), False, 'x')
+
+    def new_tree(self, board: str, other_pass: bool, piece: str):
+        '''
+        Replaces the search tree with a new one rooted at the position
+        Parameters:
+        board (str): The go board
+        other_pass (bool): Whether the last move was a pass
+        piece (str): The piece to move
+        '''
+        if self.tree_backend == 'array':
+            self.mcts_tree = MCTSArrayTree(self.move_manager, board, other_pass, piece, self.evaluate,
+                                           batch_heuristic=self.batch_evaluate, widening=self.widening)
+        else:
+            self.mcts_tree = MCTSNode(board, other_pass, piece, self.move_manager)
+            self.mcts_tree.simulate_game(self.evaluate)
+
+    def set_position(self, board: str, other_pass: bool):
+        '''
+        Starts the search afresh from a position the bot did not reach by playing, e.g. a
+        benchmark position or a game joined halfway. make_move is then to be called with the
+        same position.
+        Parameters:
+        board (str): The go board, with the bot to move
+        other_pass (bool): Whether the opponent passed
+        '''
+        self.stop_pondering()
+        self.new_tree(board, other_pass, self.my_piece)
+
+    def is_at_root(self, board: str, other_pass: bool) -> bool:
+        '''
+        Returns whether the root of the tree is the position with the bot to move, which
+        happens on the first move of 'x' and after set_position
+        '''
+        if self.tree_backend == 'array':
+            tree: MCTSArrayTree = self.mcts_tree
+            return tree.root_board == board and tree.root_other_pass == other_pass and tree.root_piece == self.my_piece
+        node = self.mcts_tree
+        return node.board == board and node.other_pass == other_pass and node.my_piece == self.my_piece
 
     def heuristic(self, board: str, my_piece: str, other_pass: bool):
         # For now, I will just use the territories count
-        territory_str = self.move_manager.create_territory(board)
-        ct = 0
-        for i in territory_str:
-            if i == '-':
-                ct += 0
-            elif i == my_piece:
-                ct += 1
-            else:
-                ct -= 1
+        territory_score = self.move_manager.get_territory_score(board)
+        ct = territory_score if my_piece == 'x' else -territory_score
         if ct > 0 and other_pass:
             return 1 # Because we can just pass and we win
         return 2 / (1 + np.exp(-ct)) - 1
-        
-    def make_move(self, board: str, other_pass: bool) -> int:
-        '''Returns the move to make based on the mcts'''
-        if not ('x' not in board and 'o' not in board and other_pass == False):
-            if not self.mcts_tree.is_expanded:
-                self.mcts_tree.expand(self.heuristic)
 
-            # Now, find the child node that is the node that is resulting in the (board, other_pass pair)
+    def batch_heuristic(self, batch: np.ndarray, my_piece: str, other_pass: np.ndarray) -> np.ndarray:
+        '''
+        Evaluates a whole batch of positions at once, giving the same values as heuristic
+        Parameters:
+        batch (np.ndarray): The (positions, N, N) batch of boards (see batch_territory)
+        my_piece (str): The piece to be placed in every position
+        other_pass (np.ndarray): Whether the other player has passed, for every position
+        Returns:
+        The array of the heuristic values
+        '''
+        ct = territory_counts(batch)
+        if my_piece == 'o':
+            ct = -ct
+        return np.where((ct > 0) & other_pass, 1, 2 / (1 + np.exp(-ct)) - 1)
 
-            child_nodes = self.mcts_tree.children_nodes
-            for move in child_nodes:
-                if child_nodes[move].my_piece != self.my_piece:
-                    breakpoint()
-                if child_nodes[move].board == board and child_nodes[move].other_pass == other_pass:
-                    # Yay, we have found the node
-                    self.mcts_tree = child_nodes[move]
-                    break
-            else:
-                assert ValueError("Something has gone wrong")
-        
-        # Now just do MCTS simulations
-        N_SIMULS = 500
-        for _ in range(N_SIMULS):
-            self.mcts_tree.simulate(self.heuristic)
-        
-        # Now choose the move
+    def playout_value(self, board: str, my_piece: str, other_pass: bool) -> float:
+        '''
+        Evaluates a position by playing it out randomly to the end
+        Parameters:
+        board (str): The go board
+        my_piece (str): The piece to be placed
+        other_pass (bool): Whether the other player has passed
+        Returns:
+        1 if my_piece wins the playout, -1 if it loses and 0 for a draw
+        '''
+        playout_board = self.playout_board
+        playout_board.load(board)
+        score = playout_board.playout(my_piece, other_pass)
+        if my_piece == 'o':
+            score = -score
+        return float(np.sign(score))
+
+    def find_opponent_move(self, board: str, other_pass: bool) -> int:
+        '''
+        Returns the move the opponent played from the root to reach the board, raising a
+        ValueError if no single opponent move leads there
+        Parameters:
+        board (str): The go board after the opponent's move
+        other_pass (bool): Whether the opponent passed
+        '''
+        if other_pass:
+            return -1
+        root_board = self.mcts_tree.root_board if self.tree_backend == 'array' else self.mcts_tree.board
+        opponent_piece = 'x' if self.my_piece == 'o' else 'o'
+        for index, (old, new) in enumerate(zip(root_board, board)):
+            if old == '-' and new == opponent_piece:
+                if self.move_manager.make_move(root_board, index, opponent_piece) == board:
+                    return index
+                break
+        raise ValueError("board is not reachable from the root")
+
+    def advance_to_position(self, board: str, other_pass: bool):
+        '''
+        Moves the root of the tree to the child reached by the opponent's last move
+        Parameters:
+        board (str): The go board after the opponent's move
+        other_pass (bool): Whether the opponent passed
+        '''
+        if self.tree_backend == 'array':
+            tree: MCTSArrayTree = self.mcts_tree
+            if not tree.is_expanded(tree.root):
+                tree.expand(tree.root, tree.root_piece, tree.root_other_pass)
+            # Boards are not stored on the nodes, so find the opponent's move instead
+            tree.advance(self.find_opponent_move(board, other_pass))
+            return
+
+        if not self.mcts_tree.is_expanded:
+            self.mcts_tree.expand(self.evaluate, self.batch_evaluate, self.widening)
+        move = self.find_opponent_move(board, other_pass)
+        if move in self.mcts_tree.unopened_moves:
+            self.mcts_tree.open_child(self.evaluate, move)
+
+        # Now, find the child node that is the node that is resulting in the (board, other_pass pair)
+
+        child_nodes = self.mcts_tree.children_nodes
+        for move in child_nodes:
+            if child_nodes[move].board == board and child_nodes[move].other_pass == other_pass:
+                # Yay, we have found the node
+                self.mcts_tree = child_nodes[move]
+                break
+        else:
+            raise ValueError("Something has gone wrong")
+
+    def run_simulation(self, stats: Optional[SearchStats] = None):
+        '''
+        Runs one MCTS simulation from the root, pruning the tree if it is over the node budget
+        Parameters:
+        stats (Optional[SearchStats]): The statistics to record the simulation in
+        '''
+        if self.tree_backend == 'array':
+            self.mcts_tree.simulate(stats)
+            self.node_count = self.mcts_tree.node_count
+        else:
+            if stats is not None:
+                start = time.perf_counter()
+                phases = stats.phase_seconds
+                leaf_seconds = phases.get('expansion', 0.0) + phases.get('evaluation', 0.0)
+            # The visits backed up are the children created, or 1 for a terminal node which
+            # creates none, so this overestimates the nodes a little
+            self.node_count += self.mcts_tree.simulate(self.evaluate, self.batch_evaluate, self.widening, stats)[1]
+            if stats is not None:
+                # The walk down and back up the tree, which MCTSNode.simulate does not time level by level
+                leaf_seconds = phases.get('expansion', 0.0) + phases.get('evaluation', 0.0) - leaf_seconds
+                stats.add_time('selection', time.perf_counter() - start - leaf_seconds)
+        if self.max_nodes is not None and self.node_count > self.max_nodes:
+            self.pruned_nodes += self.mcts_tree.prune(self.max_nodes * 3 // 4)
+            self.node_count = self.count_nodes()
+
+    def count_nodes(self) -> int:
+        '''Returns the number of nodes in the tree, without the children that are not open yet'''
+        if self.tree_backend == 'array':
+            return self.mcts_tree.node_count
+        return len(self.mcts_tree.subtree_nodes())
+
+    def tree_memory(self) -> int:
+        '''
+        Returns the bytes used by the tree: the node arrays with the array backend, or the
+        nodes, their attributes, children dictionaries and boards with the nodes backend
+        '''
+        if self.tree_backend == 'array':
+            return self.mcts_tree.nbytes
+        return sum(sys.getsizeof(node) + sys.getsizeof(node.__dict__) + sys.getsizeof(node.children_nodes)
+                   + sys.getsizeof(node.board) for node in self.mcts_tree.subtree_nodes())
+
+    def find_repeating_moves(self) -> set[int]:
+        '''Returns the moves from the root that repeat an earlier position (superko)'''
+        if self.tree_backend == 'array':
+            tree: MCTSArrayTree = self.mcts_tree
+            return {int(tree.move[child]) for child in tree.children(tree.root) if tree.move[child] != -1 and
+                    tree.search_board.hash_after_move(int(tree.move[child]), self.my_piece) in self.previous_states}
         child_nodes = self.mcts_tree.children_nodes
+        repeating = {move for move in child_nodes
+                     if move != -1 and self.move_manager.get_hash(child_nodes[move].board) in self.previous_states}
+        if self.mcts_tree.unopened_moves:
+            search_board = self.move_manager.get_search_board(self.mcts_tree.board)
+            repeating.update(move for move in self.mcts_tree.unopened_moves
+                             if move != -1 and search_board.hash_after_move(move, self.my_piece) in self.previous_states)
+        return repeating
+
+    def candidate_statistics(self) -> dict[int, tuple[float, int]]:
+        '''
+        Returns the (value, visits) of every move the bot may play from the root, the value
+        being from the bot's perspective
+        '''
+        if self.parallel_search is not None:
+            statistics = {move: (-Q, N) for move, (Q, N) in self.parallel_statistics.items()}
+        elif self.tree_backend == 'array':
+            statistics = {move: (-Q, N) for move, (Q, N) in self.mcts_tree.child_values().items()}
+        else:
+            child_nodes = self.mcts_tree.children_nodes
+            statistics = {move: (-child_nodes[move].Q, child_nodes[move].N) for move in child_nodes}
+        for move in self.repeating_moves:
+            statistics.pop(move, None) # Unopened moves have no statistics (see widening)
+        return statistics
+
+    def choose_move(self) -> int:
+        '''
+        Returns the child of the root with the best value, leaving out the moves that repeat a
+        position (superko)
+        '''
         best_move = None
         best_val = -1e10
-        for move in child_nodes:
-            if -child_nodes[move].Q > best_val:
-                best_val = -child_nodes[move].Q
+        for move, (value, _) in self.candidate_statistics().items():
+            if value > best_val:
+                best_val = value
                 best_move = move
         assert best_move is not None
-        self.mcts_tree = child_nodes[best_move]
+        return best_move
+
+    def root_visits(self) -> int:
+        '''Returns the visit count of the root'''
+        if self.tree_backend == 'array':
+            return int(self.mcts_tree.N[self.mcts_tree.root])
+        return self.mcts_tree.N
+
+    def root_children(self) -> tuple[int, int]:
+        '''Returns the number of (open, all) children of the root (see widening)'''
+        if self.tree_backend == 'array':
+            root = self.mcts_tree.root
+            return int(self.mcts_tree.n_open[root]), int(self.mcts_tree.n_children[root])
+        n_open = len(self.mcts_tree.children_nodes)
+        return n_open, n_open + len(self.mcts_tree.unopened_moves)
+
+    def is_decided(self, remaining_visits: float) -> bool:
+        '''
+        Returns whether the move choice can no longer change. Every backed up value lies in
+        [-1, 1], so even if all the remaining visits went to the best move with value -1 it
+        must stay ahead of every other move getting all of them with value 1.
+        Parameters:
+        remaining_visits (float): The number of visits the rest of the search is expected to add
+        Returns:
+        True if searching further cannot change the move
+        '''
+        if self.widening is not None and self.parallel_search is None:
+            n_open, n_children = self.root_children()
+            k, alpha = self.widening
+            if n_open < n_children and max(1, int(k * (self.root_visits() + remaining_visits) ** alpha)) > n_open:
+                return False # Moves that have not been looked at yet would still be opened
+        statistics = self.candidate_statistics()
+        if len(statistics) <= 1:
+            return True
+        best_move = self.choose_move()
+        best_value, best_visits = statistics[best_move]
+        worst_best = (best_value * best_visits - remaining_visits) / (best_visits + remaining_visits)
+        for move, (value, visits) in statistics.items():
+            if move != best_move and (value * visits + remaining_visits) / (visits + remaining_visits) >= worst_best:
+                return False
+        return True
+
+    def search(self, board: str) -> tuple[str, int]:
+        '''
+        Runs simulations from the root until a search limit is hit
+        Parameters:
+        board (str): The go board at the root
+        Returns:
+        A tuple (stop reason, number of simulations) where the reason the search stopped is
+        'simulations', 'time' or 'decided'
+        '''
+        time_manager = self.time_manager
+        time_manager.start_move(board)
+        start_visits = self.root_visits()
+        simulations = 0
+        self.run_simulation(self.search_stats) # At least one, so that the root is expanded
+        simulations += 1
+        self.simulations_done = simulations
+        self.repeating_moves = self.find_repeating_moves()
+        while True:
+            stop_reason = time_manager.stop_reason(simulations)
+            if stop_reason is not None:
+                return stop_reason, simulations
+            if self.early_stop and simulations % 16 == 0:
+                # Estimate how many visits the rest of the budget adds from the rate so far
+                visits_per_simulation = (self.root_visits() - start_visits) / simulations
+                remaining_simulations = float('inf')
+                if time_manager.max_simulations is not None:
+                    remaining_simulations = time_manager.max_simulations - simulations
+                time_remaining = time_manager.time_remaining()
+                if time_remaining is not None:
+                    simulations_per_second = simulations / max(time_manager.elapsed(), 1e-9)
+                    remaining_simulations = min(remaining_simulations, time_remaining * simulations_per_second)
+                if self.is_decided(remaining_simulations * visits_per_simulation):
+                    return 'decided', simulations
+            self.run_simulation(self.search_stats)
+            simulations += 1
+            self.simulations_done = simulations
+
+    def search_progress(self) -> Optional[str]:
+        '''Returns the number of simulations run so far for the current move'''
+        if self.parallel_search is not None:
+            return None # The workers do not report until the search is over
+        return f"{self.simulations_done} simulations in {self.time_manager.elapsed():.1f}s"
+
+    def child_visits(self) -> dict[int, int]:
+        '''Returns the visit count of every child of the root by move'''
+        if self.tree_backend == 'array':
+            return {move: N for move, (_, N) in self.mcts_tree.child_values().items()}
+        return {move: child.N for move, child in self.mcts_tree.children_nodes.items()}
+
+    def ponder_loop(self):
+        '''Runs simulations from the root until the opponent has moved'''
+        while not self.stop_ponder.is_set() and self.ponder_simulations < self.max_ponder_simulations:
+            self.run_simulation()
+            self.ponder_simulations += 1
+
+    def on_opponent_turn(self, board: str):
+        '''Starts pondering on the position the opponent has to move from'''
+        if not self.ponder:
+            return
+        self.ponder_start_visits = self.child_visits()
+        self.ponder_simulations = 0
+        self.stop_ponder.clear()
+        self.ponder_thread = threading.Thread(target=self.ponder_loop, daemon=True)
+        self.ponder_thread.start()
+
+    def stop_pondering(self):
+        '''Waits for the pondering thread to finish its simulation, so the tree can be used again'''
+        if self.ponder_thread is not None:
+            self.stop_ponder.set()
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
+    def make_parallel_move(self, board: str, other_pass: bool) -> int:
+        '''
+        Returns the move to make based on a search of the position by all the worker processes
+        Parameters:
+        board (str): The go board
+        other_pass (bool): Whether the other player has passed
+        Returns:
+        The move to make
+        '''
+        time_manager = self.time_manager
+        time_manager.start_move(board)
+        root_value = self.evaluate(board, self.my_piece, other_pass)
+        self.parallel_statistics, simulations = self.parallel_search.search(
+            board, other_pass, self.my_piece, root_value, time_manager.time_remaining(), time_manager.max_simulations)
+        seconds = time_manager.elapsed()
+        time_manager.end_move()
+        search_board = self.move_manager.get_search_board(board)
+        self.repeating_moves = {move for move in self.parallel_statistics
+                                if move != -1 and search_board.hash_after_move(move, self.my_piece) in self.previous_states}
+        self.search_reports.append({
+            'simulations': simulations,
+            'root_visits': sum(N for _, N in self.parallel_statistics.values()),
+            'seconds': seconds,
+            'simulations_per_second': simulations / seconds if seconds > 0 else 0,
+            'stop_reason': 'simulations' if time_manager.deadline is None else 'time',
+            'collisions': self.parallel_search.collisions,
+        })
+        self.search_stats.count('simulations', simulations)
+
+        best_move = self.choose_move()
+        if best_move != -1:
+            new_board = self.move_manager.make_move(board, best_move, self.my_piece)
+            self.previous_states.add(self.move_manager.get_hash(new_board))
+        self.search_stats.end_move(self.move_manager)
+        return best_move
+
+    def make_move(self, board: str, other_pass: bool) -> int:
+        '''Returns the move to make based on the mcts'''
+        self.previous_states.add(self.move_manager.get_hash(board))
+        pondered = self.ponder_thread is not None
+        self.stop_pondering()
+        self.search_stats.begin_move(self.move_manager) # After pondering, which is not recorded
+        if self.parallel_search is not None:
+            return self.make_parallel_move(board, other_pass)
+        if not self.is_at_root(board, other_pass):
+            move_visits = self.ponder_start_visits.get(self.find_opponent_move(board, other_pass), 0) if pondered else 0
+            self.advance_to_position(board, other_pass)
+        self.node_count = self.count_nodes()
+        self.pruned_nodes = 0
+        
+        # Now just do MCTS simulations until a search limit is hit
+        start_visits = self.root_visits()
+        stop_reason, simulations = self.search(board)
+        self.search_stats.count('simulations', simulations)
+        seconds = self.time_manager.elapsed()
+        self.time_manager.end_move()
+        report = {
+            'simulations': simulations,
+            'root_visits': self.root_visits() - start_visits,
+            'seconds': seconds,
+            'simulations_per_second': simulations / seconds if seconds > 0 else 0,
+            'stop_reason': stop_reason,
+            'tree_nodes': self.count_nodes(),
+            'tree_bytes': self.tree_memory(),
+            'pruned_nodes': self.pruned_nodes,
+        }
+        if pondered:
+            # The visits of the kept subtree that were added while the opponent was thinking
+            report['reused_visits'] = start_visits
+            report['pondered_visits'] = max(start_visits - move_visits, 0)
+            report['ponder_simulations'] = self.ponder_simulations
+        self.search_reports.append(report)
+        
+        # Now choose the move
+        best_move = self.choose_move()
+        if self.tree_backend == 'array':
+            self.mcts_tree.advance(best_move)
+            new_board = self.mcts_tree.root_board
+        else:
+            self.mcts_tree = self.mcts_tree.children_nodes[best_move]
+            new_board = self.mcts_tree.board
+            if self.max_nodes is not None:
+                self.node_count = self.count_nodes() # For the simulations run while pondering
+        self.previous_states.add(self.move_manager.get_hash(new_board))
+        self.search_stats.end_move(self.move_manager)
         return best_move 
     
     def receive_result(self, result: str):
-        pass
+        self.stop_pondering()
+        if self.parallel_search is not None:
+            self.parallel_search.close() # The pool is started again by the next search
 
@@ -1,16 +1,23 @@
+from typing import Optional
+import time
 from game_implementation.rules_implementation import MoveManager
+from game_implementation.board_state import BoardState
 from game_bots.bot import Bot
+from game_implementation.instrumentation import SearchStats
 class MinimaxBot(Bot):
     '''This is a bot that implements a simple minimax strategy'''
     def __init__(self, move_manager, my_piece):
-        self.previous_states = set()
+        self.previous_states: set[int] = set() # Hashes of the positions that occured
         self.move_manager: MoveManager = move_manager
         self.my_piece = my_piece
+        self.nodes_searched = 0 # Total number of nodes visited by minimax
+        self.depth = 2 # Depth of the search
+        self.search_stats = SearchStats()
 
     def receive_result(self, result: str):
         pass
 
-    def board_eval(self, board: str, my_piece: str, other_pass: bool):
+    def board_eval(self, board: str, my_piece: str, other_pass: bool, territory_score: Optional[int] = None):
         '''
         Returns the board evaluation to be used in minimax. This is just the difference in
         territories between the two players.
@@ -18,28 +25,25 @@ class MinimaxBot(Bot):
         board (str): The go board
         my_piece (str): The piece to be placed
         other_pass (bool): Whether or not the other player has passed
+        territory_score (Optional[int]): The black minus white area of the board if already
+        known, e.g. from the search board (see BoardState.territory_score)
         Returns:
         The evaluation of the board from the perspective of the player placing my_piece
         '''
         # For now, I will just use the territories count
-        territory_str = self.move_manager.create_territory(board)
-        ct = 0
-        for i in territory_str:
-            if i == '-':
-                ct += 0
-            elif i == my_piece:
-                ct += 1
-            else:
-                ct -= 1
+        if territory_score is None:
+            territory_score = self.move_manager.get_territory_score(board)
+        ct = territory_score if my_piece == 'x' else -territory_score
         if ct > 0 and other_pass:
             return 1e9 # Because we can just pass and we win
         return ct
 
-    def minimax(self, board: str, my_piece: str, other_pass: bool, levels_left: int) -> tuple[int, int]:
+    def minimax(self, search_board: BoardState, my_piece: str, other_pass: bool, levels_left: int) -> tuple[int, int]:
         '''
-        Performs a "levels_left" depth minimax search using board_eval
+        Performs a "levels_left" depth minimax search using board_eval. The tree is walked by
+        playing and undoing moves on search_board, so no board is allocated per node.
         Parameters:
-        board (str): The go board
+        search_board (BoardState): The go board (see MoveManager.get_search_board)
         my_piece (str): The piece to be placed
         other_pass (bool): Whether or not the other player has passed
         levels_left (int): The depth left to be explored
@@ -48,26 +52,40 @@ class MinimaxBot(Bot):
         '''
         # This is just an extremely stupid and slow brute force minimax. It does not even 
         # store the previous computations
+        # The nodes are only counted here, the statistics are filled in by make_move
+        self.nodes_searched += 1
+        stats = self.search_stats
         if levels_left == 0:
             # Ideally, we will never use levels_left = 0 to make a move. I am returning an invalid move
-            return (-2, self.board_eval(board, my_piece, other_pass)) # As there is nothing left to do
+            if stats.time_leaves:
+                start = time.perf_counter()
+                evaluation = self.board_eval(search_board.board, my_piece, other_pass, search_board.territory_score())
+                stats.add_time('evaluation', time.perf_counter() - start)
+            else:
+                evaluation = self.board_eval(search_board.board, my_piece, other_pass, search_board.territory_score())
+            return (-2, evaluation) # As there is nothing left to do
         else:
-            valid_moves = self.move_manager.get_next_moves(board, my_piece)
+            # Moves that repeat a position are filtered out here (superko)
+            start = time.perf_counter()
+            valid_moves, _, captures = search_board.classify_moves(my_piece, self.previous_states)
+            stats.add_time('expansion', time.perf_counter() - start)
+            stats.count('expansions')
+            stats.record_branching(len(valid_moves) + 1) # The pass included
             # I will start by considering to pass
-            if other_pass and self.board_eval(board, my_piece, other_pass) == 1e9:
+            if other_pass and self.board_eval(search_board.board, my_piece, other_pass, search_board.territory_score()) == 1e9:
                 return (-1, 1e9)
             opponent_piece = 'o' if my_piece != 'o' else 'x'
             max_move = -1
-            curr_max = -self.minimax(board, opponent_piece, True, levels_left - 1)[1] # Evaluation if I pass
+            curr_max = -self.minimax(search_board, opponent_piece, True, levels_left - 1)[1] # Evaluation if I pass
             ct = 0
             for move in valid_moves:
-                new_board = self.move_manager.make_move(board, move, my_piece)
-                if new_board in self.previous_states:
-                    continue
+                search_board.play(move, my_piece, captures.get(move, []))
+                new_hash = search_board.hash
                 ct += 1
-                self.previous_states.add(new_board) # Helps to consider ko in the calculations too
-                move_eval = -self.minimax(new_board, opponent_piece, False, levels_left - 1)[1] # I need the evaluation part
-                self.previous_states.remove(new_board) # Remove the new board added(This is a bit funky)
+                self.previous_states.add(new_hash) # Helps to consider ko in the calculations too
+                move_eval = -self.minimax(search_board, opponent_piece, False, levels_left - 1)[1] # I need the evaluation part
+                self.previous_states.remove(new_hash) # Remove the new board added(This is a bit funky)
+                search_board.undo()
                 if move_eval > curr_max:
                     curr_max = move_eval
                     max_move = move
@@ -76,11 +94,21 @@ class MinimaxBot(Bot):
         
     def make_move(self, board: str, other_pass: bool) -> int:
         '''Returns the move to make based on the minimax'''
-        self.previous_states.add(board)
-        information = self.minimax(board, self.my_piece, other_pass, 2)
+        stats = self.search_stats
+        stats.begin_move(self.move_manager)
+        self.previous_states.add(self.move_manager.get_hash(board))
+        nodes_before = self.nodes_searched
+        information = self.minimax(self.move_manager.get_search_board(board), self.my_piece, other_pass, self.depth)
         move = information[0]
+        # Every node is an expansion, or a leaf evaluated at the full depth
+        nodes = self.nodes_searched - nodes_before
+        evaluations = nodes - stats.counters['expansions']
+        stats.count('nodes', nodes)
+        stats.count('evaluations', evaluations)
+        stats.record_depth(self.depth, evaluations)
         if(move != -1):
             new_board = self.move_manager.make_move(board, move, self.my_piece)
-            self.previous_states.add(new_board)
+            self.previous_states.add(self.move_manager.get_hash(new_board))
+        stats.end_move(self.move_manager)
         return move
 
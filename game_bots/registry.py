@@ -0,0 +1,62 @@
+'''
+The bots that can be picked by name, e.g. from the command line of the arenas. A bot is only
+imported when it is looked up, so importing the registry does not pull in pygame (needed by
+the human bot only) and scripts using engine bots run on machines without a display.
+'''
+import functools
+import importlib
+from game_bots.bot import Bot
+
+# From the name of the bot to (module, class name, keyword arguments of the constructor)
+BOT_REGISTRY: dict[str, tuple[str, str, dict]] = {
+    'human': ('game_bots.human_bot', 'HumanBot', {}),
+    'debug': ('game_bots.debug_bot', 'DebugBot', {}),
+    'minimax': ('game_bots.minimax_bot', 'MinimaxBot', {}),
+    'alpha_beta': ('game_bots.alpha_beta_bot', 'AlphaBetaBot', {}),
+    'alpha_beta_symmetric': ('game_bots.alpha_beta_bot', 'AlphaBetaBot', {'symmetric_tt': True}),
+    'mcts': ('game_bots.mcts_with_heuristics', 'HeuristicMCTSBot', {}),
+    'mcts_array': ('game_bots.mcts_with_heuristics', 'HeuristicMCTSBot', {'tree_backend': 'array'}),
+    'mcts_ponder': ('game_bots.mcts_with_heuristics', 'HeuristicMCTSBot', {'tree_backend': 'array', 'ponder': True}),
+    'mcts_widening': ('game_bots.mcts_with_heuristics', 'HeuristicMCTSBot', {'tree_backend': 'array', 'widening': (2, 0.5)}),
+    'mcts_playout': ('game_bots.mcts_with_heuristics', 'HeuristicMCTSBot', {'tree_backend': 'array', 'simulation_policy': 'playout'}),
+}
+
+# The bots that need a display
+GUI_BOTS = ('human',)
+
+
+def register_bot(name: str, module: str, class_name: str, **kwargs):
+    '''
+    Adds a bot to the registry
+    Parameters:
+    name (str): The name to look the bot up by
+    module (str): The module defining the bot
+    class_name (str): The name of the bot class in the module
+    kwargs: The keyword arguments given to the constructor of the bot
+    '''
+    BOT_REGISTRY[name] = (module, class_name, kwargs)
+
+
+def available_bots(headless: bool = False) -> list[str]:
+    '''
+    Returns the names of the registered bots
+    Parameters:
+    headless (bool): Whether to leave out the bots that need a display
+    '''
+    return [name for name in BOT_REGISTRY if not (headless and name in GUI_BOTS)]
+
+
+def get_bot(name: str) -> type[Bot]:
+    '''
+    Imports a registered bot
+    Parameters:
+    name (str): The name of the bot
+    Returns:
+    The bot class, or a functools.partial of it if the bot has constructor arguments. Both
+    can be given to GameRunner like a class.
+    '''
+    if name not in BOT_REGISTRY:
+        raise ValueError(f"Unknown bot {name}, expected one of {list(BOT_REGISTRY)}")
+    module, class_name, kwargs = BOT_REGISTRY[name]
+    bot_class = getattr(importlib.import_module(module), class_name)
+    return functools.partial(bot_class, **kwargs) if kwargs else bot_class
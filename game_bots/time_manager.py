@@ -0,0 +1,84 @@
+from typing import Optional
+import time
+
+
+class TimeManager:
+    '''
+    Decides how much a bot can search for each move. The search of a move is limited by any
+    combination of a wall clock time per move, a total time for the whole game and a number
+    of simulations (or nodes).
+    '''
+    SAFETY_MARGIN = 0.95 # Fraction of the allocated time actually used
+    MIN_MOVES_LEFT = 10 # Never plan for fewer moves than this when splitting the total time
+
+    def __init__(self, time_per_move: Optional[float] = None, total_time: Optional[float] = None,
+                 max_simulations: Optional[int] = None):
+        '''
+        Initializes the time manager
+        Parameters:
+        time_per_move (Optional[float]): The most seconds to spend on a single move
+        total_time (Optional[float]): The seconds the bot has for all its moves of the game
+        max_simulations (Optional[int]): The most simulations (or nodes) to run per move
+        '''
+        if time_per_move is None and total_time is None and max_simulations is None:
+            raise ValueError("At least one search limit is needed")
+        self.time_per_move = time_per_move
+        self.total_time = total_time
+        self.max_simulations = max_simulations
+        self.time_left = total_time
+        self.move_start: float = 0
+        self.deadline: Optional[float] = None
+
+    def allocate_time(self, board: str) -> Optional[float]:
+        '''
+        Returns the number of seconds to spend on the next move. With a total time, the time
+        left is split evenly over the moves the bot still expects to play, which is taken to
+        be half the empty cells (the other half being filled by the opponent).
+        Parameters:
+        board (str): The go board
+        Returns:
+        The seconds for the move, or None if the time is not limited
+        '''
+        allocated = self.time_per_move
+        if self.time_left is not None:
+            moves_left = max(board.count('-') // 2, self.MIN_MOVES_LEFT)
+            share = max(self.time_left, 0) / moves_left
+            allocated = share if allocated is None else min(allocated, share)
+        return None if allocated is None else allocated * self.SAFETY_MARGIN
+
+    def start_move(self, board: str):
+        '''
+        Starts the clock for a new move
+        Parameters:
+        board (str): The go board
+        '''
+        self.move_start = time.perf_counter()
+        allocated = self.allocate_time(board)
+        self.deadline = None if allocated is None else self.move_start + allocated
+
+    def elapsed(self) -> float:
+        '''Returns the seconds spent on the current move'''
+        return time.perf_counter() - self.move_start
+
+    def time_remaining(self) -> Optional[float]:
+        '''Returns the seconds left for the current move, or None if the time is not limited'''
+        return None if self.deadline is None else self.deadline - time.perf_counter()
+
+    def stop_reason(self, simulations: int) -> Optional[str]:
+        '''
+        Returns why the search of the current move has to stop, or None if it can go on
+        Parameters:
+        simulations (int): The number of simulations run so far for the move
+        Returns:
+        'simulations', 'time' or None
+        '''
+        if self.max_simulations is not None and simulations >= self.max_simulations:
+            return 'simulations'
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return 'time'
+        return None
+
+    def end_move(self):
+        '''Stops the clock and charges the time spent to the game clock'''
+        if self.time_left is not None:
+            self.time_left -= self.elapsed()
@@ -0,0 +1,280 @@
+'''
+A simulator advancing a whole batch of games in lockstep. The boards are a numpy int8 array of
+shape (games, N, N) in the encoding of batch_territory (1 for 'x', -1 for 'o', 0 for empty), and
+every step plays one move in every game. Chains are labelled for all the games at once by
+propagating the smallest cell id through the stones of the same colour, the labels are merged
+as stones are played, and captures, suicide, the legal moves and the scores are worked out with
+array operations. Like PlayoutBoard,
+only simple ko is forbidden (not positional superko).
+'''
+from typing import Optional, Union
+import numpy as np
+from game_implementation.batch_territory import boards_to_array, territory_counts
+
+OFF_BOARD = 2 # Padding value of the cells around the boards
+
+
+def neighbour_views(padded: np.ndarray) -> tuple[np.ndarray, ...]:
+    '''
+    Returns the values of the (up, down, left, right) neighbours of every cell, given the
+    boards padded by one cell on every side
+    '''
+    return padded[:, :-2, 1:-1], padded[:, 2:, 1:-1], padded[:, 1:-1, :-2], padded[:, 1:-1, 2:]
+
+
+def diagonal_views(padded: np.ndarray) -> tuple[np.ndarray, ...]:
+    '''Returns the values of the four diagonal neighbours of every cell (see neighbour_views)'''
+    return padded[:, :-2, :-2], padded[:, :-2, 2:], padded[:, 2:, :-2], padded[:, 2:, 2:]
+
+
+def pad(array: np.ndarray, value: int) -> np.ndarray:
+    '''Returns the (games, N, N) array padded by one cell of value on every side'''
+    return np.pad(array, ((0, 0), (1, 1), (1, 1)), constant_values=value)
+
+
+class BatchSimulator:
+    '''Plays a batch of games one move per game per step'''
+    def __init__(self, board_size: int, n_games: int, seed: Optional[int] = None):
+        '''
+        Initializes the games on empty boards with 'x' to play
+        Parameters:
+        board_size (int): The length of a side of the board
+        n_games (int): The number of games played at once
+        seed (Optional[int]): The seed of the random moves
+        '''
+        self.board_size = board_size
+        self.n_games = n_games
+        self.rng = np.random.default_rng(seed)
+        # The (up, down, left, right) neighbours of every cell, -1 off the board
+        N = board_size
+        self.neighbour_table = np.array([[x + (y - 1) * N if y > 0 else -1, x + (y + 1) * N if y < N - 1 else -1,
+                                          x - 1 + y * N if x > 0 else -1, x + 1 + y * N if x < N - 1 else -1]
+                                         for y in range(N) for x in range(N)], dtype=np.int64)
+        self.load([('-' * board_size * board_size)] * n_games)
+
+    def load(self, boards: list[str], pieces: Union[str, list[str]] = 'x', other_pass: Optional[list[bool]] = None):
+        '''
+        Sets up the positions of the games
+        Parameters:
+        boards (list[str]): The go board of every game
+        pieces (Union[str, list[str]]): The piece to be placed in every game, or in all of them
+        other_pass (Optional[list[bool]]): Whether the last move of every game was a pass
+        '''
+        if len(boards) != self.n_games:
+            raise ValueError(f"Expected {self.n_games} boards, got {len(boards)}")
+        if isinstance(pieces, str):
+            pieces = [pieces] * self.n_games
+        self.boards = boards_to_array(boards, self.board_size)
+        self.to_play = np.array([1 if piece == 'x' else -1 for piece in pieces], dtype=np.int8)
+        self.passes = np.zeros(self.n_games, dtype=np.int8) if other_pass is None else \
+            np.array(other_pass, dtype=np.int8) # Consecutive passes so far
+        self.ko_point = np.full(self.n_games, -1, dtype=np.int64) # The cell that may not be played, -1 if none
+        self.done = self.passes >= 2
+        self.moves_played = np.zeros(self.n_games, dtype=np.int64)
+        self.labels = self.label_chains() # Kept up to date by step
+        self.liberties = self.count_liberties(self.labels)
+
+    def to_boards(self) -> list[str]:
+        '''Returns the go board of every game'''
+        cells = np.full(self.boards.shape, ord('-'), dtype=np.uint8)
+        cells[self.boards == 1] = ord('x')
+        cells[self.boards == -1] = ord('o')
+        return [row.tobytes().decode('ascii') for row in cells.reshape(self.n_games, -1)]
+
+    def label_chains(self) -> np.ndarray:
+        '''
+        Labels the chains of every game
+        Returns:
+        The (games, N, N) int64 array holding for every stone the smallest cell id (counting
+        the cells of all the games in order) of its chain, and -1 for an empty cell. step keeps
+        the labels up to date, after which a chain is labelled by the id of any of its stones.
+        '''
+        boards = self.boards
+        stones = boards != 0
+        no_label = boards.size
+        ids = np.arange(boards.size, dtype=np.int64).reshape(boards.shape)
+        labels = np.where(stones, ids, no_label)
+        padded_boards = pad(boards, OFF_BOARD)
+        same_colour = [stones & (neighbour == boards) for neighbour in neighbour_views(padded_boards)]
+        flat_stones = stones.ravel()
+        while True:
+            new_labels = labels.copy()
+            for same, neighbour_labels in zip(same_colour, neighbour_views(pad(labels, no_label))):
+                np.minimum(new_labels, np.where(same, neighbour_labels, no_label), out=new_labels)
+            # Every stone points to a stone of its chain with a smaller label, so jump along the pointers
+            flat = new_labels.ravel()
+            while True:
+                pointers = flat[flat_stones]
+                jumped = flat[pointers]
+                if np.array_equal(jumped, pointers):
+                    break
+                flat[flat_stones] = jumped
+            if np.array_equal(new_labels, labels):
+                return np.where(stones, labels, -1)
+            labels = new_labels
+
+    def count_liberties(self, labels: np.ndarray) -> np.ndarray:
+        '''
+        Returns the (games, N, N) array of the liberties of the chain of every stone (0 for
+        the empty cells), given the labels of the chains (see label_chains)
+        '''
+        empty = self.boards == 0
+        neighbours = neighbour_views(pad(labels, -1))
+        # Every empty cell is a liberty of the chains next to it, counted once per chain even
+        # if the chain touches it from several sides
+        liberty_of = []
+        for k, neighbour in enumerate(neighbours):
+            counted = empty & (neighbour >= 0)
+            for earlier in neighbours[:k]:
+                counted &= neighbour != earlier
+            liberty_of.append(neighbour[counted])
+        liberty_counts = np.bincount(np.concatenate(liberty_of), minlength=labels.size)
+        return np.where(labels >= 0, liberty_counts[np.maximum(labels, 0)], 0)
+
+    def legal_mask(self, allow_eyes: bool = True) -> np.ndarray:
+        '''
+        Returns which moves are legal for the player to move in every game
+        Parameters:
+        allow_eyes (bool): Whether a player may fill its own single point eyes (see
+        PlayoutBoard.is_eye). Random playouts need this to be False to end.
+        Returns:
+        The (games, N * N + 1) boolean array of the legal moves, where the last column is the
+        pass, which is always legal. Games that are over have no legal moves but the pass.
+        '''
+        boards = self.boards
+        liberties = self.liberties
+        colour = self.to_play[:, None, None]
+        empty = boards == 0
+        padded_boards = pad(boards, OFF_BOARD)
+        padded_liberties = pad(liberties, 0)
+        legal = np.zeros(boards.shape, dtype=bool)
+        for neighbour, neighbour_liberties in zip(neighbour_views(padded_boards), neighbour_views(padded_liberties)):
+            legal |= neighbour == 0 # Has a liberty of its own
+            legal |= (neighbour == colour) & (neighbour_liberties > 1) # Connects to a chain that keeps a liberty
+            legal |= (neighbour == -colour) & (neighbour_liberties == 1) # Captures
+        legal &= empty
+        if not allow_eyes:
+            legal &= ~self.eye_mask()
+        legal = legal.reshape(self.n_games, -1)
+        has_ko = self.ko_point >= 0
+        legal[np.nonzero(has_ko)[0], self.ko_point[has_ko]] = False
+        legal[self.done] = False
+        return np.concatenate([legal, np.ones((self.n_games, 1), dtype=bool)], axis=1)
+
+    def eye_mask(self) -> np.ndarray:
+        '''
+        Returns the (games, N, N) mask of the single point eyes of the player to move: empty
+        cells whose neighbours are all its stones, with no opponent stone on the diagonals on
+        the edge and at most one in the middle
+        '''
+        boards = self.boards
+        colour = self.to_play[:, None, None]
+        padded_boards = pad(boards, OFF_BOARD)
+        eyes = boards == 0
+        for neighbour in neighbour_views(padded_boards):
+            eyes &= (neighbour == colour) | (neighbour == OFF_BOARD)
+        enemy_diagonals = np.zeros(boards.shape, dtype=np.int8)
+        on_edge = np.zeros(boards.shape, dtype=bool)
+        for diagonal in diagonal_views(padded_boards):
+            enemy_diagonals += diagonal == -colour
+            on_edge |= diagonal == OFF_BOARD
+        return eyes & (enemy_diagonals <= np.where(on_edge, 0, 1))
+
+    def step(self, moves: np.ndarray, validate: bool = True):
+        '''
+        Plays one move in every game that is not over
+        Parameters:
+        moves (np.ndarray): The 1D index of the move of every game, -1 for a pass. The moves
+        of the games that are over are ignored.
+        validate (bool): Whether to check that the moves are legal first, which can be skipped
+        for moves taken from legal_mask
+        '''
+        moves = np.asarray(moves, dtype=np.int64)
+        n_cells = self.board_size * self.board_size
+        playing = ~self.done
+        passing = playing & (moves == -1)
+        placing = playing & (moves != -1)
+        games = np.nonzero(placing)[0]
+        cells = moves[games]
+        if validate:
+            # Out of range moves would be checked against the pass column, so check them first
+            if ((cells < 0) | (cells >= n_cells)).any():
+                raise ValueError(f"Moves out of the board in games {games[(cells < 0) | (cells >= n_cells)].tolist()}")
+            illegal = ~self.legal_mask()[games, cells]
+            if illegal.any():
+                raise ValueError(f"Illegal moves (occupied, suicide or ko) in games {games[illegal].tolist()}")
+
+        # Place the stones and merge the chains they connect by relabelling them all
+        colours = self.to_play[games]
+        flat_boards = self.boards.reshape(self.n_games, -1)
+        flat_labels = self.labels.reshape(self.n_games, -1)
+        flat_boards[games, cells] = colours
+        new_ids = games * n_cells + cells
+        neighbour_cells = self.neighbour_table[cells]
+        on_board = neighbour_cells >= 0
+        neighbour_cells = np.where(on_board, neighbour_cells, 0)
+        same_colour = on_board & (flat_boards[games[:, None], neighbour_cells] == colours[:, None])
+        neighbour_labels = flat_labels[games[:, None], neighbour_cells]
+        merged_labels = np.minimum(new_ids, np.where(same_colour, neighbour_labels, new_ids[:, None]).min(axis=1))
+        flat_labels[games, cells] = new_ids
+        remap = np.arange(self.boards.size + 1, dtype=np.int64)
+        remap[np.where(same_colour, neighbour_labels, new_ids[:, None])] = merged_labels[:, None]
+        remap[new_ids] = merged_labels
+        remap[-1] = -1 # So that the empty cells stay at -1
+        self.labels = remap[self.labels]
+
+        # The chains of the opponent of the mover left without liberties are captured. As the
+        # moves are legal, the chain of the mover always keeps a liberty once they are removed.
+        liberties = self.count_liberties(self.labels)
+        opponent = np.where(placing, -self.to_play, 0)[:, None, None]
+        captured = (self.boards == opponent) & (liberties == 0)
+        n_captured = captured.sum(axis=(1, 2))
+        self.boards[captured] = 0
+        self.labels[captured] = -1
+        self.liberties = self.count_liberties(self.labels)
+
+        # A single stone that captured a single stone and has a single liberty left can be retaken
+        self.ko_point[playing] = -1
+        ko = (n_captured[games] == 1) & ~same_colour.any(axis=1) & \
+            (self.liberties.reshape(self.n_games, -1)[games, cells] == 1)
+        ko_games = games[ko]
+        if len(ko_games) > 0:
+            self.ko_point[ko_games] = np.argmax(captured[ko_games].reshape(len(ko_games), -1), axis=1)
+
+        self.passes[passing] += 1
+        self.passes[placing] = 0
+        self.done |= self.passes >= 2
+        self.to_play[playing] = -self.to_play[playing]
+        self.moves_played[playing] += 1
+
+    def random_moves(self) -> np.ndarray:
+        '''
+        Returns a uniformly random legal move of every game that does not fill an own eye,
+        or a pass if there is none
+        '''
+        mask = self.legal_mask(allow_eyes=False)
+        mask[:, -1] = False
+        keys = self.rng.random(mask.shape)
+        keys[~mask] = -1
+        moves = np.argmax(keys, axis=1)
+        return np.where(mask.any(axis=1), moves, -1)
+
+    def area_scores(self) -> np.ndarray:
+        '''Returns the area of 'x' minus the area of 'o' of every game'''
+        return territory_counts(self.boards)
+
+    def playout(self, max_moves: Optional[int] = None) -> np.ndarray:
+        '''
+        Plays random moves in all the games until both players passed in every game
+        Parameters:
+        max_moves (Optional[int]): The most steps to play, three times the cells if None
+        Returns:
+        The area scores of the final positions (see area_scores)
+        '''
+        if max_moves is None:
+            max_moves = 3 * self.board_size * self.board_size
+        for _ in range(max_moves):
+            if self.done.all():
+                break
+            self.step(self.random_moves(), validate=False)
+        return self.area_scores()
@@ -0,0 +1,428 @@
+from typing import Optional, Iterator
+from game_implementation.zobrist import hash_after_move
+
+
+def iterate_bits(mask: int) -> Iterator[int]:
+    """
+    Yields the indices of the set bits of mask, lowest first
+    Parameters:
+    mask (int): The bitmask
+    """
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def bit_indices(mask: int) -> list[int]:
+    """
+    Returns the indices of the set bits of mask, lowest first. Dense masks are read from
+    their binary string, which is faster than clearing one bit at a time.
+    Parameters:
+    mask (int): The bitmask
+    """
+    if mask.bit_count() < 12:
+        return list(iterate_bits(mask))
+    digits = bin(mask)[:1:-1]
+    return [index for index, digit in enumerate(digits) if digit == '1']
+
+
+class BitboardState:
+    '''
+    A go board stored as one Python int per colour, where bit i is set if the 1D index i
+    holds a stone of that colour. Neighbours, block flood fills, liberties, captures and
+    territories are computed with shifts and masks instead of per cell loops.
+    '''
+    # Board strings are converted through their decimal digits (see _masks_to_string)
+    _BLACK_DIGITS = str.maketrans('x-o', '100')
+    _WHITE_DIGITS = str.maketrans('x-o', '001')
+    _DIGITS_TO_PIECES = str.maketrans('012', '-xo')
+
+    def __init__(self, board_size: int, zobrist_table: list[dict[str, int]]):
+        '''
+        Initializes an empty board
+        Parameters:
+        board_size (int): The length of a side of the board
+        zobrist_table (list[dict[str, int]]): The keys used to hash the position
+        '''
+        N = board_size
+        self.BOARD_SIZE = N
+        self.ZOBRIST_TABLE = zobrist_table
+        self.hash = 0 # Zobrist hash of the position
+        self.FULL = (1 << (N * N)) - 1
+        first_column = sum(1 << (y * N) for y in range(N))
+        # Edge masks that stop horizontal shifts from wrapping around to the next row
+        self.NOT_FIRST_COLUMN = self.FULL & ~first_column
+        self.NOT_LAST_COLUMN = self.FULL & ~(first_column << (N - 1))
+        self.black = 0
+        self.white = 0
+        self._board_str: Optional[str] = '-' * (N * N)
+        self.undo_stack: list[tuple[int, int, int, Optional[str]]] = [] # One record per move made with play
+
+    def _masks_to_string(self, black: int, white: int) -> str:
+        """
+        Converts a pair of disjoint masks into a board string. The binary digits of the
+        masks are read as decimal numbers so that black + 2 * white has one digit per cell.
+        Parameters:
+        black (int): The mask of the cells to be marked 'x'
+        white (int): The mask of the cells to be marked 'o'
+        Returns:
+        The board string
+        """
+        digits = int(format(black, 'b')) + 2 * int(format(white, 'b'))
+        N = self.BOARD_SIZE
+        return str(digits).zfill(N * N)[::-1].translate(self._DIGITS_TO_PIECES)
+
+    @property
+    def board(self) -> str:
+        '''The board string of the current position'''
+        if self._board_str is None:
+            self._board_str = self._masks_to_string(self.black, self.white)
+        return self._board_str
+
+    def load(self, board: str):
+        """
+        Replaces the current position with the one in the board string
+        Parameters:
+        board (str): The go board
+        """
+        self.black = int(board.translate(self._BLACK_DIGITS)[::-1], 2)
+        self.white = int(board.translate(self._WHITE_DIGITS)[::-1], 2)
+        self.undo_stack = []
+        self.hash = 0
+        for index in iterate_bits(self.black):
+            self.hash ^= self.ZOBRIST_TABLE[index]['x']
+        for index in iterate_bits(self.white):
+            self.hash ^= self.ZOBRIST_TABLE[index]['o']
+        self._board_str = board
+
+    def get_masks(self, piece: str) -> tuple[int, int]:
+        """
+        Returns the masks of the pieces of both the players
+        Parameters:
+        piece (str): The piece of the player whose mask is to be returned first
+        Returns:
+        (own, opponent) masks
+        """
+        return (self.black, self.white) if piece == 'x' else (self.white, self.black)
+
+    def neighbours(self, mask: int) -> int:
+        """
+        Returns the mask of the cells that neighbour a cell in mask. Cells of mask are only
+        included if they neighbour another cell of mask.
+        Parameters:
+        mask (int): The mask to shift
+        Returns:
+        The neighbours mask
+        """
+        N = self.BOARD_SIZE
+        return (((mask >> 1) & self.NOT_LAST_COLUMN) | ((mask << 1) & self.NOT_FIRST_COLUMN)
+                | (mask >> N) | (mask << N)) & self.FULL
+
+    def dilate(self, mask: int) -> int:
+        """
+        Returns the mask of the cells outside mask that neighbour a cell in mask
+        Parameters:
+        mask (int): The mask to grow
+        Returns:
+        The neighbours mask
+        """
+        return self.neighbours(mask) & ~mask
+
+    def flood_fill(self, seed: int, within: int) -> int:
+        """
+        Grows seed inside the cells of within until it stops changing
+        Parameters:
+        seed (int): The mask to start from
+        within (int): The mask of the cells that may be filled
+        Returns:
+        The mask of the cells of within connected to seed
+        """
+        N = self.BOARD_SIZE
+        not_first_column, not_last_column = self.NOT_FIRST_COLUMN, self.NOT_LAST_COLUMN
+        region = seed & within
+        # Inlined neighbours: this is the hot loop of the backend, and within keeps the
+        # shifts on the board
+        while True:
+            grown = (region | ((region >> 1) & not_last_column) | ((region << 1) & not_first_column)
+                     | (region >> N) | (region << N)) & within
+            if grown == region:
+                return region
+            region = grown
+
+    def multi_liberty_stones(self, empty: int) -> int:
+        """
+        Returns the mask of the cells with at least two empty neighbours. The block of such a
+        stone has at least two liberties without having to be flood filled.
+        Parameters:
+        empty (int): The mask of the empty cells
+        Returns:
+        The mask of the cells
+        """
+        N = self.BOARD_SIZE
+        left = (empty << 1) & self.NOT_FIRST_COLUMN # The cell to the left is empty
+        right = (empty >> 1) & self.NOT_LAST_COLUMN
+        up = (empty << N) & self.FULL
+        down = empty >> N
+        return (left & right) | (up & down) | ((left | right) & (up | down))
+
+    def unsafe_blocks(self, stones: int, empty: int) -> Iterator[tuple[int, int]]:
+        """
+        Yields the blocks of stones that may have fewer than two liberties, along with their
+        liberties. The blocks with a stone that has two empty neighbours are left out with a
+        single flood fill, so only the few other blocks are flood filled one by one.
+        Parameters:
+        stones (int): The mask of the stones of one colour
+        empty (int): The mask of the empty cells
+        Returns:
+        (block, liberties) mask pairs
+        """
+        remaining = stones & ~self.flood_fill(stones & self.multi_liberty_stones(empty), stones)
+        while remaining:
+            group = self.flood_fill(remaining & -remaining, stones)
+            remaining &= ~group
+            yield group, self.dilate(group) & empty
+
+    def group_mask(self, index: int) -> int:
+        """
+        Returns the mask of the block containing index
+        Parameters:
+        index (int): The 1D index of a stone
+        Returns:
+        The block mask
+        """
+        bit = 1 << index
+        colour_mask = self.black if self.black & bit else self.white
+        return self.flood_fill(bit, colour_mask)
+
+    def group_stones(self, index: int) -> list[int]:
+        """
+        Returns the 1D indices of the stones in the block containing index
+        Parameters:
+        index (int): The 1D index of a stone
+        Returns:
+        The list of stone indices
+        """
+        return bit_indices(self.group_mask(index))
+
+    def liberty_count(self, index: int) -> int:
+        """
+        Returns the number of liberties of the block containing index
+        Parameters:
+        index (int): The 1D index
+        Returns:
+        The total number of liberties of the block
+        """
+        if not (self.black | self.white) >> index & 1:
+            raise ValueError('The liberties of an empty cell is not defined')
+        empty = self.FULL & ~(self.black | self.white)
+        return (self.dilate(self.group_mask(index)) & empty).bit_count()
+
+    def _resolve_move(self, index: int, piece: str) -> Optional[tuple[int, int, int]]:
+        """
+        Computes the position after placing piece at the empty cell index without changing
+        the board
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        Returns:
+        (own, opponent, captured) masks after the move, or None if the move is a suicide
+        """
+        bit = 1 << index
+        own, opponent = self.get_masks(piece)
+        own |= bit
+        empty = self.FULL & ~(own | opponent)
+        captured = 0
+        to_check = self.dilate(bit) & opponent
+        while to_check:
+            group = self.flood_fill(to_check & -to_check, opponent)
+            to_check &= ~group
+            if not self.dilate(group) & empty:
+                captured |= group
+        if captured:
+            opponent &= ~captured
+            empty |= captured
+        elif not self.dilate(self.flood_fill(bit, own)) & empty:
+            return None
+        return own, opponent, captured
+
+    def captured_stones(self, index: int, piece: str) -> list[int]:
+        """
+        Returns the stones that would be captured by placing piece at index
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        Returns:
+        The 1D indices of the captured stones
+        """
+        resolved = self._resolve_move(index, piece)
+        if resolved is None:
+            raise ValueError("Cannot perform suicide")
+        return bit_indices(resolved[2])
+
+    def hash_after_move(self, index: int, piece: str, captured: Optional[list[int]] = None) -> int:
+        """
+        Returns the hash of the position after a valid move without making the move
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures, computed if not given
+        Returns:
+        The hash of the new position
+        """
+        if captured is None:
+            captured = self.captured_stones(index, piece)
+        return hash_after_move(self.ZOBRIST_TABLE, self.hash, index, piece, captured)
+
+    def is_suicide(self, index: int, piece: str) -> bool:
+        """
+        Returns whether placing piece at the empty cell index leaves its block without
+        liberties (captures taken into account)
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        Returns:
+        True if the move is a suicide
+        """
+        bit = 1 << index
+        own, opponent = self.get_masks(piece)
+        empty = self.FULL & ~(own | opponent)
+        if self.dilate(bit) & empty:
+            return False # Cheap check for the common case of a free liberty
+        return self._resolve_move(index, piece) is None
+
+    def is_valid_move(self, index: int, piece: str) -> bool:
+        """
+        Returns whether piece can be placed at index
+        Parameters:
+        index (int): The 1D index
+        piece (str): The piece to be placed
+        Returns:
+        True if the move is valid, False if it is invalid
+        """
+        return not (self.black | self.white) >> index & 1 and not self.is_suicide(index, piece)
+
+    def classify_moves(self, piece: str, history: Optional[set[int]] = None) \
+            -> tuple[list[int], list[int], dict[int, list[int]]]:
+        """
+        Classifies every empty cell using a flood fill per block that may be short of
+        liberties (see unsafe_blocks). A move is valid if it touches an empty cell, one of our
+        blocks with at least two liberties, or an opponent block in atari (which it then
+        captures).
+        Parameters:
+        piece (str): The piece to be placed
+        history (Optional[set[int]]): The hashes of the positions that occured so far. If
+        given, the moves that repeat one of them are left out of valid_moves (superko).
+        Returns:
+        (valid_moves, suicide_moves, captures) where captures maps every capturing move to
+        the 1D indices of the stones it captures
+        """
+        own, opponent = self.get_masks(piece)
+        empty = self.FULL & ~(own | opponent)
+        unsafe_own = 0 # Our stones in blocks with fewer than two liberties
+        for group, liberties in self.unsafe_blocks(own, empty):
+            if liberties.bit_count() < 2:
+                unsafe_own |= group
+        safe_own = own & ~unsafe_own
+        capture_masks: dict[int, int] = {} # From the liberty of a block in atari to the block
+        for group, liberties in self.unsafe_blocks(opponent, empty):
+            if liberties.bit_count() == 1:
+                capture_masks[liberties] = capture_masks.get(liberties, 0) | group
+        capturing = sum(capture_masks)
+        valid = empty & (self.neighbours(empty) | self.dilate(safe_own) | capturing)
+        captures = {liberty.bit_length() - 1: bit_indices(group)
+                    for liberty, group in capture_masks.items()}
+        valid_moves = bit_indices(valid)
+        if history:
+            valid_moves = [move for move in valid_moves
+                           if self.hash_after_move(move, piece, captures.get(move, [])) not in history]
+        return valid_moves, bit_indices(empty & ~valid), captures
+
+    def place(self, index: int, piece: str, captured: Optional[list[int]] = None) -> list[int]:
+        """
+        Places piece at index and removes captured opponent blocks
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures as given by
+        classify_moves. The move is then already known to be legal and no block is
+        flood filled.
+        Returns:
+        The 1D indices of the stones that were captured
+        """
+        if (self.black | self.white) >> index & 1:
+            raise ValueError("Cannot place a piece on a non empty cell")
+        if captured is None:
+            resolved = self._resolve_move(index, piece)
+            if resolved is None:
+                raise ValueError("Cannot perform suicide")
+            own, opponent, captured_mask = resolved
+        else:
+            own, opponent = self.get_masks(piece)
+            captured_mask = sum(1 << stone for stone in captured)
+            own |= 1 << index
+            opponent &= ~captured_mask
+        board = self.board
+        self.hash ^= self.ZOBRIST_TABLE[index][piece]
+        if captured_mask:
+            opponent_piece = 'o' if piece == 'x' else 'x'
+            for stone in iterate_bits(captured_mask):
+                self.hash ^= self.ZOBRIST_TABLE[stone][opponent_piece]
+        if piece == 'x':
+            self.black, self.white = own, opponent
+        else:
+            self.white, self.black = own, opponent
+        if captured_mask:
+            self._board_str = None
+        else:
+            self._board_str = board[:index] + piece + board[index + 1:]
+        return bit_indices(captured_mask)
+
+    def play(self, index: int, piece: str, captured: Optional[list[int]] = None):
+        """
+        Makes a move that can be taken back with undo
+        Parameters:
+        index (int): The 1D index of the empty cell, or -1 to pass
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures as given by
+        classify_moves
+        """
+        record = (self.black, self.white, self.hash, self._board_str)
+        if index != -1:
+            self.place(index, piece, captured)
+        self.undo_stack.append(record)
+
+    def undo(self):
+        """
+        Takes back the last move made with play
+        """
+        self.black, self.white, self.hash, self._board_str = self.undo_stack.pop()
+
+    def forget_moves(self):
+        """
+        Forgets the moves made with play, which can no longer be taken back
+        """
+        self.undo_stack = []
+
+    def create_territory(self) -> str:
+        """
+        Creates the territory string of the current position. A cell belongs to a player
+        if it can be reached from their stones through empty cells but not from the
+        opponent's stones.
+        Returns:
+        The corresponding territory_str
+        """
+        empty = self.FULL & ~(self.black | self.white)
+        black_reach = self.flood_fill(self.black, self.black | empty)
+        white_reach = self.flood_fill(self.white, self.white | empty)
+        return self._masks_to_string(black_reach & ~white_reach, white_reach & ~black_reach)
+
+    def territory_score(self) -> int:
+        """
+        Returns the area of 'x' minus the area of 'o' in the current position (see
+        create_territory). This takes two flood fills rather than being kept up to date.
+        """
+        empty = self.FULL & ~(self.black | self.white)
+        black_reach = self.flood_fill(self.black, self.black | empty)
+        white_reach = self.flood_fill(self.white, self.white | empty)
+        return (black_reach & ~white_reach).bit_count() - (white_reach & ~black_reach).bit_count()
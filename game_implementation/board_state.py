@@ -0,0 +1,421 @@
+from typing import Optional
+from game_implementation.zobrist import hash_after_move
+from game_implementation.territory_tracker import TerritoryTracker
+
+
+class StoneGroup:
+    '''A block of connected stones of the same colour along with its liberties'''
+    __slots__ = ('colour', 'stones', 'liberties')
+
+    def __init__(self, colour: str, stones: list[int], liberties: set[int]):
+        '''
+        Initializes the group
+        Parameters:
+        colour (str): The piece the group is made of ('x' or 'o')
+        stones (list[int]): The 1D indices of the stones in the group
+        liberties (set[int]): The 1D indices of the empty cells touching the group
+        '''
+        self.colour = colour
+        self.stones = stones
+        self.liberties = liberties
+
+
+class BoardState:
+    '''
+    A mutable go board that keeps every block of stones and its liberties up to date as
+    stones are placed and captured. Captures, suicide checks and liberty counts are then
+    O(1) or O(group size) instead of a fresh flood fill. Once the territory has been asked
+    for, the empty regions and the area score are kept up to date as well (see
+    TerritoryTracker).
+    '''
+    def __init__(self, graph: list[list[int]], zobrist_table: list[dict[str, int]]):
+        '''
+        Initializes an empty board
+        Parameters:
+        graph (list[list[int]]): The neighbours graph (see MoveManager.generate_graph)
+        zobrist_table (list[dict[str, int]]): The keys used to hash the position
+        '''
+        self.GRAPH = graph
+        self.ZOBRIST_TABLE = zobrist_table
+        self.hash = 0 # Zobrist hash of the position
+        self.cells: list[str] = ['-'] * len(graph)
+        self.groups: list[Optional[StoneGroup]] = [None] * len(graph)
+        self._board_str: Optional[str] = '-' * len(graph)
+        self.undo_stack: list = [] # One record per move made with play
+        self.territory = TerritoryTracker(graph)
+        # The empty regions are only labelled on the first territory query after a load, so
+        # the boards that are never scored do not pay for them
+        self.territory_loaded = False
+
+    @property
+    def board(self) -> str:
+        '''The board string of the current position'''
+        if self._board_str is None:
+            self._board_str = ''.join(self.cells)
+        return self._board_str
+
+    def load(self, board: str):
+        """
+        Replaces the current position with the one in the board string. This labels every
+        block once, so it is O(N * N).
+        Parameters:
+        board (str): The go board
+        """
+        self.cells = list(board)
+        self.groups = [None] * len(board)
+        self.undo_stack = []
+        cells, groups = self.cells, self.groups
+        for index in range(len(cells)):
+            colour = cells[index]
+            if colour == '-' or groups[index] is not None:
+                continue
+            group = StoneGroup(colour, [index], set())
+            groups[index] = group
+            stack = [index]
+            # Performing a simple dfs over the block
+            while stack:
+                node = stack.pop()
+                for neighbour in self.GRAPH[node]:
+                    if cells[neighbour] == '-':
+                        group.liberties.add(neighbour)
+                    elif cells[neighbour] == colour and groups[neighbour] is None:
+                        groups[neighbour] = group
+                        group.stones.append(neighbour)
+                        stack.append(neighbour)
+        self.hash = 0
+        for index, piece in enumerate(cells):
+            self.hash ^= self.ZOBRIST_TABLE[index][piece]
+        self.territory_loaded = False
+        self._board_str = board
+
+    def liberty_count(self, index: int) -> int:
+        """
+        Returns the number of liberties of the block containing index
+        Parameters:
+        index (int): The 1D index
+        Returns:
+        The total number of liberties of the block
+        """
+        group = self.groups[index]
+        if group is None:
+            raise ValueError('The liberties of an empty cell is not defined')
+        return len(group.liberties)
+
+    def group_stones(self, index: int) -> list[int]:
+        """
+        Returns the 1D indices of the stones in the block containing index
+        Parameters:
+        index (int): The 1D index of a stone
+        Returns:
+        The list of stone indices
+        """
+        return self.groups[index].stones
+
+    def _territory(self) -> TerritoryTracker:
+        """
+        Returns the territory tracker, labelling the empty regions first if they have not
+        been since the last load
+        """
+        if not self.territory_loaded:
+            self.territory.load(self.cells)
+            self.territory_loaded = True
+        return self.territory
+
+    def create_territory(self) -> str:
+        """
+        Returns the territory string of the current position (see MoveManager.create_territory)
+        """
+        return self._territory().territory_string()
+
+    def territory_score(self) -> int:
+        """
+        Returns the area of 'x' minus the area of 'o' in the current position, in O(1) once
+        the empty regions are labelled
+        """
+        return self._territory().score
+
+    def get_captures(self, index: int, piece: str) -> list[StoneGroup]:
+        """
+        Returns the opponent blocks that would be captured by placing piece at index
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        Returns:
+        The list of distinct blocks whose only liberty is index
+        """
+        captures = []
+        for neighbour in self.GRAPH[index]:
+            group = self.groups[neighbour]
+            if group is not None and group.colour != piece and len(group.liberties) == 1 \
+                    and group not in captures:
+                captures.append(group)
+        return captures
+
+    def captured_stones(self, index: int, piece: str) -> list[int]:
+        """
+        Returns the stones that would be captured by placing piece at index
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        Returns:
+        The 1D indices of the captured stones
+        """
+        return [stone for group in self.get_captures(index, piece) for stone in group.stones]
+
+    def hash_after_move(self, index: int, piece: str, captured: Optional[list[int]] = None) -> int:
+        """
+        Returns the hash of the position after a valid move without making the move
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures, computed if not given
+        Returns:
+        The hash of the new position
+        """
+        if captured is None:
+            captured = self.captured_stones(index, piece)
+        return hash_after_move(self.ZOBRIST_TABLE, self.hash, index, piece, captured)
+
+    def is_suicide(self, index: int, piece: str) -> bool:
+        """
+        Returns whether placing piece at the empty cell index leaves its block without
+        liberties (captures taken into account)
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        Returns:
+        True if the move is a suicide
+        """
+        for neighbour in self.GRAPH[index]:
+            group = self.groups[neighbour]
+            if group is None:
+                return False # A free liberty
+            if group.colour == piece:
+                if len(group.liberties) > 1:
+                    return False # Joining a block that keeps another liberty
+            elif len(group.liberties) == 1:
+                return False # Captures, which frees index's neighbour
+        return True
+
+    def is_valid_move(self, index: int, piece: str) -> bool:
+        """
+        Returns whether piece can be placed at index
+        Parameters:
+        index (int): The 1D index
+        piece (str): The piece to be placed
+        Returns:
+        True if the move is valid, False if it is invalid
+        """
+        return self.cells[index] == '-' and not self.is_suicide(index, piece)
+
+    def classify_moves(self, piece: str, history: Optional[set[int]] = None) \
+            -> tuple[list[int], list[int], dict[int, list[int]]]:
+        """
+        Classifies every empty cell in one pass over the board using the liberty counts of
+        the neighbouring blocks
+        Parameters:
+        piece (str): The piece to be placed
+        history (Optional[set[int]]): The hashes of the positions that occured so far. If
+        given, the moves that repeat one of them are left out of valid_moves (superko).
+        Returns:
+        (valid_moves, suicide_moves, captures) where captures maps every capturing move to
+        the 1D indices of the stones it captures
+        """
+        valid_moves = []
+        suicide_moves = []
+        captures = {}
+        cells, groups = self.cells, self.groups
+        for index in range(len(cells)):
+            if cells[index] != '-':
+                continue
+            is_valid = False
+            captured_groups = None
+            for neighbour in self.GRAPH[index]:
+                group = groups[neighbour]
+                if group is None:
+                    is_valid = True
+                elif group.colour == piece:
+                    if len(group.liberties) > 1:
+                        is_valid = True
+                elif len(group.liberties) == 1:
+                    is_valid = True
+                    if captured_groups is None:
+                        captured_groups = [group]
+                    elif group not in captured_groups:
+                        captured_groups.append(group)
+            if not is_valid:
+                suicide_moves.append(index)
+                continue
+            valid_moves.append(index)
+            if captured_groups is not None:
+                captures[index] = [stone for group in captured_groups for stone in group.stones]
+        if history:
+            valid_moves = [move for move in valid_moves
+                           if self.hash_after_move(move, piece, captures.get(move, [])) not in history]
+        return valid_moves, suicide_moves, captures
+
+    def place(self, index: int, piece: str, captured: Optional[list[int]] = None) -> list[int]:
+        """
+        Places piece at index, merging blocks and removing captured opponent blocks
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures as given by
+        classify_moves. The move is then already known to be legal.
+        Returns:
+        The 1D indices of the stones that were captured
+        """
+        return self._place(index, piece, captured, False)
+
+    def play(self, index: int, piece: str, captured: Optional[list[int]] = None):
+        """
+        Makes a move that can be taken back with undo. Used by tree searches to walk the
+        tree on a single board instead of allocating a board per node.
+        Parameters:
+        index (int): The 1D index of the empty cell, or -1 to pass
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures as given by
+        classify_moves
+        """
+        if index == -1:
+            self.undo_stack.append(None)
+        else:
+            self._place(index, piece, captured, True)
+
+    def undo(self):
+        """
+        Takes back the last move made with play
+        """
+        record = self.undo_stack.pop()
+        if record is None:
+            return # A pass
+        index, friendly_records, opponent_groups, captured_groups, old_hash, old_board_str, territory_mark = record
+        cells, groups = self.cells, self.groups
+        for group in reversed(captured_groups):
+            for stone in group.stones:
+                cells[stone] = group.colour
+                groups[stone] = group
+            for stone in group.stones:
+                for neighbour in self.GRAPH[stone]:
+                    other = groups[neighbour]
+                    if other is not None and other is not group:
+                        other.liberties.discard(stone)
+            group.liberties.add(index)
+        for group, n_stones, liberties in friendly_records:
+            del group.stones[n_stones:]
+            group.liberties = liberties
+            for stone in group.stones:
+                groups[stone] = group
+        for group in opponent_groups:
+            group.liberties.add(index)
+        cells[index] = '-'
+        groups[index] = None
+        self.hash = old_hash
+        self._board_str = old_board_str
+        if territory_mark is not None:
+            self.territory.undo(territory_mark)
+        else:
+            self.territory_loaded = False # The regions were labelled after the move was made
+
+    def forget_moves(self):
+        """
+        Forgets the moves made with play, which can no longer be taken back
+        """
+        self.undo_stack = []
+        self.territory.journal = []
+
+    def _place(self, index: int, piece: str, captured: Optional[list[int]], record: bool) -> list[int]:
+        """
+        Places piece at index (see place)
+        Parameters:
+        index (int): The 1D index of the empty cell
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures as given by
+        classify_moves
+        record (bool): Whether to push what is needed to take back the move on the undo stack
+        Returns:
+        The 1D indices of the stones that were captured
+        """
+        if self.cells[index] != '-':
+            raise ValueError("Cannot place a piece on a non empty cell")
+        if captured is None and self.is_suicide(index, piece):
+            raise ValueError("Cannot perform suicide")
+        cells, groups = self.cells, self.groups
+        old_hash, old_board_str = self.hash, self._board_str
+        territory_loaded = self.territory_loaded
+        territory_mark = len(self.territory.journal) if territory_loaded else None
+        cells[index] = piece
+        self.hash ^= self.ZOBRIST_TABLE[index][piece]
+        self._board_str = None
+        if territory_loaded:
+            self.territory.place(index, piece, record)
+
+        new_group = StoneGroup(piece, [index], set())
+        friendly_groups = []
+        opponent_groups = []
+        for neighbour in self.GRAPH[index]:
+            group = groups[neighbour]
+            if group is None:
+                new_group.liberties.add(neighbour)
+            elif group.colour == piece:
+                if group not in friendly_groups:
+                    friendly_groups.append(group)
+            elif group not in opponent_groups:
+                opponent_groups.append(group)
+        groups[index] = new_group
+        if record:
+            friendly_records = [(group, len(group.stones), set(group.liberties)) for group in friendly_groups]
+        captured_groups = []
+        for group in friendly_groups:
+            group.liberties.discard(index)
+        for group in opponent_groups:
+            group.liberties.discard(index)
+            if not group.liberties:
+                captured_groups.append(group)
+
+        # Merge the smaller blocks into the largest one
+        largest = new_group
+        for group in friendly_groups:
+            if len(group.stones) > len(largest.stones):
+                largest = group
+        for group in friendly_groups + [new_group]:
+            if group is largest:
+                continue
+            for stone in group.stones:
+                groups[stone] = largest
+            largest.stones.extend(group.stones)
+            largest.liberties |= group.liberties
+        largest.liberties.discard(index)
+
+        captured = []
+        for group in captured_groups:
+            captured.extend(self._remove_group(group))
+            if territory_loaded:
+                self.territory.remove(group.stones, group.colour, record)
+        if record:
+            surviving_groups = [group for group in opponent_groups if group not in captured_groups]
+            self.undo_stack.append((index, friendly_records, surviving_groups, captured_groups,
+                                    old_hash, old_board_str, territory_mark))
+        return captured
+
+    def _remove_group(self, group: StoneGroup) -> list[int]:
+        """
+        Removes a block from the board and gives its cells back as liberties to the
+        neighbouring blocks
+        Parameters:
+        group (StoneGroup): The block to remove
+        Returns:
+        The 1D indices of the removed stones
+        """
+        cells, groups = self.cells, self.groups
+        for stone in group.stones:
+            cells[stone] = '-'
+            groups[stone] = None
+            self.hash ^= self.ZOBRIST_TABLE[stone][group.colour]
+        for stone in group.stones:
+            for neighbour in self.GRAPH[stone]:
+                other = groups[neighbour]
+                if other is not None:
+                    other.liberties.add(stone)
+        self._board_str = None
+        return group.stones
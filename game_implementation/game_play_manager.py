@@ -1,5 +1,6 @@
 from game_bots.bot import Bot
 from game_implementation.rules_implementation import MoveManager
+from typing import Optional
 class GameRunner:
     '''A class that simulates a go game between two bots'''
     def __init__(self, bot_x: type[Bot], bot_o: Bot, move_manager: MoveManager):
@@ -15,6 +16,65 @@ class GameRunner:
         self.piece_to_move: str = 'x'
         self.move_manager: MoveManager = move_manager
         self.board = move_manager.get_empty_board()
+        self.has_passed = False # Whether the last move was a pass
+        # Hashes of the positions that occured, for detecting ko's (positional superko)
+        self.states_achieved = {move_manager.get_hash(self.board)}
+
+    def bot_to_play(self) -> Bot:
+        '''Returns the bot whose turn it is'''
+        return self.bot_x if self.piece_to_move == 'x' else self.bot_o
+
+    def count_result(self) -> str:
+        '''
+        Counts the territory once both players passed and sends the result to the bots
+        Returns:
+        'x' if bot_x won
+        'o' if bot_o won
+        '-' if draw
+        '''
+        ct = self.move_manager.get_territory_score(self.board) # Black minus white area
+        if ct == 0:
+            self.bot_x.receive_result("Draw")
+            self.bot_o.receive_result("Draw")
+            return '-'
+        elif ct > 0:
+            self.bot_x.receive_result("You won")
+            self.bot_o.receive_result("You lost")
+            return 'x'
+        else:
+            self.bot_x.receive_result("You lost")
+            self.bot_o.receive_result("You won")
+            return 'o'
+
+    def play_move(self, move_played: int) -> Optional[str]:
+        '''
+        Plays the move of the bot whose turn it is
+        Parameters:
+        move_played (int): The 1D index of the move, or -1 for a pass
+        Returns:
+        The result of the game (see start_game) if the move ended it, None otherwise
+        '''
+        if move_played == -1:
+            if self.has_passed:
+                # Game is over
+                return self.count_result()
+            self.has_passed = True
+            self.piece_to_move = 'o' if self.piece_to_move == 'x' else 'x'
+            return None
+
+        self.has_passed = False
+        # The bots leave out the moves that repeat a position when generating moves, so
+        # a repetition here means the bot is broken
+        new_board = self.move_manager.make_move(self.board, move_played, self.piece_to_move)
+        new_hash = self.move_manager.get_hash(new_board)
+        if new_hash in self.states_achieved:
+            raise ValueError(f"Invalid move by {self.piece_to_move} because of ko")
+
+        self.states_achieved.add(new_hash)
+
+        self.board = new_board
+        self.piece_to_move = 'o' if self.piece_to_move == 'x' else 'x'
+        return None
 
     def start_game(self) -> str:
         '''
@@ -24,48 +84,12 @@ class GameRunner:
         'o' if bot_o won
         '-' if draw
         '''
-        has_passed = False
-        states_achieved = set() # For detecting ko's
+        self.bot_o.on_opponent_turn(self.board)
         while(True):
-            bot_to_play: Bot = self.bot_x if self.piece_to_move == 'x' else self.bot_o
-            move_played: int = bot_to_play.make_move(self.board, has_passed)
-            if move_played == -1:
-                if has_passed:
-                    # Game is over
-                    # Counting the territory
-                    territory_str = self.move_manager.create_territory(self.board)
-                    ct = 0
-                    for i in territory_str:
-                        if i == 'x':
-                            ct += 1
-                        elif i == 'o':
-                            ct -= 1
-                    if ct == 0:
-                        self.bot_x.receive_result("Draw")
-                        self.bot_o.receive_result("Draw")
-                        return '-'
-                    elif ct > 0:
-                        self.bot_x.receive_result("You won")
-                        self.bot_o.receive_result("You lost")
-                        return 'x'
-                    else:
-                        self.bot_x.receive_result("You lost")
-                        self.bot_o.receive_result("You won")
-                        return 'o'
-                    
-                else:
-                    has_passed = True
-                    self.piece_to_move = 'o' if self.piece_to_move == 'x' else 'x'
-                    continue
-            
-            has_passed = False
-            # I don't really have a good way to handle ko currently(I will have to think of something)
-            # For now, if ko occures, just abort the game
-            new_board = self.move_manager.make_move(self.board, move_played, self.piece_to_move)
-            if new_board in states_achieved:
-                raise ValueError(f"Invalid move by {self.piece_to_move} because of ko")
-            
-            states_achieved.add(new_board)
-            
-            self.board = new_board
-            self.piece_to_move = 'o' if self.piece_to_move == 'x' else 'x'
\ No newline at end of file
+            bot_to_play = self.bot_to_play()
+            move_played: int = bot_to_play.make_move(self.board, self.has_passed)
+            result = self.play_move(move_played)
+            if result is not None:
+                return result
+            # The bot can keep thinking while its opponent plays
+            bot_to_play.on_opponent_turn(self.board)
@@ -0,0 +1,245 @@
+'''
+Lightweight instrumentation of the searches: counters, the time spent in each phase and the
+depth and branching of the tree for the move being searched, along with the calls the search
+made to the rules engine (see MoveManager.engine_calls). The searches record once per
+expansion or per batch of evaluations, and count their nodes and leaves in plain integers
+that are added to the statistics at the end of the move, so the bots keep it on all the
+time. Timing every leaf on its own is left to SearchStats.time_leaves. Profilers (cProfile,
+or a sampling profiler that only looks at the stack every few milliseconds) can also be run
+around a call.
+'''
+from collections import Counter
+from typing import Any, Callable, Optional
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+
+
+class SearchStats:
+    '''
+    The statistics of the search of a single move. Only what happens between begin_move and
+    end_move is recorded, so a bot searching in the background while the opponent thinks
+    (pondering) does not change the statistics of its last move.
+    '''
+    def __init__(self, time_leaves: bool = False):
+        '''
+        Initializes the statistics
+        Parameters:
+        time_leaves (bool): Whether the minimax searches (MinimaxBot, DebugBot, AlphaBetaBot)
+        time the evaluation of every leaf, which is their 'evaluation' phase. The two clock
+        calls per leaf slowed them by about 8%, so it is off by default.
+        '''
+        self.time_leaves = time_leaves
+        self.reset()
+
+    def reset(self):
+        '''Clears the statistics'''
+        self.recording = False
+        self.counters: Counter[str] = Counter()
+        self.phase_seconds: dict[str, float] = {}
+        self.depth_count = 0 # Number of depths recorded, and their total and maximum
+        self.depth_total = 0
+        self.depth_max = 0
+        self.branching_count = 0 # Number of nodes expanded, and their total and maximum children
+        self.branching_total = 0
+        self.branching_max = 0
+        self.start_time = time.perf_counter()
+        self.seconds = 0.0
+        self.engine_calls: dict[str, int] = {}
+        self._engine_calls_start: dict[str, int] = {}
+
+    def begin_move(self, move_manager=None):
+        '''
+        Resets the statistics at the start of the search of a move
+        Parameters:
+        move_manager (Optional[MoveManager]): The rules engine whose calls are to be counted
+        '''
+        self.reset()
+        self.recording = True
+        if move_manager is not None:
+            self._engine_calls_start = move_manager.engine_calls()
+
+    def end_move(self, move_manager=None):
+        '''
+        Records the time taken by the move and the rules engine calls made since begin_move
+        Parameters:
+        move_manager (Optional[MoveManager]): The rules engine given to begin_move
+        '''
+        self.recording = False
+        self.seconds = time.perf_counter() - self.start_time
+        if move_manager is not None:
+            calls = move_manager.engine_calls()
+            self.engine_calls = {query: count - self._engine_calls_start.get(query, 0)
+                                 for query, count in calls.items() if count > self._engine_calls_start.get(query, 0)}
+
+    def count(self, name: str, amount: int = 1):
+        '''Adds amount to the counter name (e.g. 'nodes', 'expansions', 'evaluations')'''
+        if self.recording:
+            self.counters[name] += amount
+
+    def add_time(self, phase: str, seconds: float):
+        '''Adds seconds to the time spent in the phase (e.g. 'selection', 'expansion')'''
+        if self.recording:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+    def record_depth(self, depth: int, count: int = 1):
+        '''Records the depth of count leaves reached by the search'''
+        if not self.recording or count == 0:
+            return
+        self.depth_count += count
+        self.depth_total += depth * count
+        if depth > self.depth_max:
+            self.depth_max = depth
+
+    def record_branching(self, n_children: int):
+        '''Records the number of children of an expanded node'''
+        if not self.recording:
+            return
+        self.branching_count += 1
+        self.branching_total += n_children
+        if n_children > self.branching_max:
+            self.branching_max = n_children
+
+    def report(self) -> dict[str, Any]:
+        '''
+        Returns the statistics as plain data
+        Returns:
+        A dict with the seconds taken, the counters, the seconds per phase, the mean and
+        maximum depth and branching, and the rules engine calls by query
+        '''
+        return {
+            'seconds': self.seconds,
+            'counters': dict(self.counters),
+            'phases': dict(self.phase_seconds),
+            'depth': {'mean': self.depth_total / self.depth_count if self.depth_count else 0, 'max': self.depth_max},
+            'branching': {'mean': self.branching_total / self.branching_count if self.branching_count else 0,
+                          'max': self.branching_max},
+            'engine_calls': dict(self.engine_calls),
+        }
+
+
+def timed(function: Callable, stats: SearchStats, phase: str, counter: str, batch: bool = False) -> Callable:
+    '''
+    Wraps function so that the time spent in it is added to a phase of stats, and its calls
+    to a counter
+    Parameters:
+    function (Callable): The function to wrap, e.g. the evaluation of a bot
+    stats (SearchStats): The statistics to record to
+    phase (str): The phase the time is added to
+    counter (str): The counter the calls are added to
+    batch (bool): Whether the first argument is a batch, counted as one call per element
+    Returns:
+    The wrapped function
+    '''
+    clock = time.perf_counter
+    def wrapper(*args):
+        start = clock()
+        result = function(*args)
+        stats.add_time(phase, clock() - start)
+        stats.count(counter, len(args[0]) if batch else 1)
+        return result
+    return wrapper
+
+
+class SamplingProfiler:
+    '''
+    Samples the stack of a thread from a background thread at a fixed interval. It costs the
+    profiled thread almost nothing, unlike cProfile which hooks every function call.
+    '''
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        '''
+        Initializes the profiler
+        Parameters:
+        interval (float): The seconds between two samples
+        thread_id (Optional[int]): The thread to sample, the one creating the profiler if None
+        '''
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.self_samples: Counter[str] = Counter() # Samples where the function was running
+        self.total_samples: Counter[str] = Counter() # Samples where the function was on the stack
+        self.n_samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def describe(frame) -> str:
+        '''Returns the function of a frame as file:line(name)'''
+        code = frame.f_code
+        return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno}({code.co_name})"
+
+    def _sample(self):
+        '''Takes samples until stop is called'''
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.n_samples += 1
+            self.self_samples[self.describe(frame)] += 1
+            seen = set()
+            while frame is not None:
+                function = self.describe(frame)
+                if function not in seen: # Recursive functions are counted once per sample
+                    seen.add(function)
+                    self.total_samples[function] += 1
+                frame = frame.f_back
+
+    def start(self):
+        '''Starts sampling'''
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''Stops sampling'''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def report(self, top: int = 20) -> str:
+        '''
+        Returns the functions seen most often, as the percentage of the samples where they were
+        running and where they were on the stack
+        '''
+        lines = [f"{self.n_samples} samples every {self.interval * 1000:.0f} ms",
+                 f"{'self %':>7} {'total %':>7} function"]
+        n_samples = max(self.n_samples, 1)
+        for function, total in self.total_samples.most_common(top):
+            lines.append(f"{100 * self.self_samples[function] / n_samples:>7.1f} "
+                         f"{100 * total / n_samples:>7.1f} {function}")
+        return '\n'.join(lines)
+
+
+PROFILERS = ('cprofile', 'sampling')
+
+
+def profile_call(function: Callable, *args, profiler: str = 'cprofile', top: int = 20, interval: float = 0.005) \
+        -> tuple[Any, str]:
+    '''
+    Calls function(*args) under a profiler
+    Parameters:
+    function (Callable): The function to profile
+    profiler (str): 'cprofile' for a deterministic profile, 'sampling' for a SamplingProfiler
+    top (int): The number of functions to report
+    interval (float): The seconds between two samples of the sampling profiler
+    Returns:
+    A tuple (what the function returned, text report of the profile)
+    '''
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler}, expected one of {PROFILERS}")
+    if profiler == 'sampling':
+        sampler = SamplingProfiler(interval)
+        sampler.start()
+        try:
+            result = function(*args)
+        finally:
+            sampler.stop()
+        return result, sampler.report(top)
+    profile = cProfile.Profile()
+    result = profile.runcall(function, *args)
+    text = io.StringIO()
+    pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(top)
+    return result, text.getvalue()
@@ -0,0 +1,256 @@
+'''
+A light board for random playouts. It is a mutable list of cells with the chains of stones and
+their liberties kept up to date on every move, and a list of the empty points to draw the
+random moves from. Playouts only forbid simple ko (not positional superko), never fill a
+single point eye of their own and are scored by area.
+'''
+from typing import Optional
+import random
+
+EMPTY, BLACK, WHITE = 0, 1, 2
+PIECES = {'-': EMPTY, 'x': BLACK, 'o': WHITE}
+
+
+class PlayoutBoard:
+    '''A go board for fast random playouts'''
+    def __init__(self, board_size: int, seed: Optional[int] = None):
+        '''
+        Initializes an empty board
+        Parameters:
+        board_size (int): The length of a side of the board
+        seed (Optional[int]): The seed of the random number generator of the playouts
+        '''
+        N = board_size
+        self.board_size = N
+        self.rng = random.Random(seed)
+        self.neighbours: list[tuple[int, ...]] = []
+        self.diagonals: list[tuple[int, ...]] = []
+        for index in range(N * N):
+            y, x = divmod(index, N)
+            self.neighbours.append(tuple(
+                nx + ny * N for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                if 0 <= nx < N and 0 <= ny < N))
+            self.diagonals.append(tuple(
+                nx + ny * N for nx, ny in ((x - 1, y - 1), (x + 1, y - 1), (x - 1, y + 1), (x + 1, y + 1))
+                if 0 <= nx < N and 0 <= ny < N))
+        self.load('-' * N * N)
+
+    def load(self, board: str):
+        '''
+        Sets up the position of a board string
+        Parameters:
+        board (str): The go board
+        '''
+        n_cells = self.board_size * self.board_size
+        self.cells = [PIECES[ch] for ch in board]
+        self.chain_of = list(range(n_cells)) # The representative stone of the chain of every stone
+        self.stones: dict[int, list[int]] = {} # From representatives to the stones of the chain
+        self.liberties: dict[int, set[int]] = {} # From representatives to the liberties of the chain
+        self.empties = [index for index in range(n_cells) if self.cells[index] == EMPTY]
+        self.empty_position = [-1] * n_cells # Position of every empty point in self.empties
+        for position, index in enumerate(self.empties):
+            self.empty_position[index] = position
+        self.ko_point = -1
+        self.moves_played = 0 # Moves (passes included) of the last playout
+        cells = self.cells
+        for index in range(n_cells):
+            if cells[index] == EMPTY or index in self.stones or self.chain_of[index] != index:
+                continue
+            # Label the chain of index with a flood fill
+            colour = cells[index]
+            chain = [index]
+            liberties = set()
+            self.chain_of[index] = index
+            seen = {index}
+            i = 0
+            while i < len(chain):
+                for neighbour in self.neighbours[chain[i]]:
+                    if cells[neighbour] == EMPTY:
+                        liberties.add(neighbour)
+                    elif cells[neighbour] == colour and neighbour not in seen:
+                        seen.add(neighbour)
+                        self.chain_of[neighbour] = index
+                        chain.append(neighbour)
+                i += 1
+            self.stones[index] = chain
+            self.liberties[index] = liberties
+
+    def _remove_empty(self, index: int):
+        '''Removes index from the empty points by swapping it with the last one'''
+        position = self.empty_position[index]
+        last = self.empties.pop()
+        if last != index:
+            self.empties[position] = last
+            self.empty_position[last] = position
+        self.empty_position[index] = -1
+
+    def is_eye(self, index: int, colour: int) -> bool:
+        '''
+        Returns whether the empty point is a single point eye of colour: all its neighbours are
+        stones of colour and enough of its diagonals are too (none of them may be taken by the
+        opponent on the edge, at most one in the middle)
+        '''
+        cells = self.cells
+        for neighbour in self.neighbours[index]:
+            if cells[neighbour] != colour:
+                return False
+        diagonals = self.diagonals[index]
+        enemy = 3 - colour
+        enemy_diagonals = 0
+        for diagonal in diagonals:
+            if cells[diagonal] == enemy:
+                enemy_diagonals += 1
+        return enemy_diagonals == 0 if len(diagonals) < 4 else enemy_diagonals <= 1
+
+    def is_legal(self, index: int, colour: int) -> bool:
+        '''
+        Returns whether colour may play on the empty point: not the ko point and not suicide
+        '''
+        if index == self.ko_point:
+            return False
+        cells = self.cells
+        liberties = self.liberties
+        chain_of = self.chain_of
+        for neighbour in self.neighbours[index]:
+            cell = cells[neighbour]
+            if cell == EMPTY:
+                return True
+            n_liberties = len(liberties[chain_of[neighbour]])
+            if cell == colour:
+                if n_liberties > 1:
+                    return True # Connects to a chain that keeps a liberty
+            elif n_liberties == 1:
+                return True # Captures
+        return False
+
+    def play(self, index: int, colour: int):
+        '''
+        Places a stone of colour on a legal empty point, merging chains and removing captures
+        Parameters:
+        index (int): The 1D index of the move
+        colour (int): BLACK or WHITE
+        '''
+        cells = self.cells
+        chain_of = self.chain_of
+        stones = self.stones
+        liberties = self.liberties
+        cells[index] = colour
+        self._remove_empty(index)
+        chain_of[index] = index
+        stones[index] = [index]
+        liberties[index] = set()
+        rep = index
+        captured_stones = []
+        for neighbour in self.neighbours[index]:
+            cell = cells[neighbour]
+            if cell == EMPTY:
+                liberties[rep].add(neighbour)
+            elif cell == colour:
+                other = chain_of[neighbour]
+                if other == rep:
+                    continue
+                # Merge the smaller chain into the larger one
+                if len(stones[other]) > len(stones[rep]):
+                    other, rep = rep, other
+                for stone in stones[other]:
+                    chain_of[stone] = rep
+                stones[rep].extend(stones.pop(other))
+                liberties[rep] |= liberties.pop(other)
+            else:
+                enemy_liberties = liberties.get(chain_of[neighbour])
+                if enemy_liberties is None:
+                    continue # Already captured through another neighbour
+                other = chain_of[neighbour]
+                enemy_liberties.discard(index)
+                if not enemy_liberties:
+                    captured_stones.extend(stones.pop(other))
+                    del liberties[other]
+        liberties[rep].discard(index)
+
+        if captured_stones:
+            for stone in captured_stones:
+                cells[stone] = EMPTY
+            empty_position = self.empty_position
+            empties = self.empties
+            for stone in captured_stones:
+                empty_position[stone] = len(empties)
+                empties.append(stone)
+                chain_of[stone] = stone
+                for neighbour in self.neighbours[stone]:
+                    if cells[neighbour] == colour:
+                        liberties[chain_of[neighbour]].add(stone)
+        # A single stone that captured a single stone and has one liberty left can be retaken
+        if len(captured_stones) == 1 and len(stones[rep]) == 1 and len(liberties[rep]) == 1:
+            self.ko_point = captured_stones[0]
+        else:
+            self.ko_point = -1
+
+    def random_move(self, colour: int) -> int:
+        '''
+        Returns a uniformly random legal move of colour that does not fill one of its own eyes.
+        Random empty points are drawn from a window at the front of the empty points, and a
+        rejected one is swapped to the end of the window so that it is not drawn again.
+        Returns:
+        The 1D index of the move, or -1 if colour has to pass
+        '''
+        empties, empty_position, rng = self.empties, self.empty_position, self.rng
+        window = len(empties)
+        while window:
+            position = int(rng.random() * window) # Quicker than randrange
+            index = empties[position]
+            if not self.is_eye(index, colour) and self.is_legal(index, colour):
+                return index
+            window -= 1
+            last = empties[window]
+            empties[position], empties[window] = last, index
+            empty_position[last], empty_position[index] = position, window
+        return -1
+
+    def area_score(self) -> int:
+        '''
+        Returns the area of 'x' minus the area of 'o': stones plus the empty points whose
+        neighbours all have the same colour
+        '''
+        cells = self.cells
+        score = 0
+        for cell in cells:
+            if cell == BLACK:
+                score += 1
+            elif cell == WHITE:
+                score -= 1
+        for index in self.empties:
+            colours = {cells[neighbour] for neighbour in self.neighbours[index]}
+            if colours == {BLACK}:
+                score += 1
+            elif colours == {WHITE}:
+                score -= 1
+        return score
+
+    def playout(self, piece: str, other_pass: bool = False, max_moves: Optional[int] = None) -> int:
+        '''
+        Plays random moves from the current position until both players pass
+        Parameters:
+        piece (str): The piece to move first
+        other_pass (bool): Whether the last move before the playout was a pass
+        max_moves (Optional[int]): The most moves to play, three times the cells if None
+        Returns:
+        The area score of the final position (see area_score)
+        '''
+        if max_moves is None:
+            max_moves = 3 * self.board_size * self.board_size
+        colour = PIECES[piece]
+        passes = 1 if other_pass else 0
+        self.moves_played = 0
+        while self.moves_played < max_moves:
+            self.moves_played += 1
+            move = self.random_move(colour)
+            if move == -1:
+                passes += 1
+                if passes == 2:
+                    break
+                self.ko_point = -1
+            else:
+                passes = 0
+                self.play(move, colour)
+            colour = 3 - colour
+        return self.area_score()
@@ -0,0 +1,74 @@
+'''
+A bounded least recently used cache for the results of the MoveManager queries. Entries are
+keyed by the Zobrist hash of the position (plus whatever else the query depends on) and keep
+the board they were computed for, so that a hash collision is a miss instead of a wrong
+answer.
+'''
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import threading
+
+
+class QueryCache:
+    '''A least recently used cache holding at most capacity entries'''
+    def __init__(self, capacity: int):
+        '''
+        Initializes an empty cache
+        Parameters:
+        capacity (int): The most entries kept, the least recently used ones are evicted first
+        '''
+        if capacity <= 0:
+            raise ValueError("The capacity of a cache must be positive")
+        self.capacity = capacity
+        self.entries: OrderedDict[Hashable, tuple[str, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # The move manager is shared by the GUI thread and the thread of the bot
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, board: str) -> Optional[Any]:
+        '''
+        Returns the value stored for the key if it was computed for board, None otherwise
+        Parameters:
+        key (Hashable): The key of the query
+        board (str): The go board of the query
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != board:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, board: str, value: Any):
+        '''
+        Stores the value of a query, evicting the least recently used entry if the cache is full
+        Parameters:
+        key (Hashable): The key of the query
+        board (str): The go board of the query
+        value (Any): The result of the query
+        '''
+        with self.lock:
+            self.entries[key] = (board, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        '''Empties the cache and resets the counters'''
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Returns the counters of the cache
+        Returns:
+        A dict with the hits, misses, evictions, the current size and the capacity
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.entries), 'capacity': self.capacity}
@@ -1,11 +1,81 @@
-from typing import Union
+from collections import Counter
+from typing import Optional, Union
+import threading
+from game_implementation.board_state import BoardState
+from game_implementation.bitboard import BitboardState
+from game_implementation.territory_tracker import TerritoryTracker
+from game_implementation.zobrist import generate_zobrist_table, hash_board, hash_after_move
+from game_implementation.query_cache import QueryCache
 
 
 class MoveManager:
     """Class that manages moves"""
-    def __init__(self, board_size: int):
+    BACKENDS = ('string', 'bitboard')
+    # The queries whose results can be cached (see cache_sizes)
+    CACHED_QUERIES = ('next_moves', 'territory', 'liberties')
+
+    def __init__(self, board_size: int, backend: str = 'string', cache_sizes: Optional[dict[str, int]] = None):
+        '''
+        Initializes the move manager
+        Parameters:
+        board_size (int): The length of a side of the board
+        backend (str): 'string' keeps the blocks and their liberties in a BoardState,
+        'bitboard' stores the position as one bitmask per colour (see BitboardState). The
+        string backend is the faster one for move generation and liberties, and the default.
+        cache_sizes (Optional[dict[str, int]]): The most results to remember for each of the
+        CACHED_QUERIES: 'next_moves' for classify_moves and get_next_moves, 'territory' for
+        create_territory and get_territory_score, 'liberties' for get_liberty_count. The
+        queries left out are not cached (see cache_stats). A miss costs a hash of the board,
+        so the caches only pay off for callers that query the same positions again (see
+        benchmarks/cache_benchmark.py), which the bots do not.
+        '''
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {self.BACKENDS}")
+        cache_sizes = cache_sizes or {}
+        for query in cache_sizes:
+            if query not in self.CACHED_QUERIES:
+                raise ValueError(f"Unknown query {query}, expected one of {self.CACHED_QUERIES}")
+        self.caches = {query: QueryCache(size) for query, size in cache_sizes.items()}
         self.BOARD_SIZE = board_size
+        self.BACKEND = backend
         self.GRAPH = self.generate_graph() # Neighbours graph
+        self.ZOBRIST_TABLE = generate_zobrist_table(board_size * board_size)
+        self.SYMMETRIES = self.generate_symmetries() # The 8 symmetries of the board as index permutations
+        self.INVERSE_SYMMETRIES = [[0] * (board_size * board_size) for _ in self.SYMMETRIES]
+        for symmetry, inverse in zip(self.SYMMETRIES, self.INVERSE_SYMMETRIES):
+            for index, image in enumerate(symmetry):
+                inverse[image] = index
+        # SYMMETRY_KEYS[index][piece][s] is the Zobrist key of piece at index once the board is
+        # transformed by symmetry s, so the 8 hashes can be updated together
+        self.SYMMETRY_KEYS = [{piece: tuple(self.ZOBRIST_TABLE[symmetry[index]][piece] for symmetry in self.SYMMETRIES)
+                               for piece in 'xo'} for index in range(board_size * board_size)]
+        # Every thread gets its own board state following the board it used last, so a bot can
+        # think in a worker thread while the GUI queries the rules. The calls are counted per
+        # thread too (see engine_calls).
+        self._engines = threading.local()
+
+    def _count_call(self, query: str):
+        '''Counts a call to the query by the current thread'''
+        calls = getattr(self._engines, 'calls', None)
+        if calls is None:
+            calls = self._engines.calls = Counter()
+        calls[query] += 1
+
+    def engine_calls(self) -> dict[str, int]:
+        '''
+        Returns the number of calls the current thread made to each query so far, 'load'
+        counting the times the board state had to be set up from a board string. Searches
+        take the difference before and after a move (see SearchStats).
+        '''
+        return dict(getattr(self._engines, 'calls', {}))
+
+    def new_board_state(self) -> Union[BoardState, BitboardState]:
+        """
+        Returns an empty board state of the backend
+        """
+        if self.BACKEND == 'string':
+            return BoardState(self.GRAPH, self.ZOBRIST_TABLE)
+        return BitboardState(self.BOARD_SIZE, self.ZOBRIST_TABLE)
 
     def get_empty_board(self) -> str:
         '''
@@ -17,34 +87,77 @@ class MoveManager:
     
     def create_territory(self, board: str) -> str:
         """
-        Creates the territory string from the board
+        Creates the territory string from the board: every stone, and every empty cell that
+        can be reached from the stones of one colour only through empty cells, is marked
+        with that colour
         Parameters:
         board (str): Represents the position of pieces on the board
         Returns:
         The corresponding territory_str
         """
-        N = self.BOARD_SIZE
-        white_territory_list = [False for i in range(N * N)]
-        black_territory_list = [False for i in range(N * N)]
-        def spread_color(color_territory_list, node):
-            color_territory_list[node] = True
-            for neighbour in self.GRAPH[node]:
-                if board[neighbour] == '-' and (not color_territory_list[neighbour]):
-                    spread_color(color_territory_list, neighbour)
-        for node in range(N*N):
-            if board[node] == 'o':
-                spread_color(white_territory_list, node)
-            if board[node] == 'x':
-                spread_color(black_territory_list, node)
-        final_territory_list = []
-        for i in range(N * N):
-            if not (black_territory_list[i] ^ white_territory_list[i]):
-                final_territory_list.append('-')
-            elif black_territory_list[i] and not white_territory_list[i]:
-                final_territory_list.append('x')
-            elif white_territory_list[i] and not black_territory_list[i]:
-                final_territory_list.append('o')
-        return ''.join(final_territory_list)
+        self._count_call('create_territory')
+        cache = self.caches.get('territory')
+        if cache is None:
+            return self._create_territory(board)
+        key = ('string', self._position_hash(board))
+        territory_str = cache.get(key, board)
+        if territory_str is None:
+            territory_str = self._create_territory(board)
+            cache.put(key, board, territory_str)
+        return territory_str
+
+    def get_territory_score(self, board: str) -> int:
+        """
+        Returns the area of 'x' minus the area of 'o' (the territory_str count). The string
+        backend keeps it up to date on every move once it has been asked for, so this is
+        O(1) for the board most recently used.
+        Parameters:
+        board (str): The go board
+        Returns:
+        The black minus white area
+        """
+        self._count_call('get_territory_score')
+        cache = self.caches.get('territory')
+        if cache is None:
+            return self._territory_score(board)
+        key = ('score', self._position_hash(board))
+        territory_score = cache.get(key, board)
+        if territory_score is None:
+            territory_score = self._territory_score(board)
+            cache.put(key, board, territory_score)
+        return territory_score
+
+    def _scratch_tracker(self, board: str) -> Optional[TerritoryTracker]:
+        """
+        Returns a territory tracker of the thread loaded with the board if the string backend
+        would otherwise have to load the board, None if the board state can be used. The
+        territory only needs the empty regions, which are labelled faster than the blocks.
+        """
+        if self.BACKEND != 'string' or self._is_synced(board):
+            return None
+        tracker = getattr(self._engines, 'tracker', None)
+        if tracker is None:
+            tracker = self._engines.tracker = TerritoryTracker(self.GRAPH)
+        tracker.load(list(board))
+        return tracker
+
+    def _create_territory(self, board: str) -> str:
+        """
+        Creates the territory string of the board (see create_territory)
+        """
+        tracker = self._scratch_tracker(board)
+        if tracker is not None:
+            return tracker.territory_string()
+        return self.get_board_state(board).create_territory()
+
+    def _territory_score(self, board: str) -> int:
+        """
+        Returns the black minus white area of the board (see get_territory_score)
+        """
+        tracker = self._scratch_tracker(board)
+        if tracker is not None:
+            return tracker.score
+        return self.get_board_state(board).territory_score()
 
     def convert_to_1d(self, position: tuple[int, int]) -> int:
         """
@@ -91,6 +204,224 @@ class MoveManager:
             graph.append(neighbours)
         return graph
 
+    def generate_symmetries(self) -> list[list[int]]:
+        """
+        Generates the 8 symmetries of the board: the 4 rotations, each with and without a
+        reflection along the diagonal. They keep neighbours neighbouring in GRAPH, so the rules
+        and the territory of a transformed board are the transformed rules and territory.
+        Returns:
+        A list of 8 lists where SYMMETRIES[s][index] is the 1D index index is sent to by
+        symmetry s. SYMMETRIES[0] is the identity.
+        """
+        N = self.BOARD_SIZE
+        symmetries = []
+        for rotation in range(4):
+            for reflect in (False, True):
+                symmetry = []
+                for index in range(N * N):
+                    x, y = self.convert_to_2d(index)
+                    if reflect:
+                        x, y = y, x
+                    for _ in range(rotation):
+                        x, y = N - 1 - y, x
+                    symmetry.append(self.convert_to_1d((x, y)))
+                symmetries.append(symmetry)
+        return symmetries
+
+    def get_symmetric_hashes(self, board: str) -> list[int]:
+        """
+        Returns the hashes of the board transformed by each of the 8 symmetries, the first one
+        being get_hash(board)
+        Parameters:
+        board (str): The go board
+        """
+        hashes = [0] * len(self.SYMMETRIES)
+        for index, cell in enumerate(board):
+            if cell != '-':
+                keys = self.SYMMETRY_KEYS[index][cell]
+                for s in range(len(hashes)):
+                    hashes[s] ^= keys[s]
+        return hashes
+
+    def symmetric_hashes_after_move(self, hashes: list[int], index: int, piece: str, captured: list[int]) -> list[int]:
+        """
+        Updates the symmetric hashes of a board (see get_symmetric_hashes) for a move
+        Parameters:
+        hashes (list[int]): The symmetric hashes of the board before the move
+        index (int): The 1D index where the piece is placed, or -1 for a pass
+        piece (str): The piece placed
+        captured (list[int]): The 1D indices of the opponent stones the move captures
+        Returns:
+        The symmetric hashes of the board after the move
+        """
+        if index == -1:
+            return hashes
+        new_hashes = list(hashes)
+        keys = self.SYMMETRY_KEYS[index][piece]
+        for s in range(len(new_hashes)):
+            new_hashes[s] ^= keys[s]
+        opponent_piece = 'o' if piece == 'x' else 'x'
+        for stone in captured:
+            keys = self.SYMMETRY_KEYS[stone][opponent_piece]
+            for s in range(len(new_hashes)):
+                new_hashes[s] ^= keys[s]
+        return new_hashes
+
+    @staticmethod
+    def canonical_key(hashes: list[int]) -> tuple[int, int]:
+        """
+        Returns the canonical key of a board from its symmetric hashes
+        Returns:
+        A tuple (key, symmetry) where key is the smallest of the hashes, which is the same for
+        all the boards that are symmetric to each other, and symmetry is the first symmetry
+        giving it. The board transformed by symmetry is the canonical orientation.
+        """
+        key = min(hashes)
+        return key, hashes.index(key)
+
+    def get_canonical_key(self, board: str) -> tuple[int, int]:
+        """
+        Returns the canonical key of the board, for caches shared by symmetric positions
+        Parameters:
+        board (str): The go board
+        Returns:
+        A tuple (key, symmetry) (see canonical_key)
+        """
+        return self.canonical_key(self.get_symmetric_hashes(board))
+
+    def to_canonical_move(self, index: int, symmetry: int) -> int:
+        """
+        Maps a move on the board to the same move on the board in canonical orientation
+        Parameters:
+        index (int): The 1D index of the move, or a negative value (e.g. -1 for a pass) which
+        is returned as is
+        symmetry (int): The symmetry returned by get_canonical_key for the board
+        """
+        return self.SYMMETRIES[symmetry][index] if index >= 0 else index
+
+    def from_canonical_move(self, index: int, symmetry: int) -> int:
+        """
+        Maps a move on the board in canonical orientation back to the board (the inverse of
+        to_canonical_move)
+        """
+        return self.INVERSE_SYMMETRIES[symmetry][index] if index >= 0 else index
+
+    def _is_synced(self, board: str) -> bool:
+        """
+        Returns whether the board state of the thread is on the board or one undo away from
+        it, so that get_board_state does not need to load the board
+        """
+        board_state = getattr(self._engines, 'board_state', None)
+        if board_state is None:
+            return False
+        return board_state.board == board or bool(board_state.undo_stack) and self._engines.parent_board == board
+
+    def get_board_state(self, board: str) -> Union[BoardState, BitboardState]:
+        """
+        Returns the incremental board state synced to the board. The state follows the last
+        board it was asked about, so consecutive queries on the same board, on the board
+        returned by make_move or on the board make_move was called on do not need to relabel
+        the blocks. Each thread has its own state.
+        Parameters:
+        board (str): The go board
+        Returns:
+        The BoardState (or BitboardState) of the board
+        """
+        board_state = getattr(self._engines, 'board_state', None)
+        if board_state is None:
+            board_state = self._engines.board_state = self.new_board_state()
+            self._engines.parent_board = None # The board the last make_move was made from
+        if board_state.board != board:
+            if board_state.undo_stack and self._engines.parent_board == board:
+                board_state.undo() # Back to the board of the last make_move
+            else:
+                self._count_call('load')
+                board_state.load(board)
+            self._engines.parent_board = None
+        return board_state
+
+    def _position_hash(self, board: str) -> int:
+        """
+        Returns the hash of the board, the key of the caches. Unlike get_hash, this does not
+        move the board state of the thread to the board.
+        """
+        board_state = getattr(self._engines, 'board_state', None)
+        if board_state is not None and board_state.board == board:
+            return board_state.hash
+        return hash_board(self.ZOBRIST_TABLE, board)
+
+    def cache_stats(self) -> dict[str, dict[str, int]]:
+        """
+        Returns the counters of the query caches, to tune their sizes
+        Returns:
+        A dict from each cached query to its hits, misses, evictions, size and capacity
+        """
+        return {query: cache.stats() for query, cache in self.caches.items()}
+
+    def clear_caches(self):
+        """
+        Empties the query caches and resets their counters
+        """
+        for cache in self.caches.values():
+            cache.clear()
+
+    def get_search_board(self, board: str) -> Union[BoardState, BitboardState]:
+        """
+        Returns a new board state of the board for tree searches to walk with play and undo.
+        Unlike get_board_state, the returned state is owned by the caller.
+        Parameters:
+        board (str): The go board
+        Returns:
+        The new BoardState (or BitboardState)
+        """
+        self._count_call('get_search_board')
+        search_board = self.new_board_state()
+        search_board.load(board)
+        return search_board
+
+    def get_hash(self, board: str) -> int:
+        """
+        Returns the 64 bit Zobrist hash of the board. The hash is maintained by the board
+        state on every placement and capture, so this is O(1) for the board most recently used.
+        Parameters:
+        board (str): The go board
+        Returns:
+        The hash of the board
+        """
+        self._count_call('get_hash')
+        return self.get_board_state(board).hash
+
+    def get_hash_after_move(self, board: str, index: int, piece: str, captured: Optional[list[int]] = None) -> int:
+        """
+        Returns the hash of the board after a valid move without making the move
+        Parameters:
+        board (str): The go board
+        index (int): The 1D index where the piece is to be placed
+        piece (str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures, as returned by
+        classify_moves. If not given, they are computed.
+        Returns:
+        The hash of the new board
+        """
+        self._count_call('get_hash_after_move')
+        return self.get_board_state(board).hash_after_move(index, piece, captured)
+
+    def is_superko_legal(self, board: str, index: int, piece: str, history: set[int]) -> bool:
+        """
+        Returns whether the move is valid and does not repeat an earlier position
+        (positional superko)
+        Parameters:
+        board (str): The go board
+        index (int): The 1D index where the piece is to be placed
+        piece (str): The piece to be placed
+        history (set[int]): The hashes of the positions that occured so far
+        Returns:
+        True if the move is legal
+        """
+        if not self.is_valid_move(board, index, piece):
+            return False
+        return self.get_hash_after_move(board, index, piece) not in history
+
     def get_liberty_count(self, board: str, index: int) -> int:
         """
         Returns the total count of the liberties of the block containing index
@@ -100,23 +431,17 @@ class MoveManager:
         Returns:
         The total number of liberties of the block
         """
+        self._count_call('get_liberty_count')
         if board[index] == '-':
             raise ValueError('The liberties of an empty cell is not defined')
-        visited = set()
-        liberty_count = 0
-        stack = [index]
-        visited.add(index)
-        # Perform a simple dfs
-        while stack:
-            node = stack.pop()
-            neighbours = self.GRAPH[node]
-            for neighbour in neighbours:
-                if neighbour not in visited:
-                    if board[neighbour] == '-':
-                        liberty_count += 1
-                    elif board[neighbour] == board[index]: # Same colour
-                        stack.append(neighbour)
-                    visited.add(neighbour)
+        cache = self.caches.get('liberties')
+        if cache is None:
+            return self.get_board_state(board).liberty_count(index)
+        key = (self._position_hash(board), index)
+        liberty_count = cache.get(key, board)
+        if liberty_count is None:
+            liberty_count = self.get_board_state(board).liberty_count(index)
+            cache.put(key, board, liberty_count)
         return liberty_count
 
     def remove_block(self, board: str, index: int) -> str:
@@ -128,51 +453,38 @@ class MoveManager:
         Returns:
         The new board
         """
-        board_list = list(board)
-        initial_colour = board_list[index]
+        self._count_call('remove_block')
         if board[index] == '-':
             raise ValueError('No block contains an empty cell')
-        stack = [index]
-        board_list[index] = '-'
-        # Performing a simple dfs
-        while stack:
-            node = stack.pop()
-            neighbours = self.GRAPH[node]
-            for neighbour in neighbours:
-                if board_list[neighbour] == initial_colour:
-                    board_list[neighbour] = '-'
-                    stack.append(neighbour)
-        return ''.join(board_list)   
-
-    def make_move(self, board: str, index: int, piece: str) -> str:
+        board_list = list(board)
+        for stone in self.get_board_state(board).group_stones(index):
+            board_list[stone] = '-'
+        return ''.join(board_list)
+
+    def make_move(self, board: str, index: int, piece: str, captured: Optional[list[int]] = None) -> str:
         """
         Returns the board after the move has been made
         Parameters:
         board (str): The go board
         index (int): The 1d index where a piece is to be placed
         piece(str): The piece to be placed
+        captured (Optional[list[int]]): The stones the move captures, as returned by
+        classify_moves. If given, the captures are not recomputed.
         Returns:
         The new board
         """
+        self._count_call('make_move')
         if board[index] != '-':
             raise ValueError("Cannot place a piece on a non empty cell")
-        # Make the move
-        board_list = list(board)
-        board_list[index] = piece
-        new_board = ''.join(board_list)
-        
-        neighbours = self.GRAPH[index]
-        # Remove any blocks of opponent with zero liberties
-        for neighbour in neighbours:
-            if new_board[neighbour] != '-' and new_board[neighbour] != piece:
-                if self.get_liberty_count(new_board, neighbour) == 0:
-                    new_board = self.remove_block(new_board, neighbour)
-        
-        # If still no liberties exist for the current piece raise exception
-        if self.get_liberty_count(new_board, index) == 0:
-            raise ValueError("Cannot perform suicide")
-        return new_board
-    
+        board_state = self.get_board_state(board)
+        # Raises if the move is a suicide, otherwise the state moves on to the new board. Only
+        # this move is kept to be taken back, so that the next move from the same board (e.g.
+        # the sibling of a tree node) is an undo away rather than a reload.
+        board_state.forget_moves()
+        board_state.play(index, piece, captured)
+        self._engines.parent_board = board
+        return board_state.board
+
     def is_valid_move(self, board: str, index: int, piece: str) -> bool:
         '''
         Returns whether the move is valid
@@ -183,38 +495,52 @@ class MoveManager:
         Returns:
         True if the move is valid, False if it is invalid
         '''
+        self._count_call('is_valid_move')
         if board[index] != '-':
             return False # Cannot place a piece on a non empty cell
-        
-        # Make the move
-        board_list = list(board)
-        board_list[index] = piece
-        new_board = ''.join(board_list)
-        
-        neighbours = self.GRAPH[index]
-        # Remove any blocks of opponent with zero liberties
-        for neighbour in neighbours:
-            if new_board[neighbour] != '-' and new_board[neighbour] != piece:
-                if self.get_liberty_count(new_board, neighbour) == 0:
-                    return True # As the other block will be removed
-        
-        if self.get_liberty_count(new_board, index) == 0:
-            return False #Cannot perform suicide"
-        return True
-
-    def get_next_moves(self, board: str, piece: str) -> list[int]:
+        return not self.get_board_state(board).is_suicide(index, piece)
+
+    def classify_moves(self, board: str, piece: str, history: Optional[set[int]] = None) \
+            -> tuple[list[int], list[int], dict[int, list[int]]]:
+        '''
+        Classifies every empty cell as a valid move or a suicide in a single pass, using the
+        liberty count of every block
+        Parameters:
+        board (str): The go board
+        piece (str): The piece to be placed
+        history (Optional[set[int]]): The hashes of the positions that occured so far. If
+        given, the moves that repeat one of them are left out of valid_moves (superko).
+        Returns:
+        (valid_moves, suicide_moves, captures) where captures maps every capturing move to
+        the 1D indices of the stones it captures (to be passed on to make_move)
+        '''
+        self._count_call('classify_moves')
+        cache = self.caches.get('next_moves')
+        if cache is None:
+            return self.get_board_state(board).classify_moves(piece, history)
+        board_hash = self._position_hash(board)
+        key = (board_hash, piece)
+        result = cache.get(key, board)
+        if result is None:
+            # The moves are cached before the superko filter, which depends on the history
+            result = self.get_board_state(board).classify_moves(piece)
+            cache.put(key, board, result)
+        valid_moves, suicide_moves, captures = result
+        if history:
+            valid_moves = [move for move in valid_moves
+                           if hash_after_move(self.ZOBRIST_TABLE, board_hash, move, piece, captures.get(move, [])) not in history]
+        # Copies down to the captured stones, as the callers are free to change what they get
+        return list(valid_moves), list(suicide_moves), {move: list(stones) for move, stones in captures.items()}
+
+    def get_next_moves(self, board: str, piece: str, history: Optional[set[int]] = None) -> list[int]:
         '''
         Returns the list of valid positions a piece can be placed
         Parameters:
         board (str): The go board
         piece (str): The piece to be placed
+        history (Optional[set[int]]): The hashes of the positions that occured so far. If
+        given, the moves that repeat one of them are left out (superko).
         Returns:
         The list of valid positions a piece can be placed
         '''
-        # There should be an O(N * N) approach to do this, but for now, I will just do this the naive way
-        N = self.BOARD_SIZE
-        valid_moves = []
-        for move_id in range(N * N):
-            if self.is_valid_move(board, move_id, piece):
-                valid_moves.append(move_id)
-        return valid_moves
\ No newline at end of file
+        return self.classify_moves(board, piece, history)[0]
@@ -0,0 +1,363 @@
+'''
+Keeps the territory of a board up to date as stones are placed and captured. The empty cells
+are labelled with the connected empty region they belong to, and every region counts its
+contacts with the stones of each colour. A region is a player's territory if it only touches
+their stones, so the area score (stones plus territory) follows from the region sizes and is
+kept as a running total. A placement only touches the region it was played in and a capture
+only the cells it empties, which is what create_territory used to flood fill from scratch.
+'''
+import functools
+
+# The 8 cells around a cell in clockwise order, used to tell cheaply that a stone does not
+# split the region it is played in
+RING = ((-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0))
+
+
+def ring_joins_neighbours(mask: int) -> bool:
+    '''
+    Returns whether the empty orthogonal neighbours of a cell all lie on one arc of empty cells
+    of the ring around it, so that they are connected without leaving the ring
+    Parameters:
+    mask (int): Bit i is set if the cell at RING[i] is empty
+    '''
+    empty = [bool(mask >> i & 1) for i in range(len(RING))]
+    if all(empty):
+        return True
+    start = empty.index(False)
+    arcs = 0 # Arcs holding an empty neighbour
+    in_arc = has_neighbour = False
+    for step in range(1, len(RING) + 1):
+        i = (start + step) % len(RING)
+        if empty[i]:
+            in_arc = True
+            dx, dy = RING[i]
+            has_neighbour = has_neighbour or dx == 0 or dy == 0
+        elif in_arc:
+            arcs += has_neighbour
+            in_arc = has_neighbour = False
+    return arcs <= 1
+
+
+# RING_JOINED[mask] tells whether the empty neighbours are joined around the ring when bit i
+# of mask is set for the empty cells of the ring
+RING_JOINED = [ring_joins_neighbours(mask) for mask in range(1 << len(RING))]
+
+
+@functools.lru_cache(maxsize=None)
+def board_rings(N: int) -> list[tuple[int, ...]]:
+    '''
+    Returns the ring around every cell of an N x N board, -1 for the cells off the board. It
+    is shared by the trackers of the board size, as a search creates one per board state.
+    '''
+    rings = []
+    for index in range(N * N):
+        y, x = divmod(index, N)
+        rings.append(tuple((x + dx) + (y + dy) * N if 0 <= x + dx < N and 0 <= y + dy < N else -1
+                           for dx, dy in RING))
+    return rings
+
+
+class EmptyRegion:
+    '''A connected set of empty cells along with its contacts with the stones around it'''
+    __slots__ = ('cells', 'borders')
+
+    def __init__(self, cells: set[int], borders: dict[str, int]):
+        '''
+        Initializes the region
+        Parameters:
+        cells (set[int]): The 1D indices of the empty cells in the region
+        borders (dict[str, int]): For 'x' and 'o', the number of (cell, stone) neighbour pairs
+        between the region and the stones of that colour
+        '''
+        self.cells = cells
+        self.borders = borders
+
+    def owner(self) -> str:
+        '''Returns the player whose territory the region is ('x' or 'o'), '-' if it is neither'''
+        if self.borders['x'] and not self.borders['o']:
+            return 'x'
+        if self.borders['o'] and not self.borders['x']:
+            return 'o'
+        return '-'
+
+    def value(self) -> int:
+        '''Returns the contribution of the region to the black minus white area'''
+        owner = self.owner()
+        return len(self.cells) if owner == 'x' else -len(self.cells) if owner == 'o' else 0
+
+
+class TerritoryTracker:
+    '''
+    The empty regions of a board and the running area score. It shares the cells list of
+    the board state that owns it, which tells it about every change after making it (see
+    place and remove).
+    '''
+    def __init__(self, graph: list[list[int]]):
+        '''
+        Initializes the tracker of an empty board
+        Parameters:
+        graph (list[list[int]]): The neighbours graph (see MoveManager.generate_graph)
+        '''
+        self.GRAPH = graph
+        self.RINGS = board_rings(int(round(len(graph) ** 0.5)))
+        self.RING_JOINED = RING_JOINED
+        self.load(['-'] * len(graph))
+
+    def load(self, cells: list[str]):
+        '''
+        Labels every empty region of the board from scratch, which is O(N * N)
+        Parameters:
+        cells (list[str]): The cells of the board. The list is kept and read by the updates.
+        '''
+        self.cells = cells
+        self.region_of = [-1] * len(cells) # The id of the region of every empty cell, -1 for stones
+        self.regions: dict[int, EmptyRegion] = {}
+        self.next_id = 0
+        self.journal: list[tuple] = [] # One entry per recorded update, to take them back with undo
+        self.score = cells.count('x') - cells.count('o') # Black minus white area
+        for index in range(len(cells)):
+            if cells[index] == '-' and self.region_of[index] == -1:
+                region = self._label_region(index)
+                self.score += region.value()
+
+    def _label_region(self, seed: int) -> EmptyRegion:
+        '''
+        Creates the region of the empty cell seed with an iterative flood fill, labelling its
+        cells with a new id
+        Returns:
+        The new region
+        '''
+        cells, region_of, graph = self.cells, self.region_of, self.GRAPH
+        region_id = self.next_id
+        self.next_id += 1
+        region = EmptyRegion({seed}, {'x': 0, 'o': 0})
+        region_of[seed] = region_id
+        stack = [seed]
+        while stack:
+            node = stack.pop()
+            for neighbour in graph[node]:
+                cell = cells[neighbour]
+                if cell != '-':
+                    region.borders[cell] += 1
+                elif region_of[neighbour] != region_id:
+                    region_of[neighbour] = region_id
+                    region.cells.add(neighbour)
+                    stack.append(neighbour)
+        self.regions[region_id] = region
+        return region
+
+    def _cut_off_parts(self, index: int) -> list[list[int]]:
+        '''
+        Finds the parts of its region the stone just placed at index cut off. The empty
+        neighbours of index are connected if they are joined by empty cells of the ring around
+        it. Otherwise the region is searched from each of them in lockstep: searches that meet
+        are merged, and a search that runs out of cells has found a separate part. The search
+        stops once a single one is left, so it only costs about the size of the small parts.
+        Returns:
+        The lists of the cells of the parts, leaving out one part (the largest, if all of
+        them were found) which stays in the region
+        '''
+        cells, graph = self.cells, self.GRAPH
+        seeds = [neighbour for neighbour in graph[index] if cells[neighbour] == '-']
+        if len(seeds) <= 1:
+            return []
+        mask = 0
+        bit = 1
+        for cell in self.RINGS[index]:
+            if cell != -1 and cells[cell] == '-':
+                mask |= bit
+            bit <<= 1
+        if self.RING_JOINED[mask]:
+            return []
+
+        merged_into = list(range(len(seeds))) # Union find over the searches
+        def find(search):
+            while merged_into[search] != search:
+                search = merged_into[search]
+            return search
+        found_by = {seed: search for search, seed in enumerate(seeds)}
+        frontiers = [[seed] for seed in seeds]
+        live = list(range(len(seeds)))
+        finished = []
+        while len(live) > 1:
+            for search in list(live):
+                if search not in live:
+                    continue # Merged into an earlier search of this round
+                frontier = frontiers[search]
+                node = frontier.pop()
+                for neighbour in graph[node]:
+                    if cells[neighbour] != '-':
+                        continue
+                    other = found_by.get(neighbour)
+                    if other is None:
+                        found_by[neighbour] = search
+                        frontier.append(neighbour)
+                        continue
+                    other = find(other)
+                    if other != search:
+                        merged_into[other] = search
+                        frontier.extend(frontiers[other])
+                        frontiers[other] = []
+                        live.remove(other)
+                if not frontier:
+                    live.remove(search)
+                    finished.append(search)
+                if len(live) <= 1:
+                    break
+        parts: dict[int, list[int]] = {search: [] for search in finished}
+        for cell, search in found_by.items():
+            search = find(search)
+            if search in parts:
+                parts[search].append(cell)
+        if not live:
+            del parts[max(parts, key=lambda search: len(parts[search]))]
+        return list(parts.values())
+
+    def place(self, index: int, piece: str, record: bool = False):
+        '''
+        Updates the region of an empty cell a stone was just placed on, splitting off the
+        parts the stone cut off. Captures are reported separately with remove.
+        Parameters:
+        index (int): The 1D index of the stone, already set in the cells
+        piece (str): The piece placed
+        record (bool): Whether to journal the update so that it can be taken back with undo
+        '''
+        cells, region_of, regions, graph = self.cells, self.region_of, self.regions, self.GRAPH
+        old_score = self.score
+        region_id = region_of[index]
+        region = regions[region_id]
+        old_borders = dict(region.borders)
+        self.score += (1 if piece == 'x' else -1) - region.value()
+        region.cells.discard(index)
+        region_of[index] = -1
+        for neighbour in graph[index]:
+            cell = cells[neighbour]
+            if cell == '-':
+                region.borders[piece] += 1
+            else:
+                region.borders[cell] -= 1
+        new_ids = []
+        for part in self._cut_off_parts(index):
+            part_id = self.next_id
+            self.next_id += 1
+            new_ids.append(part_id)
+            borders = {'x': 0, 'o': 0}
+            for cell in part:
+                region_of[cell] = part_id
+                for neighbour in graph[cell]:
+                    if cells[neighbour] != '-':
+                        borders[cells[neighbour]] += 1
+            new_region = regions[part_id] = EmptyRegion(set(part), borders)
+            region.cells -= new_region.cells
+            region.borders['x'] -= borders['x']
+            region.borders['o'] -= borders['o']
+            self.score += new_region.value()
+        if region.cells:
+            self.score += region.value()
+        else:
+            del regions[region_id]
+        if record:
+            self.journal.append(('place', index, region_id, region, old_borders, new_ids, old_score))
+
+    def remove(self, stones: list[int], colour: str, record: bool = False):
+        '''
+        Adds the cells of captured stones to the empty regions, merging the regions they join
+        Parameters:
+        stones (list[int]): The 1D indices of the removed stones, already emptied in the cells
+        colour (str): The colour of the removed stones
+        record (bool): Whether to journal the update so that it can be taken back with undo
+        '''
+        cells, region_of, regions = self.cells, self.region_of, self.regions
+        for stone in stones:
+            old_score = self.score
+            self.score -= 1 if colour == 'x' else -1
+            neighbour_ids = []
+            for neighbour in self.GRAPH[stone]:
+                region_id = region_of[neighbour]
+                if region_id != -1 and region_id not in neighbour_ids:
+                    neighbour_ids.append(region_id)
+            # Merge the smaller regions into the largest one
+            if neighbour_ids:
+                target_id = max(neighbour_ids, key=lambda region_id: len(regions[region_id].cells))
+                target = regions[target_id]
+            else:
+                target_id = self.next_id
+                self.next_id += 1
+                target = regions[target_id] = EmptyRegion(set(), {'x': 0, 'o': 0})
+            merged = [(region_id, regions[region_id]) for region_id in neighbour_ids if region_id != target_id]
+            if record:
+                self.journal.append(('remove', stone, target_id, target, dict(target.borders),
+                                     merged, not neighbour_ids, old_score))
+            for region_id in neighbour_ids:
+                self.score -= regions[region_id].value()
+            for region_id, region in merged:
+                for cell in region.cells:
+                    region_of[cell] = target_id
+                target.cells |= region.cells
+                target.borders['x'] += region.borders['x']
+                target.borders['o'] += region.borders['o']
+                del regions[region_id]
+            target.cells.add(stone)
+            region_of[stone] = target_id
+            for neighbour in self.GRAPH[stone]:
+                cell = cells[neighbour]
+                if cell != '-':
+                    target.borders[cell] += 1
+                elif region_of[neighbour] == -1:
+                    target.borders[colour] += 1 # A stone of the same capture not removed yet
+                else:
+                    target.borders[colour] -= 1 # The stone was counted as a border of the region
+            self.score += target.value()
+
+    def undo(self, mark: int):
+        '''
+        Takes back the recorded updates until the journal is back to mark entries long. The
+        cells must already be back to what they were then.
+        Parameters:
+        mark (int): The length of the journal to go back to
+        '''
+        region_of, regions = self.region_of, self.regions
+        while len(self.journal) > mark:
+            entry = self.journal.pop()
+            kind = entry[0]
+            if kind == 'place':
+                _, index, region_id, region, borders, new_ids, old_score = entry
+                for part_id in new_ids:
+                    part = regions.pop(part_id)
+                    for cell in part.cells:
+                        region_of[cell] = region_id
+                    region.cells |= part.cells
+                region.cells.add(index)
+                region.borders = borders
+                region_of[index] = region_id
+                regions[region_id] = region
+            else:
+                _, stone, target_id, target, borders, merged, created, old_score = entry
+                target.cells.discard(stone)
+                region_of[stone] = -1
+                for region_id, region in merged:
+                    target.cells -= region.cells
+                    for cell in region.cells:
+                        region_of[cell] = region_id
+                    regions[region_id] = region
+                target.borders = borders
+                if created:
+                    del regions[target_id]
+            self.score = old_score
+
+    def owner(self, index: int) -> str:
+        '''
+        Returns who the cell counts for: the piece of a stone, the owner of the region of an
+        empty cell (see EmptyRegion.owner)
+        '''
+        region_id = self.region_of[index]
+        return self.cells[index] if region_id == -1 else self.regions[region_id].owner()
+
+    def territory_string(self) -> str:
+        '''
+        Returns the territory string of the board: every stone and every empty cell of a
+        region that only touches one colour is marked with that colour, the rest with '-'
+        '''
+        owners = {region_id: region.owner() for region_id, region in self.regions.items()}
+        region_of = self.region_of
+        return ''.join(cell if cell != '-' else owners[region_of[index]] for index, cell in enumerate(self.cells))
@@ -0,0 +1,306 @@
+'''
+Plays many headless games between bots on a pool of processes and rates the bots. Every game
+is played by its own worker with its own MoveManager, every result is appended to a JSON lines
+file as soon as the game finishes (so an interrupted tournament can be resumed) and the
+standings are given as Elo ratings with confidence intervals. Two bot tournaments can stop
+early with a sequential probability ratio test (SPRT).
+'''
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from game_bots.bot import Bot
+from game_implementation.game_play_manager import GameRunner
+from game_implementation.rules_implementation import MoveManager
+from typing import Optional
+import json
+import math
+import os
+import time
+
+MODES = ('round_robin', 'gauntlet')
+
+
+def schedule_games(names: list[str], mode: str = 'round_robin', games_per_pair: int = 2) -> list[dict]:
+    '''
+    Creates the games of a tournament. The colours alternate between the games of a pair, so
+    with an even games_per_pair both bots play each colour equally often.
+    Parameters:
+    names (list[str]): The names of the bots
+    mode (str): 'round_robin' pairs every bot with every other bot, 'gauntlet' pairs the
+    first bot with every other bot
+    games_per_pair (int): The number of games played by each pair
+    Returns:
+    The list of games, each being a dict with the 'game' number and the 'x' and 'o' bot names
+    '''
+    if mode not in MODES:
+        raise ValueError(f"Unknown tournament mode {mode}, expected one of {MODES}")
+    if mode == 'gauntlet':
+        pairs = [(names[0], name) for name in names[1:]]
+    else:
+        pairs = [(first, second) for i, first in enumerate(names) for second in names[i + 1:]]
+    games = []
+    # Interleave the pairs so that every pair has results early on
+    for round_number in range(games_per_pair):
+        for first, second in pairs:
+            x, o = (first, second) if round_number % 2 == 0 else (second, first)
+            games.append({'game': len(games), 'x': x, 'o': o})
+    return games
+
+
+def play_game(game: dict, bot_x: type[Bot], bot_o: type[Bot], board_size: int) -> dict:
+    '''
+    Plays a single game. Meant to be run in a worker process.
+    Parameters:
+    game (dict): The game (see schedule_games)
+    bot_x (type[Bot]): The class of the bot playing 'x'
+    bot_o (type[Bot]): The class of the bot playing 'o'
+    board_size (int): The length of a side of the board
+    Returns:
+    The game with its 'result' ('x', 'o', '-' or 'error'), 'seconds' and 'board_size' filled
+    in. A bot that makes an illegal move loses the game.
+    '''
+    start = time.perf_counter()
+    record = dict(game)
+    try:
+        game_runner = GameRunner(bot_x, bot_o, MoveManager(board_size))
+        try:
+            record['result'] = game_runner.start_game()
+        except ValueError as error:
+            # GameRunner raises on an illegal move by the bot to play
+            record['result'] = 'o' if game_runner.piece_to_move == 'x' else 'x'
+            record['error'] = str(error)
+    except Exception as error:
+        record['result'] = 'error'
+        record['error'] = repr(error)
+    record['seconds'] = time.perf_counter() - start
+    record['board_size'] = board_size
+    return record
+
+
+def expected_score(elo: float) -> float:
+    '''Returns the expected score of a player rated elo points above their opponent'''
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score: float) -> float:
+    '''Returns the Elo difference corresponding to an expected score (inverse of expected_score)'''
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_difference(wins: int, draws: int, losses: int, z: float = 1.96) -> tuple[float, float, float]:
+    '''
+    Estimates the Elo difference from a match result, with a normal confidence interval on
+    the mean score of a game
+    Parameters:
+    wins (int): The number of games won
+    draws (int): The number of games drawn
+    losses (int): The number of games lost
+    z (float): The number of standard deviations of the interval (1.96 for 95%)
+    Returns:
+    A tuple (elo, lower bound, upper bound)
+    '''
+    n = wins + draws + losses
+    if n == 0:
+        return (0.0, -math.inf, math.inf)
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    if variance == 0:
+        return (score_to_elo(score), -math.inf, math.inf) # Every game had the same result
+    margin = z * math.sqrt(variance / n)
+    return (score_to_elo(score), score_to_elo(score - margin), score_to_elo(score + margin))
+
+
+def sprt(wins: int, draws: int, losses: int, elo0: float = 0, elo1: float = 20, alpha: float = 0.05,
+         beta: float = 0.05) -> tuple[float, Optional[str]]:
+    '''
+    Sequential probability ratio test of H0: the Elo difference is elo0 against H1: it is elo1,
+    using the normal approximation of the log likelihood ratio of the game scores. One virtual
+    win and one virtual loss are added to the games, so that the variance is never 0 and a
+    match where every game had the same result (e.g. between deterministic bots) still stops.
+    Parameters:
+    wins (int): The number of games won
+    draws (int): The number of games drawn
+    losses (int): The number of games lost
+    elo0 (float): The Elo difference under H0
+    elo1 (float): The Elo difference under H1
+    alpha (float): The probability of accepting H1 when H0 is true
+    beta (float): The probability of accepting H0 when H1 is true
+    Returns:
+    A tuple (log likelihood ratio, decision) where the decision is 'H0', 'H1' or None if more
+    games are needed
+    '''
+    if wins + draws + losses == 0:
+        return (0.0, None)
+    wins, losses = wins + 1, losses + 1
+    n = wins + draws + losses
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    llr = n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+    if llr >= math.log((1 - beta) / alpha):
+        return (llr, 'H1')
+    if llr <= math.log(beta / (1 - alpha)):
+        return (llr, 'H0')
+    return (llr, None)
+
+
+def player_records(results: list[dict]) -> dict[str, list[int]]:
+    '''Returns the [wins, draws, losses] of every bot over the results, leaving out the errors'''
+    records: dict[str, list[int]] = {}
+    for record in results:
+        x_record = records.setdefault(record['x'], [0, 0, 0])
+        o_record = records.setdefault(record['o'], [0, 0, 0])
+        if record['result'] == 'x':
+            x_record[0] += 1
+            o_record[2] += 1
+        elif record['result'] == 'o':
+            o_record[0] += 1
+            x_record[2] += 1
+        elif record['result'] == '-':
+            x_record[1] += 1
+            o_record[1] += 1
+    return records
+
+
+def elo_ratings(results: list[dict], iterations: int = 200) -> dict[str, float]:
+    '''
+    Fits Bradley-Terry ratings to the results with minorization-maximization, counting draws
+    as half a win for each side. One virtual draw is added to every pair that played, so that
+    a bot that won (or lost) every game still gets a finite rating.
+    Parameters:
+    results (list[dict]): The finished games
+    iterations (int): The number of iterations of the fit
+    Returns:
+    The Elo rating of every bot, the mean rating being 0
+    '''
+    scores: dict[str, float] = {}
+    games: dict[tuple[str, str], float] = {} # Number of games of every pair
+    for record in results:
+        if record['result'] == 'error':
+            continue
+        x, o = record['x'], record['o']
+        pair = (x, o) if x < o else (o, x)
+        if pair not in games:
+            # The virtual draw
+            games[pair] = 1
+            scores[x] = scores.get(x, 0) + 0.5
+            scores[o] = scores.get(o, 0) + 0.5
+        games[pair] += 1
+        x_score = {'x': 1, 'o': 0, '-': 0.5}[record['result']]
+        scores[x] += x_score
+        scores[o] += 1 - x_score
+    gammas = {name: 1.0 for name in scores}
+    for _ in range(iterations):
+        for name in gammas:
+            denominator = 0
+            for (first, second), n in games.items():
+                if name == first:
+                    denominator += n / (gammas[name] + gammas[second])
+                elif name == second:
+                    denominator += n / (gammas[name] + gammas[first])
+            gammas[name] = scores[name] / denominator
+    ratings = {name: 400 * math.log10(gamma) for name, gamma in gammas.items()}
+    mean = sum(ratings.values()) / len(ratings) if ratings else 0
+    return {name: rating - mean for name, rating in ratings.items()}
+
+
+def format_standings(results: list[dict]) -> str:
+    '''
+    Returns the standings as a table sorted by rating. The interval of a bot is the one of its
+    Elo difference against the field (see elo_difference).
+    '''
+    ratings = elo_ratings(results)
+    records = player_records(results)
+    lines = [f"{'bot':>16} {'elo':>7} {'95% interval':>17} {'wins':>5} {'draws':>5} {'losses':>6}"]
+    for name in sorted(ratings, key=lambda name: -ratings[name]):
+        wins, draws, losses = records[name]
+        elo, lower, upper = elo_difference(wins, draws, losses)
+        interval = f"[{lower - elo:+.0f}, {upper - elo:+.0f}]"
+        lines.append(f"{name:>16} {ratings[name]:>7.0f} {interval:>17} {wins:>5} {draws:>5} {losses:>6}")
+    n_errors = sum(record['result'] == 'error' for record in results)
+    if n_errors:
+        lines.append(f"{n_errors} games ended with an error")
+    return '\n'.join(lines)
+
+
+def load_results(results_path: str) -> list[dict]:
+    '''Returns the results stored in a JSON lines file, or an empty list if it does not exist'''
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path) as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+class Tournament:
+    '''A tournament between bots, played on a pool of worker processes'''
+    def __init__(self, bots: dict[str, type[Bot]], board_size: int, results_path: str,
+                 mode: str = 'round_robin', games_per_pair: int = 2, n_workers: Optional[int] = None,
+                 use_sprt: bool = False, elo0: float = 0, elo1: float = 20, alpha: float = 0.05, beta: float = 0.05):
+        '''
+        Initializes the tournament
+        Parameters:
+        bots (dict[str, type[Bot]]): The bots by name. The classes (or functools.partial of
+        classes) are sent to the workers, so they must be importable by them.
+        board_size (int): The length of a side of the board
+        results_path (str): The JSON lines file the results are appended to. Games already in
+        it are not played again.
+        mode (str): 'round_robin' or 'gauntlet' (see schedule_games)
+        games_per_pair (int): The number of games played by each pair
+        n_workers (Optional[int]): The number of worker processes, the number of cores if None
+        use_sprt (bool): Whether to stop once the SPRT of the first bot against the second is
+        decided. Only for tournaments of two bots.
+        elo0, elo1, alpha, beta: The parameters of the SPRT (see sprt)
+        '''
+        if use_sprt and len(bots) != 2:
+            raise ValueError("The SPRT needs exactly two bots")
+        self.bots = bots
+        self.board_size = board_size
+        self.results_path = results_path
+        self.games = schedule_games(list(bots), mode, games_per_pair)
+        self.n_workers = n_workers
+        self.use_sprt = use_sprt
+        self.sprt_parameters = (elo0, elo1, alpha, beta)
+        self.results: list[dict] = []
+        self.sprt_decision: Optional[str] = None
+
+    def head_to_head(self) -> tuple[int, int, int]:
+        '''Returns the (wins, draws, losses) of the first bot over the results'''
+        return tuple(player_records(self.results).get(next(iter(self.bots)), [0, 0, 0]))
+
+    def run(self, verbose: bool = True) -> list[dict]:
+        '''
+        Plays the games that are not in the results file yet. Raises a ValueError if the
+        results file holds games of another schedule (other bots or board size).
+        Parameters:
+        verbose (bool): Whether to print every result as it comes in
+        Returns:
+        All the results of the tournament
+        '''
+        self.results = [record for record in load_results(self.results_path) if record['game'] < len(self.games)]
+        for record in self.results:
+            game = self.games[record['game']]
+            if (record['x'], record['o'], record.get('board_size', self.board_size)) != (game['x'], game['o'], self.board_size):
+                raise ValueError(f"Game {record['game']} of {self.results_path} is {record['x']} (x) vs {record['o']} (o) "
+                                 f"on a {record.get('board_size', self.board_size)} board, but the tournament schedules "
+                                 f"{game['x']} (x) vs {game['o']} (o) on a {self.board_size} board")
+        done = {record['game'] for record in self.results}
+        pending = [game for game in self.games if game['game'] not in done]
+        with ProcessPoolExecutor(self.n_workers) as pool, open(self.results_path, 'a') as results_file:
+            futures = [pool.submit(play_game, game, self.bots[game['x']], self.bots[game['o']], self.board_size)
+                       for game in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                self.results.append(record)
+                results_file.write(json.dumps(record) + '\n')
+                results_file.flush()
+                if verbose:
+                    print(f"game {record['game']}: {record['x']} (x) vs {record['o']} (o) -> {record['result']} "
+                          f"in {record['seconds']:.1f}s ({len(self.results)}/{len(self.games)})")
+                if self.use_sprt:
+                    llr, self.sprt_decision = sprt(*self.head_to_head(), *self.sprt_parameters)
+                    if self.sprt_decision is not None:
+                        if verbose:
+                            print(f"SPRT accepts {self.sprt_decision} (llr {llr:.2f})")
+                        # Only the games already being played are waited for
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        break
+        return self.results
@@ -0,0 +1,50 @@
+import random
+
+
+def generate_zobrist_table(n_cells: int, seed: int = 0) -> list[dict[str, int]]:
+    '''
+    Generates the random 64 bit keys used for Zobrist hashing. The hash of a position is the
+    xor of the keys of its stones, so placing or removing a stone is a single xor.
+    Parameters:
+    n_cells (int): The number of cells on the board
+    seed (int): The seed, so that hashes are the same across runs and processes
+    Returns:
+    A list table where table[index][piece] is the key of piece at the 1D index index. The key
+    of an empty cell ('-') is 0.
+    '''
+    rng = random.Random(seed)
+    return [{'x': rng.getrandbits(64), 'o': rng.getrandbits(64), '-': 0} for _ in range(n_cells)]
+
+
+def hash_after_move(zobrist_table: list[dict[str, int]], current_hash: int, index: int, piece: str,
+                    captured: list[int]) -> int:
+    '''
+    Returns the hash of a position after a move, without making the move
+    Parameters:
+    zobrist_table (list[dict[str, int]]): The table from generate_zobrist_table
+    current_hash (int): The hash of the position before the move
+    index (int): The 1D index where the piece is placed
+    piece (str): The piece placed
+    captured (list[int]): The 1D indices of the opponent stones the move captures
+    Returns:
+    The hash of the new position
+    '''
+    new_hash = current_hash ^ zobrist_table[index][piece]
+    opponent_piece = 'o' if piece == 'x' else 'x'
+    for stone in captured:
+        new_hash ^= zobrist_table[stone][opponent_piece]
+    return new_hash
+
+
+def hash_board(zobrist_table: list[dict[str, int]], board: str) -> int:
+    '''
+    Returns the hash of a board string from scratch, which is O(N * N)
+    Parameters:
+    zobrist_table (list[dict[str, int]]): The table from generate_zobrist_table
+    board (str): The go board
+    '''
+    board_hash = 0
+    for index, piece in enumerate(board):
+        if piece != '-':
+            board_hash ^= zobrist_table[index][piece]
+    return board_hash
@@ -44,30 +44,27 @@ def main():
     pass_indicator = False # Toggle flag for the pass indicator
     running = True
     while running:
-        DRAWING_OBJECT.draw_board(board)
-        if display_territory:
-            DRAWING_OBJECT.draw_territory(board)
-        if pass_indicator:
-            DRAWING_OBJECT.draw_pass_indicator()
-        pygame.display.flip()
+        # Only the cells that changed are redrawn and sent to the display
+        pygame.display.update(DRAWING_OBJECT.render(board, display_territory, pass_indicator))
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-                pygame.quit()
-                sys.exit()
+        # Sleep until something happens instead of polling
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            running = False
+            pygame.quit()
+            sys.exit()
 
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                pos = pygame.mouse.get_pos()
-                index = DRAWING_OBJECT.get_cell_index(pos)
-                board = handle_click(board, index, event.button)
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            pos = pygame.mouse.get_pos()
+            index = DRAWING_OBJECT.get_cell_index(pos)
+            board = handle_click(board, index, event.button)
+        
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE:  # Toggle territory view with spacebar
+                display_territory = not display_territory
+            if event.key == pygame.K_p:
+                pass_indicator = not pass_indicator
             
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:  # Toggle territory view with spacebar
-                    display_territory = not display_territory
-                if event.key == pygame.K_p:
-                    pass_indicator = not pass_indicator
-                
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
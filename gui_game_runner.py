@@ -0,0 +1,146 @@
+import pygame
+import queue
+import sys
+import threading
+from typing import Optional
+from display_class import VisualInterface
+from game_bots.bot import Bot
+from game_implementation.game_play_manager import GameRunner
+from game_implementation.rules_implementation import MoveManager
+
+# Events posted by the game thread to the GUI thread
+BOARD_CHANGED = pygame.USEREVENT + 1
+GAME_OVER = pygame.USEREVENT + 2
+
+
+class MouseBot(Bot):
+    '''
+    A human playing in the window of a GuiGameRunner. The runner checks the clicks and hands
+    the moves over, so make_move just waits for the next one. A move is only taken while
+    make_move is waiting, so a click made before the board of the turn is shown is dropped.
+    '''
+    def __init__(self, move_manager: MoveManager, my_piece: str):
+        self.move_manager = move_manager
+        self.my_piece = my_piece
+        self.moves: queue.Queue[int] = queue.Queue()
+        self.waiting = threading.Event() # Set while make_move waits for a move
+
+    def make_move(self, board: str, other_pass: bool) -> int:
+        while not self.moves.empty():
+            self.moves.get_nowait()
+        self.waiting.set()
+        return self.moves.get()
+
+    def hand_over(self, move: int):
+        '''Gives the move to make_move if it is waiting for one, the move is dropped otherwise'''
+        if self.waiting.is_set():
+            self.waiting.clear()
+            self.moves.put(move)
+
+    def receive_result(self, result: str):
+        pass
+
+
+class GuiGameRunner(GameRunner):
+    '''
+    Plays a game in a window. The game itself runs in a worker thread, so the window stays
+    responsive while a bot thinks and shows the progress of its search. The GUI thread
+    sleeps until an event comes in, and only wakes up at most fps times a second while a bot
+    is thinking.
+    '''
+    def __init__(self, bot_x: type[Bot], bot_o: type[Bot], move_manager: MoveManager, fps: int = 30):
+        '''
+        Initializes the game runner
+        Parameters:
+        bot_x (type[Bot]): The class of the bot playing 'x', MouseBot for a human
+        bot_o (type[Bot]): The class of the bot playing 'o', MouseBot for a human
+        move_manager (MoveManager): The move manager object
+        fps (int): The most frames drawn per second
+        '''
+        super().__init__(bot_x, bot_o, move_manager)
+        self.fps = fps
+        self.drawing_obj = VisualInterface(move_manager)
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+    def play_move(self, move_played: int) -> Optional[str]:
+        '''Plays the move (see GameRunner.play_move) and wakes up the GUI thread'''
+        result = super().play_move(move_played)
+        pygame.event.post(pygame.event.Event(BOARD_CHANGED))
+        return result
+
+    def play_game(self):
+        '''Plays the game in the worker thread'''
+        try:
+            self.result = self.start_game()
+        except BaseException as error:
+            self.error = error
+        pygame.event.post(pygame.event.Event(GAME_OVER))
+
+    def handle_click(self, pos: tuple[int, int]):
+        '''Hands the clicked move over to a human whose turn it is, if it is legal'''
+        bot = self.bot_to_play()
+        # While the bot waits, the board is the one make_move was given and cannot change
+        if not isinstance(bot, MouseBot) or not bot.waiting.is_set():
+            return
+        index = self.drawing_obj.get_cell_index(pos)
+        board = self.board
+        if not (0 <= index < len(board)) or not self.move_manager.is_valid_move(board, index, bot.my_piece):
+            return
+        if not self.move_manager.is_superko_legal(board, index, bot.my_piece, self.states_achieved):
+            print("KO happened")
+            return
+        bot.hand_over(index)
+
+    def run(self) -> str:
+        '''
+        Plays the game until it is over and shows the result until a key is pressed
+        Returns:
+        The result of the game (see GameRunner.start_game)
+        '''
+        game_thread = threading.Thread(target=self.play_game, daemon=True)
+        game_thread.start()
+        pygame.event.post(pygame.event.Event(BOARD_CHANGED)) # Draws the first frame
+        clock = pygame.time.Clock()
+        display_territory = False
+        caption = None
+        game_over = False
+        while True:
+            bot = self.bot_to_play()
+            thinking = not game_over and not isinstance(bot, MouseBot)
+            # Block until something happens, but wake up to show the search progress
+            event = pygame.event.wait(1000 // self.fps if thinking else 0)
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == GAME_OVER:
+                game_over = True
+                if self.error is not None:
+                    raise self.error
+                self.drawing_obj.display_result({'x': "Black won", 'o': "White won", '-': "Draw"}[self.result])
+                pygame.display.flip()
+                pygame.display.set_caption("Go Board")
+                continue
+            if game_over:
+                if event.type == pygame.KEYDOWN:
+                    return self.result
+                continue
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                self.handle_click(event.pos)
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:  # Toggle territory view with spacebar
+                    display_territory = not display_territory
+                if event.key == pygame.K_p and isinstance(bot, MouseBot):
+                    bot.hand_over(-1) # This indicates an intention to pass
+
+            dirty_rects = self.drawing_obj.render(self.board, display_territory, self.has_passed)
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+            new_caption = f"Go Board - {self.piece_to_move} to play"
+            progress = bot.search_progress() if thinking else None
+            if progress is not None:
+                new_caption += f" (thinking: {progress})"
+            if new_caption != caption:
+                caption = new_caption
+                pygame.display.set_caption(caption)
+            clock.tick(self.fps)
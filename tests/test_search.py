@@ -0,0 +1,137 @@
+'''
+Checks the match statistics of the tournaments and the node bookkeeping of MCTSArrayTree.
+Run from the root of the repository with: python -m unittest tests.test_search
+'''
+import math
+import unittest
+from game_bots.mcts_array_tree import MCTSArrayTree, EXPANDED
+from game_implementation.rules_implementation import MoveManager
+from game_implementation.tournament import elo_difference, elo_ratings, sprt
+
+
+class TestMatchStatistics(unittest.TestCase):
+    def test_sprt_accepts_h1_when_every_game_is_won(self):
+        llr, decision = sprt(200, 0, 0)
+        self.assertEqual(decision, 'H1')
+        self.assertGreater(llr, 0)
+
+    def test_sprt_accepts_h0_when_every_game_is_lost(self):
+        llr, decision = sprt(0, 0, 200)
+        self.assertEqual(decision, 'H0')
+        self.assertLess(llr, 0)
+
+    def test_sprt_needs_more_games_at_the_start(self):
+        self.assertEqual(sprt(0, 0, 0), (0.0, None))
+        self.assertIsNone(sprt(1, 0, 0)[1])
+
+    def test_elo_difference_is_symmetric(self):
+        elo, lower, upper = elo_difference(30, 10, 20)
+        other_elo, other_lower, other_upper = elo_difference(20, 10, 30)
+        self.assertAlmostEqual(elo, -other_elo)
+        self.assertAlmostEqual(lower, -other_upper)
+        self.assertAlmostEqual(upper, -other_lower)
+
+    def test_elo_ratings_are_symmetric(self):
+        results = ([{'x': 'a', 'o': 'b', 'result': 'x'}] * 6 + [{'x': 'b', 'o': 'a', 'result': 'x'}] * 2
+                   + [{'x': 'a', 'o': 'b', 'result': '-'}] * 2)
+        ratings = elo_ratings(results)
+        self.assertAlmostEqual(ratings['a'], -ratings['b'])
+        self.assertGreater(ratings['a'], 0)
+        # Swapping the players swaps the ratings
+        swapped = elo_ratings([{'x': record['o'], 'o': record['x'],
+                                'result': {'x': 'o', 'o': 'x', '-': '-'}[record['result']]}
+                               for record in results])
+        self.assertAlmostEqual(swapped['a'], ratings['a'])
+        self.assertAlmostEqual(swapped['b'], ratings['b'])
+
+    def test_elo_ratings_of_even_players_are_equal(self):
+        results = [{'x': 'a', 'o': 'b', 'result': 'x'}, {'x': 'b', 'o': 'a', 'result': 'x'}]
+        ratings = elo_ratings(results)
+        self.assertAlmostEqual(ratings['a'], 0)
+        self.assertAlmostEqual(ratings['b'], 0)
+
+
+class TestArrayTree(unittest.TestCase):
+    def make_tree(self, widening=None, simulations=300) -> MCTSArrayTree:
+        '''Returns a 5x5 tree from the empty board after the simulations'''
+        move_manager = MoveManager(5)
+
+        def heuristic(board: str, piece: str, other_pass: bool) -> float:
+            score = math.tanh(move_manager.get_territory_score(board) / 5)
+            return score if piece == 'x' else -score
+
+        board = move_manager.make_move(move_manager.get_empty_board(), 12, 'x')
+        tree = MCTSArrayTree(move_manager, board, False, 'o', heuristic, widening=widening)
+        for _ in range(simulations):
+            tree.simulate()
+        return tree
+
+    def subtree_stats(self, tree: MCTSArrayTree, node: int, path: tuple = ()) -> dict[tuple, tuple]:
+        '''Returns the (N, Q, expanded) of every open node of the subtree of node by its moves from node'''
+        stats = {path: (int(tree.N[node]), float(tree.Q[node]), bool(tree.flags[node] & EXPANDED))}
+        start = int(tree.first_child[node])
+        for child in range(start, start + int(tree.n_open[node])):
+            self.assertEqual(tree.parent[child], node)
+            stats.update(self.subtree_stats(tree, child, path + (int(tree.move[child]),)))
+        return stats
+
+    def check_advance(self, widening):
+        tree = self.make_tree(widening)
+        before = self.subtree_stats(tree, tree.root)
+        # The most visited reply, so its subtree is not empty
+        move = max(tree.child_values().items(), key=lambda item: item[1][1])[0]
+        tree.advance(move)
+        after = self.subtree_stats(tree, tree.root)
+        self.assertEqual(tree.root, 0)
+        self.assertEqual(after, {path[1:]: value for path, value in before.items() if path[:1] == (move,)})
+        self.assertEqual(tree.node_count, len(after))
+
+    def test_advance_keeps_the_subtree_of_the_move(self):
+        self.check_advance(None)
+
+    def test_advance_keeps_the_subtree_of_the_move_with_widening(self):
+        self.check_advance((2, 0.5))
+
+    def test_advance_raises_for_a_move_that_is_not_a_child(self):
+        tree = self.make_tree()
+        with self.assertRaises(ValueError):
+            tree.advance(12) # The stone already on the board
+
+    def test_compact_keeps_every_node(self):
+        tree = self.make_tree((2, 0.5))
+        before = self.subtree_stats(tree, tree.root)
+        size, node_count = tree.size, tree.node_count
+        tree._compact(tree.root)
+        self.assertEqual(self.subtree_stats(tree, tree.root), before)
+        self.assertEqual((tree.size, tree.node_count), (size, node_count))
+
+    def check_prune(self, widening):
+        tree = self.make_tree(widening, 500)
+        before = self.subtree_stats(tree, tree.root)
+        max_nodes = len(before) // 3
+        removed = tree.prune(max_nodes)
+        after = self.subtree_stats(tree, tree.root)
+        self.assertEqual(removed, len(before) - len(after))
+        self.assertLessEqual(len(after), max_nodes)
+        self.assertEqual(tree.node_count, len(after))
+        collapsed = 0
+        for path, (visits, value, expanded) in after.items():
+            # The collapsed nodes stay in the tree as leaves with their statistics
+            self.assertEqual((visits, value), before[path][:2])
+            collapsed += before[path][2] and not expanded
+        self.assertGreater(collapsed, 0)
+        # The search goes on from the pruned tree, expanding the collapsed nodes again
+        for _ in range(100):
+            tree.simulate()
+        self.assertGreaterEqual(tree.N[tree.root], before[()][0] + 100)
+        self.assertEqual(tree.node_count, len(self.subtree_stats(tree, tree.root)))
+
+    def test_prune_keeps_the_statistics_of_the_surviving_nodes(self):
+        self.check_prune(None)
+
+    def test_prune_keeps_the_statistics_of_the_surviving_nodes_with_widening(self):
+        self.check_prune((2, 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
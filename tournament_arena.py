@@ -0,0 +1,26 @@
+'''
+Runs a headless tournament between bots, e.g.
+python tournament_arena.py --bots mcts minimax --games 20 --workers 4
+'''
+import argparse
+from game_implementation.tournament import Tournament, format_standings, MODES
+from game_bots.registry import available_bots, get_bot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bots', nargs='+', choices=available_bots(headless=True), default=['mcts', 'minimax'])
+    parser.add_argument('--size', type=int, default=9)
+    parser.add_argument('--mode', choices=MODES, default='round_robin')
+    parser.add_argument('--games', type=int, default=2, help="Games per pair of bots")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes, the number of cores by default")
+    parser.add_argument('--results', default='tournament_results.jsonl')
+    parser.add_argument('--sprt', action='store_true', help="Stop early once the first bot is shown better or not")
+    parser.add_argument('--elo0', type=float, default=0)
+    parser.add_argument('--elo1', type=float, default=20)
+    args = parser.parse_args()
+
+    tournament = Tournament({name: get_bot(name) for name in args.bots}, args.size, args.results, args.mode,
+                            args.games, args.workers, args.sprt, args.elo0, args.elo1)
+    results = tournament.run()
+    print(format_standings(results))